@@ -20,10 +20,16 @@ from datetime import datetime, timezone
 from urllib.request import Request, urlopen
 from urllib.parse import quote
 from urllib.error import HTTPError, URLError
+from pathlib import Path
+import itertools
 import json
+import sys
 import time
 
 
+# Upper bound on peers analyzed in MAUDE peer comparison (one MAUDE lookup each)
+MAX_PEER_COHORT = 1000
+
 # Product Code to CFR Part Mapping
 # Source: FDA Product Classification Database
 # Updated: 2026-02-13
@@ -146,15 +152,29 @@ class FDAEnrichment:
         enriched_device = enricher.enrich_single_device(device_row, api_log)
     """
 
-    def __init__(self, api_key: Optional[str] = None, api_version: str = "3.0.0"):
+    def __init__(self, api_key: Optional[str] = None, api_version: str = "3.0.0",
+                 rate_limiter: Optional[Any] = None, k_number_loader: Optional[Any] = None,
+                 client: Optional[Any] = None):
         """
         Initialize FDA enrichment system.
 
         Args:
             api_key: Optional openFDA API key for higher rate limits
             api_version: openFDA API version (default: "2.0.1")
+            rate_limiter: Optional shared limiter with an acquire() method
+                (e.g. scripts/fda_rate_limit.openfda_rate_limiter()). When set,
+                it replaces the fixed 0.25s sleep after each call, which lets
+                enrich_device_batch() run devices concurrently within quota.
+            k_number_loader: Optional scripts/fda_dataloader.KNumberLoader. When
+                set, 510(k) validation lookups are coalesced into batched OR
+                queries and served from the shared FDAClient cache.
+            client: Optional scripts/fda_api_client.FDAClient for paginated
+                queries (default: the k_number_loader's client, or a new one).
         """
         self.api_key = api_key
+        self.rate_limiter = rate_limiter
+        self.k_number_loader = k_number_loader
+        self.client = client
         self.api_version = api_version
         self.base_url = "https://api.fda.gov/device"
         self.enrichment_timestamp = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
@@ -184,10 +204,13 @@ class FDAEnrichment:
         url = f"{self.base_url}/{endpoint}.json?{query_string}"
 
         try:
+            if self.rate_limiter is not None and self.rate_limiter.acquire() is False:
+                return None  # Daily quota exhausted
             req = Request(url, headers={'User-Agent': 'FDA-Predicate-Assistant/2.0'})
             response = urlopen(req, timeout=10)
             data = json.loads(response.read().decode('utf-8'))
-            time.sleep(0.25)  # Rate limiting: 4 requests/second
+            if self.rate_limiter is None:
+                time.sleep(0.25)  # Rate limiting: 4 requests/second
             return data
         except HTTPError as e:
             if e.code == 404:
@@ -196,6 +219,24 @@ class FDAEnrichment:
         except (URLError, Exception):
             return None
 
+    def openfda_client(self):
+        """
+        FDAClient used for paginated queries (created on first use).
+
+        Reuses the k_number_loader's client when one was given, so pages
+        share its cache and rate limiter.
+        """
+        if self.client is None:
+            if self.k_number_loader is not None:
+                self.client = self.k_number_loader.client
+            else:
+                scripts_dir = str(Path(__file__).resolve().parent.parent / 'scripts')
+                if scripts_dir not in sys.path:
+                    sys.path.insert(0, scripts_dir)
+                from fda_api_client import FDAClient
+                self.client = FDAClient(api_key=self.api_key, rate_limiter=self.rate_limiter)
+        return self.client
+
     def get_maude_events_by_product_code(self, product_code: str) -> Dict[str, Any]:
         """
         Get MAUDE events for a product code (NOT K-number).
@@ -310,10 +351,13 @@ class FDAEnrichment:
             # Returns: {'api_validated': 'Yes', 'decision': 'Substantially Equivalent', ...}
         """
         try:
-            data = self.api_query('510k', {
-                'search': f'k_number:"{k_number}"',
-                'limit': 1
-            })
+            if self.k_number_loader is not None:
+                data = self.k_number_loader.load(k_number)
+            else:
+                data = self.api_query('510k', {
+                    'search': f'k_number:"{k_number}"',
+                    'limit': 1
+                })
 
             if data and 'results' in data and len(data['results']) > 0:
                 device = data['results'][0]
@@ -575,19 +619,21 @@ class FDAEnrichment:
 
             params = {
                 'search': f'product_code:{product_code} AND decision_date:[{five_years_ago} TO 20991231]',
-                'limit': 1000  # Get up to 1000 peers for robust statistics
             }
 
-            peer_data = self.api_query('device/510k.json', params)
+            # Stream peers one page at a time, analyzing at most MAX_PEER_COHORT
+            client = self.openfda_client()
+            peer_devices = client.iter_results('510k', params, max_records=MAX_PEER_COHORT)
+            first_peer = next(peer_devices, None)
 
-            if not peer_data or 'results' not in peer_data:
+            if first_peer is None:
                 return default_response
 
-            peer_devices = peer_data['results']
-
-            if len(peer_devices) < 10:  # Require minimum 10 peers for statistical validity
-                default_response['peer_cohort_size'] = len(peer_devices)
-                default_response['peer_comparison_note'] = f'Cohort too small ({len(peer_devices)} devices) for reliable statistics'
+            cohort_total = client.last_total
+            if cohort_total is not None and cohort_total < 10:  # Require minimum 10 peers for statistical validity
+                peer_devices.close()
+                default_response['peer_cohort_size'] = cohort_total
+                default_response['peer_comparison_note'] = f'Cohort too small ({cohort_total} devices) for reliable statistics'
                 return default_response
 
             # Extract MAUDE counts for each peer
@@ -595,7 +641,9 @@ class FDAEnrichment:
             # Solution: Use brand name fallback hierarchy
             peer_maude_counts = []
 
-            for peer in peer_devices:
+            analyzed = 0
+            for peer in itertools.chain([first_peer], peer_devices):
+                analyzed += 1
                 # Attempt 1: Query by K-number (often returns 0 due to indexing gaps)
                 k_num = peer.get('k_number', '')
                 maude_k = self.get_maude_events_by_product_code(k_num)  # Will return 0 if not indexed
@@ -609,7 +657,7 @@ class FDAEnrichment:
                             'search': f'product_code:{product_code} AND brand_name:"{brand_name}"',
                             'count': 'product_code'
                         }
-                        brand_maude = self.api_query('device/event.json', brand_params)
+                        brand_maude = self.api_query('event', brand_params)
                         if brand_maude and 'results' in brand_maude:
                             peer_maude_counts.append(brand_maude['results'][0].get('count', 0))
                         else:
@@ -664,6 +712,9 @@ class FDAEnrichment:
                     classification = 'EXTREME_OUTLIER'
                     note = f'Above 90th percentile ({device_maude_count} vs {percentile_90:.0f} P90) - DO NOT USE as predicate'
 
+            if cohort_total and cohort_total > analyzed:
+                note += f' [first {analyzed} of {cohort_total} peers analyzed]'
+
             return {
                 'peer_cohort_size': len(sorted_counts),
                 'peer_median_events': round(median, 1),
@@ -776,12 +827,16 @@ class FDAEnrichment:
 
         return enriched
 
-    def enrich_device_batch(self, device_rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict]]:
+    def enrich_device_batch(self, device_rows: List[Dict[str, Any]],
+                            max_workers: int = 1) -> Tuple[List[Dict[str, Any]], List[Dict]]:
         """
         Enrich a batch of devices with progress reporting.
 
         Args:
             device_rows: List of base device data dicts
+            max_workers: Devices enriched concurrently (default: 1). Values
+                above 1 should be paired with a shared rate_limiter so the
+                combined request rate stays within the openFDA quota.
 
         Returns:
             Tuple of (enriched_rows, api_log)
@@ -796,15 +851,34 @@ class FDAEnrichment:
         print(f"\n📊 Enriching {total} devices with FDA API data...")
         print("━" * 60)
 
-        for i, row in enumerate(device_rows, 1):
-            k_number = row['KNUMBER']
-            enriched = self.enrich_single_device(row, api_log)
-            enriched_rows.append(enriched)
+        if self.k_number_loader is not None:
+            # Warm the 510(k) cache in batched OR queries up front
+            try:
+                self.k_number_loader.load_many(
+                    [row['KNUMBER'] for row in device_rows if row.get('KNUMBER')]
+                )
+            except Exception:
+                pass
 
+        def report(i):
             # Progress reporting
             if i % 10 == 0 or i == total:
                 print(f"  ✓ Processed {i}/{total} devices ({i/total*100:.1f}%)")
 
+        if max_workers > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = [pool.submit(self.enrich_single_device, row, api_log)
+                           for row in device_rows]
+                for i, future in enumerate(futures, 1):
+                    enriched_rows.append(future.result())
+                    report(i)
+        else:
+            for i, row in enumerate(device_rows, 1):
+                enriched = self.enrich_single_device(row, api_log)
+                enriched_rows.append(enriched)
+                report(i)
+
         print("━" * 60)
         print(f"✅ Enrichment complete: {total} devices processed\n")
 
@@ -44,6 +44,7 @@ SCRIPT_DIR = Path(__file__).parent
 PLUGIN_ROOT = SCRIPT_DIR.parent
 LIB_DIR = PLUGIN_ROOT / 'lib'
 sys.path.insert(0, str(LIB_DIR))
+sys.path.insert(0, str(SCRIPT_DIR))
 
 
 class DeviceStandardsGenerator:
@@ -103,31 +104,36 @@ class DeviceStandardsGenerator:
         """
         print("📊 Querying openFDA for all active product codes...")
 
-        # Use openFDA API to get product code statistics
-        # This queries the device classification endpoint
+        # Stream every classification record (the old count query stopped at
+        # the first 1000 codes) and rank by 510(k) volume. The device name
+        # comes with each record, so no per-code follow-up request is needed.
         try:
-            import requests
-
-            url = "https://api.fda.gov/device/classification.json"
-            params = {
-                'limit': 1000,
-                'count': 'product_code.exact'
+            from fda_api_client import FDAClient
+
+            client = FDAClient()
+            volume = client._request('510k', {
+                'count': 'product_code.exact',
+                'limit': '1000'
+            })
+            volume_by_code = {
+                r.get('term', ''): r.get('count', 0)
+                for r in (volume or {}).get('results', [])
             }
 
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            # Extract product codes with counts
             codes = []
-            for result in data.get('results', []):
-                product_code = result.get('term', '')
-                count = result.get('count', 0)
-
-                if product_code and count > 0:
-                    # Get device name for this code
-                    device_name = self._get_device_name(product_code)
-                    codes.append((product_code, count, device_name))
+            seen = set()
+            for record in client.iter_results('classification', {}):
+                product_code = record.get('product_code', '')
+                if not product_code or product_code in seen:
+                    continue
+                seen.add(product_code)
+                codes.append((
+                    product_code,
+                    volume_by_code.get(product_code, 0),
+                    record.get('device_name', 'Unknown Device'),
+                ))
+            if not codes:
+                raise RuntimeError(getattr(client, 'last_page_error', None) or 'no results')
 
             # Sort by submission count (descending)
             codes.sort(key=lambda x: x[1], reverse=True)
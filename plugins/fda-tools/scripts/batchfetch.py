@@ -37,12 +37,13 @@ from tqdm import tqdm
 from datetime import datetime
 from collections import defaultdict
 from itertools import zip_longest
+import threading
 from threading import Lock
 from colorama import init, Fore, Style
 
 # Shared HTTP utilities
 try:
-    from fda_http import create_session, FDA_HEADERS
+    from fda_http import create_session, get_session, FDA_HEADERS
 except ImportError:
     FDA_HEADERS = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -55,8 +56,20 @@ except ImportError:
     def create_session(api_mode=False):
         session = requests.Session()
         session.headers.update(FDA_HEADERS)
+        adapter = requests.adapters.HTTPAdapter(max_retries=3, pool_connections=10, pool_maxsize=10)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.max_redirects = 5
+        session.cookies.update({'fda_gdpr': 'true', 'fda_consent': 'true'})
         return session
 
+    _thread_sessions = threading.local()
+
+    def get_session(api_mode=False):
+        if not hasattr(_thread_sessions, 'session'):
+            _thread_sessions.session = create_session(api_mode)
+        return _thread_sessions.session
+
 # Initialize colorama
 init(autoreset=True)
 
@@ -493,7 +506,7 @@ def process_zip_file(key, data_dir):
             return df
 
     try:
-        response = requests.get(zip_url, headers=headers, allow_redirects=True, timeout=60)
+        response = get_session().get(zip_url, headers=headers, allow_redirects=True, timeout=60)
         response.raise_for_status()
         zip_file = zipfile.ZipFile(BytesIO(response.content))
     except (requests.exceptions.RequestException, zipfile.BadZipFile) as e:
@@ -885,7 +898,7 @@ def main():
         foiclass_df = pd.read_csv(foiclass_file_path, sep="|", encoding='ISO-8859-1')
     else:
         try:
-            response = requests.get(foiclass_url, headers=dl_headers, allow_redirects=True, timeout=60)
+            response = get_session().get(foiclass_url, headers=dl_headers, allow_redirects=True, timeout=60)
             response.raise_for_status()
             zip_file = zipfile.ZipFile(BytesIO(response.content))
             zip_file.extractall(path=data_dir)
@@ -1015,21 +1028,9 @@ def main():
 
             for attempt in range(max_retries):
                 try:
-                    session = requests.Session()
-                    session.max_redirects = 5
-                    adapter = requests.adapters.HTTPAdapter(
-                        max_retries=3,
-                        pool_connections=10,
-                        pool_maxsize=10
-                    )
-                    session.mount("http://", adapter)
-                    session.mount("https://", adapter)
-
-                    session.cookies.update({
-                        'fda_gdpr': 'true',
-                        'fda_consent': 'true'
-                    })
-
+                    # Per-thread pooled session: reuses keep-alive connections
+                    # to accessdata.fda.gov across downloads.
+                    session = get_session()
                     response = session.get(url,
                         headers=dl_headers,
                         timeout=60,
@@ -1038,6 +1039,7 @@ def main():
                     )
 
                     if 'application/pdf' not in response.headers.get('Content-Type', ''):
+                        response.close()
                         raise ValueError(f"Unexpected content type: {response.headers.get('Content-Type')}")
 
                     os.makedirs(dir_path, exist_ok=True)
@@ -10,6 +10,10 @@ Usage:
     python3 build_structured_cache.py --cache-dir ~/fda-510k-data/extraction/cache
     python3 build_structured_cache.py --legacy ~/fda-510k-data/extraction/pdf_data.json
     python3 build_structured_cache.py --both  # Process both if available
+    python3 build_structured_cache.py --both --workers 8 --incremental
+    python3 build_structured_cache.py --both --format compact  # Section offsets, text stored once
+    python3 build_structured_cache.py --benchmark --cache-dir ~/fda-510k-data/extraction/cache
+    python3 build_structured_cache.py --benchmark --synthetic 50  # LOW-quality OCR text
 """
 
 import os
@@ -17,10 +21,21 @@ import sys
 import json
 import re
 import argparse
+import hashlib
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 from collections import Counter
+from functools import lru_cache
+
+# Import sibling modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fda_bulk_store import iter_json_object_items
+from structured_cache import (OUTPUT_FORMATS, RESERVED_FILES, document_paths, iter_documents,
+                             write_document)
 
 # Section detection patterns (Tier 1: Regex)
 # Expanded with Priority 3 enhancements (15 new section types)
@@ -173,6 +188,183 @@ SECTION_PATTERNS = {
     ),
 }
 
+# Keyword prefilter for SECTION_PATTERNS: every match of a pattern starts
+# (case-insensitively) with one of its keywords, so a single str.find() pass
+# per keyword over the case-folded text yields all candidate positions, and
+# the full pattern is only tried there. Keywords hold no whitespace, so they
+# also bound the Tier 2 lines with spaces removed. Update this table with the
+# patterns; test_structured_cache checks that it covers every alternative.
+SECTION_KEYWORDS = {
+    'predicate_se': (
+        'comparison', 'predicate', 'se', 'similarities', 'substantial', 'technological',
+    ),
+    'indications_for_use': ('approved', 'clinical', 'device', 'ifu', 'indication', 'intended'),
+    'device_description': ('description', 'device', 'physical', 'principle', 'product', 'system'),
+    'performance_testing': (
+        'analytical', 'bench', 'in', 'laboratory', 'mechanical', 'non', 'performance', 'test',
+        'validation', 'verification',
+    ),
+    'biocompatibility': (
+        'biocompatib', 'biologica', 'cytotoxicity', 'extractable', 'genotoxicity',
+        'hemocompatibility', 'implantation', 'irritation', 'iso', 'material', 'sensitization',
+        'systemic',
+    ),
+    'sterilization': (
+        'autoclave', 'e', 'electron', 'ethylene', 'gamma', 'iso', 'sal', 'steam',
+        'sterility', 'steriliz',
+    ),
+    'clinical_testing': (
+        'clinical', 'feasibility', 'human', 'literature', 'patient', 'pivotal', 'pmcf', 'post',
+    ),
+    'shelf_life': (
+        'accelerated', 'astm', 'expiration', 'package', 'real', 'shelf', 'stability', 'storage',
+    ),
+    'software': (
+        'algorithm', 'cybersecurity', 'firmware', 'iec', 'mobile', 'off', 'ots', 'sbom', 'sloc',
+        'software', 'soup', 'threat',
+    ),
+    'electrical_safety': (
+        'battery', 'electrical', 'electromagnetic', 'emc', 'emi', 'iec', 'radiation', 'rf', 'ul',
+        'wireless',
+    ),
+    'human_factors': ('formative', 'human', 'iec', 'simulated', 'summative', 'usability', 'use'),
+    'risk_management': ('failure', 'fault', 'fmea', 'hazard', 'iso', 'risk'),
+    'labeling': ('instruction', 'iso', 'label', 'package', 'udi', 'unique', 'user'),
+    'regulatory_history': (
+        '510', 'abbreviated', 'advisory', 'classification', 'de', 'pma', 'pre', 'product',
+        'regulation', 'regulatory', 'review', 'special', 'third',
+    ),
+    'reprocessing': (
+        'cleaning', 'disinfection', 'multi', 'protein', 'reprocessing', 'residual', 'reusable',
+        'validated', 'worst',
+    ),
+    'packaging': (
+        'astm', 'foil', 'package', 'packaging', 'peel', 'primary', 'secondary', 'sterile', 'tyvek',
+    ),
+    'materials': (
+        'chemical', 'cobalt', 'material', 'metal', 'nitinol', 'peek', 'polymer', 'raw', 'stainless',
+        'surface', 'titanium',
+    ),
+    'environmental_testing': (
+        'altitude', 'drop', 'environmental', 'humidity', 'ista', 'shock', 'temperature', 'transit',
+        'vibration',
+    ),
+    'mechanical_testing': (
+        'burst', 'compression', 'fatigue', 'flexural', 'leak', 'mechanical', 'tensile', 'torsion',
+        'wear',
+    ),
+    'functional_testing': ('acceptance', 'device', 'functional', 'operation', 'performance'),
+    'accelerated_aging': ('accelerated', 'aged', 'aging', 'astm', 'end', 'q10', 'real'),
+    'antimicrobial': (
+        'aatcc', 'antimicrobial', 'drug', 'iso', 'log', 'mbc', 'mic', 'minimum', 'zone',
+    ),
+    'emc_detailed': (
+        'conducted', 'electrostatic', 'esd', 'harmonic', 'iec', 'radiated', 'rf', 'surge',
+        'wireless',
+    ),
+    'mri_safety': (
+        'astm', 'image', 'magnetic', 'mri', 'rf', 'specific', 'static', 'whole',
+    ),
+    'animal_testing': (
+        'animal', 'canine', 'histopathology', 'iacuc', 'in', 'necropsy', 'ovine', 'porcine', 'pre',
+        'survival',
+    ),
+    'literature_review': (
+        'literature', 'meta', 'peer', 'post', 'published', 'pubmed', 'scientific', 'systematic',
+    ),
+    'manufacturing': (
+        'design', 'device', 'dhf', 'dmr', 'iso', 'manufacturing', 'process', 'quality',
+    ),
+    'special_510k': ('compliance', 'consensus', 'declaration', 'design', 'doc', 'special'),
+}
+
+# Characters that IGNORECASE matches to ASCII letters but str.lower() does
+# not map to them; folding them keeps the prefilter exact and length-preserving
+_CASE_FOLD_FIXES = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's'})
+
+# Keywords as one alternation per pattern, for quick checks on short strings
+_PREFIX_RES = {name: re.compile('|'.join(map(re.escape, SECTION_KEYWORDS[name])))
+               if SECTION_KEYWORDS.get(name) else None
+               for name in SECTION_PATTERNS}
+
+
+def _case_fold(text: str) -> str:
+    return text.translate(_CASE_FOLD_FIXES).lower()
+
+
+def find_section_matches(text: str) -> List[Tuple[int, str, str, str]]:
+    """
+    Tier 1 matches of every SECTION_PATTERNS entry in one prefilter pass.
+
+    Returns the same (start, matched_text, section_name, 'tier1') tuples, in
+    the same order, as running finditer() for each pattern in turn.
+    """
+    folded = _case_fold(text)
+    if len(folded) != len(text):
+        return scan_sections_naive(text)
+
+    positions_by_prefix = {}
+    matches = []
+    for section_name, pattern in SECTION_PATTERNS.items():
+        prefixes = SECTION_KEYWORDS.get(section_name)
+        if not prefixes:
+            matches.extend((m.start(), m.group(), section_name, 'tier1')
+                           for m in pattern.finditer(text))
+            continue
+
+        candidates = set()
+        for prefix in prefixes:
+            positions = positions_by_prefix.get(prefix)
+            if positions is None:
+                positions = []
+                pos = folded.find(prefix)
+                while pos >= 0:
+                    positions.append(pos)
+                    pos = folded.find(prefix, pos + 1)
+                positions_by_prefix[prefix] = positions
+            candidates.update(positions)
+
+        # Same non-overlapping, leftmost-first semantics as finditer()
+        next_start = 0
+        for pos in sorted(candidates):
+            if pos < next_start:
+                continue
+            m = pattern.match(text, pos)
+            if m:
+                matches.append((pos, m.group(), section_name, 'tier1'))
+                next_start = max(m.end(), pos + 1)
+    return matches
+
+
+def scan_sections_naive(text: str) -> List[Tuple[int, str, str, str]]:
+    """Reference Tier 1 scan: one finditer() pass over text per pattern."""
+    matches = []
+    for section_name, pattern in SECTION_PATTERNS.items():
+        for match in pattern.finditer(text):
+            matches.append((match.start(), match.group(), section_name, 'tier1'))
+    return matches
+
+
+@lru_cache(maxsize=65536)
+def matching_sections(text: str) -> Tuple[str, ...]:
+    """
+    Sections whose pattern matches anywhere in a short string (Tier 2).
+
+    Returns names in SECTION_PATTERNS order. Results are cached, since the
+    same header lines and word pairs recur across documents.
+    """
+    folded = _case_fold(text)
+    exact = len(folded) == len(text)
+    names = []
+    for section_name, pattern in SECTION_PATTERNS.items():
+        prefix_re = _PREFIX_RES[section_name]
+        if exact and prefix_re is not None and not prefix_re.search(folded):
+            continue
+        if pattern.search(text):
+            names.append(section_name)
+    return tuple(names)
+
+
 # Tier 2: OCR Correction Table (from section-patterns.md)
 OCR_SUBSTITUTIONS = {
     '1': 'I',  # "1ndications" → "Indications"
@@ -217,17 +409,139 @@ def apply_ocr_corrections(text: str, max_corrections: int = 2) -> Tuple[str, Lis
     for part1, part2 in matches:
         combined = part1 + part2
         # Check if combined version matches any section pattern
-        for section_name, pattern in SECTION_PATTERNS.items():
-            if pattern.search(combined):
-                old = corrected
-                corrected = corrected.replace(f"{part1} {part2}", combined)
-                if corrected != old:
-                    corrections.append(f"space removal: '{part1} {part2}'→'{combined}'")
-                    break
+        for section_name in matching_sections(combined):
+            old = corrected
+            corrected = corrected.replace(f"{part1} {part2}", combined)
+            if corrected != old:
+                corrections.append(f"space removal: '{part1} {part2}'→'{combined}'")
+                break
 
     return corrected, corrections
 
 
+# Each OCR character folded to the letter apply_ocr_corrections() makes of it
+_OCR_CANONICAL = str.maketrans({ocr_char: correct_char.lower()
+                                for ocr_char, correct_char in OCR_SUBSTITUTIONS.items()})
+
+
+def _ocr_skeleton(text: str) -> str:
+    """Case-folded text with whitespace removed and OCR characters as letters."""
+    return ''.join(_case_fold(text).split()).translate(_OCR_CANONICAL)
+
+
+def _trie_regex(words) -> str:
+    """Regex matching any of words, factored into a trie so re scans it quickly."""
+    trie = {}
+    for word in words:
+        node = trie
+        for c in word:
+            node = node.setdefault(c, {})
+        node[''] = {}
+
+    def build(node):
+        if '' in node:
+            return ''  # A shorter word already matches here
+        branches = [re.escape(c) + build(child) for c, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    return build(trie)
+
+
+def _tier2_prefilter():
+    """
+    Regex one of whose matches every line's _ocr_skeleton() must contain
+    for some pattern to match the line after OCR correction.
+
+    Corrections only turn OCR characters into letters and remove spaces, so
+    a section keyword in a corrected line and the same stretch of the
+    original line have the same skeleton.
+    """
+    if not all(SECTION_KEYWORDS.get(name) for name in SECTION_PATTERNS):
+        return None  # Can't bound the matches; check every line
+    return re.compile(_trie_regex({_ocr_skeleton(keyword) for name in SECTION_PATTERNS
+                                   for keyword in SECTION_KEYWORDS[name]}))
+
+
+_TIER2_PREFILTER = _tier2_prefilter()
+
+
+@lru_cache(maxsize=65536)
+def tier2_line_sections(line: str) -> Tuple[Tuple[str, ...], str, Tuple[str, ...]]:
+    """
+    Tier 2 result for one stripped header-like line.
+
+    Lines that cannot contain a section keyword even after correction are
+    rejected before apply_ocr_corrections() runs. Results are cached, since
+    page headers and section titles repeat within and across documents.
+
+    Returns:
+        (section_names, corrected_line, corrections) - no names when no
+        correction was made or the corrected line matches no pattern
+    """
+    if _TIER2_PREFILTER is not None and not _TIER2_PREFILTER.search(_ocr_skeleton(line)):
+        return (), line, ()
+    corrected, corrections = apply_ocr_corrections(line)
+    if not corrections:  # Only check if corrections were made
+        return (), corrected, ()
+    return matching_sections(corrected), corrected, tuple(corrections)
+
+
+def find_tier2_matches(text: str) -> Tuple[List[Tuple], List[Dict]]:
+    """
+    Tier 2: match OCR-corrected short header-like lines, in one pass.
+
+    Returns:
+        (matches, corrections) - matches are (line_start, line, section_name,
+        'tier2', corrections) tuples; corrections lists what was corrected
+        for each match
+    """
+    matches = []
+    corrections_applied = []
+    pos = 0
+    length = len(text)
+    while pos <= length:
+        end = text.find('\n', pos)
+        if end < 0:
+            end = length
+        line = text[pos:end].strip()
+        if 0 < len(line) < 80:  # Header-like lines
+            names, corrected, corrections = tier2_line_sections(line)
+            for section_name in names:
+                matches.append((pos, line, section_name, 'tier2', list(corrections)))
+                corrections_applied.append({
+                    'section': section_name,
+                    'original': line,
+                    'corrected': corrected,
+                    'corrections': list(corrections)
+                })
+        pos = end + 1
+    return matches, corrections_applied
+
+
+def scan_tier2_naive(text: str) -> Tuple[List[Tuple], List[Dict]]:
+    """Reference Tier 2 scan (split, correct every short line, text.find); see find_tier2_matches()."""
+    matches = []
+    corrections_applied = []
+    current_pos = 0
+    for line in text.split('\n'):
+        if len(line.strip()) > 0 and len(line.strip()) < 80:
+            corrected_line, corrections = apply_ocr_corrections(line.strip())
+            if corrections:
+                for section_name in matching_sections(corrected_line):
+                    line_pos = text.find(line, current_pos)
+                    if line_pos >= 0:
+                        matches.append((line_pos, line.strip(), section_name, 'tier2',
+                                        corrections))
+                        corrections_applied.append({
+                            'section': section_name,
+                            'original': line.strip(),
+                            'corrected': corrected_line,
+                            'corrections': corrections
+                        })
+        current_pos += len(line) + 1
+    return matches, corrections_applied
+
+
 def estimate_ocr_quality(text: str) -> Tuple[str, float]:
     """
     Estimate OCR quality based on common OCR error patterns.
@@ -294,44 +608,13 @@ def detect_sections(text: str, apply_ocr_correction: bool = True) -> Tuple[Dict[
     ocr_quality, ocr_confidence = estimate_ocr_quality(text)
 
     # Tier 1: Direct regex matching (no corrections)
-    matches_tier1 = []
-    for section_name, pattern in SECTION_PATTERNS.items():
-        for match in pattern.finditer(text):
-            matches_tier1.append((match.start(), match.group(), section_name, 'tier1'))
+    matches_tier1 = find_section_matches(text)
 
     # Tier 2: OCR-corrected matching (if enabled and OCR quality is not HIGH)
     matches_tier2 = []
     if apply_ocr_correction and ocr_quality != "HIGH":
         # Apply OCR corrections to short header-like lines
-        lines = text.split('\n')
-        current_pos = 0
-
-        for line in lines:
-            if len(line.strip()) > 0 and len(line.strip()) < 80:  # Header-like lines
-                corrected_line, corrections = apply_ocr_corrections(line.strip())
-
-                if corrections:  # Only check if corrections were made
-                    # Check if corrected line matches any pattern
-                    for section_name, pattern in SECTION_PATTERNS.items():
-                        if pattern.search(corrected_line):
-                            # Find position of this line in original text
-                            line_pos = text.find(line, current_pos)
-                            if line_pos >= 0:
-                                matches_tier2.append((
-                                    line_pos,
-                                    line.strip(),
-                                    section_name,
-                                    'tier2',
-                                    corrections
-                                ))
-                                tier2_corrections.append({
-                                    'section': section_name,
-                                    'original': line.strip(),
-                                    'corrected': corrected_line,
-                                    'corrections': corrections
-                                })
-
-            current_pos += len(line) + 1  # +1 for newline
+        matches_tier2, tier2_corrections = find_tier2_matches(text)
 
     # Combine Tier 1 and Tier 2 matches (Tier 1 takes precedence)
     all_matches = matches_tier1 + matches_tier2
@@ -397,18 +680,132 @@ def detect_sections(text: str, apply_ocr_correction: bool = True) -> Tuple[Dict[
     return sections, metadata
 
 
-def build_structured_cache(source_path: Path, output_dir: Path, source_type: str = 'per-device'):
+# Version of the detect_sections() output. Bump it whenever detection changes so
+# --incremental rebuilds every device instead of skipping it as unchanged.
+DETECTOR_VERSION = 2
+
+# Build state (source hash and stats per device) kept in the output directory
+BUILD_STATE_DB = '.build_state.db'
+
+# Devices recorded between build state commits
+CHECKPOINT_EVERY = 200
+
+_BUILD_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    k_number TEXT PRIMARY KEY,
+    source_hash TEXT NOT NULL,
+    detector_version INTEGER NOT NULL,
+    structured_at TEXT NOT NULL,
+    output_format TEXT NOT NULL DEFAULT 'full'
+);
+CREATE TABLE IF NOT EXISTS device_stats (
+    k_number TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    stats TEXT NOT NULL
+);
+"""
+
+
+def source_hash(text: str) -> str:
+    """SHA-256 of a document's source text."""
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def device_stats(structured: Dict) -> Dict:
+    """The fields of a structured document that generate_coverage_manifest() uses."""
+    return {
+        'full_text_length': structured['full_text_length'],
+        'section_count': structured['section_count'],
+        'ocr_quality': structured.get('ocr_quality', 'UNKNOWN'),
+        'ocr_confidence': structured.get('ocr_confidence', 0.0),
+        'tier1_sections': structured.get('tier1_sections', 0),
+        'tier2_sections': structured.get('tier2_sections', 0),
+    }
+
+
+class BuildState:
     """
-    Build structured cache from source PDF text data.
+    Per-device build state of a structured cache.
 
-    Args:
-        source_path: Path to source data (index.json or pdf_data.json)
-        output_dir: Path to structured cache output directory
-        source_type: 'per-device' or 'legacy'
+    Records each device's source hash and detector version, and the
+    device_stats() of its structured file with that file's mtime and size.
+    Stored in SQLite next to the structured files and committed every
+    CHECKPOINT_EVERY devices, so an interrupted build loses at most that
+    many records and an --incremental re-run resumes where it stopped.
     """
-    output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Load source data
+    def __init__(self, output_dir: Path):
+        self.path = output_dir / BUILD_STATE_DB
+        self._conn = sqlite3.connect(str(self.path), timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_BUILD_STATE_SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(devices)")]
+        if 'output_format' not in columns:  # State written before compact output existed
+            self._conn.execute("ALTER TABLE devices ADD COLUMN output_format TEXT NOT NULL "
+                               "DEFAULT 'full'")
+        self._pending = 0
+
+    def previous_hash(self, k_number: str, output_format: str = 'full') -> Optional[str]:
+        """Source hash of the device's last build by this detector version and format."""
+        row = self._conn.execute(
+            "SELECT source_hash FROM devices WHERE k_number = ? AND detector_version = ? "
+            "AND output_format = ?", (k_number, DETECTOR_VERSION, output_format)).fetchone()
+        return row[0] if row else None
+
+    def record(self, k_number: str, source_hash: str, output_format: str = 'full'):
+        """Record a device as built from source_hash."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO devices "
+            "(k_number, source_hash, detector_version, structured_at, output_format) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (k_number, source_hash, DETECTOR_VERSION, datetime.now().isoformat(), output_format))
+        self._pending += 1
+        if self._pending >= CHECKPOINT_EVERY:
+            self.checkpoint()
+
+    def put_stats(self, k_number: str, mtime_ns: int, size: int, stats: Dict):
+        """Record the stats of a device's structured file (as of mtime_ns and size)."""
+        self._conn.execute("INSERT OR REPLACE INTO device_stats VALUES (?, ?, ?, ?)",
+                           (k_number, mtime_ns, size, json.dumps(stats)))
+
+    def all_stats(self) -> Dict[str, Tuple[int, int, Dict]]:
+        """K-number -> (mtime_ns, size, stats) for every recorded device."""
+        return {k: (mtime_ns, size, json.loads(stats)) for k, mtime_ns, size, stats in
+                self._conn.execute("SELECT k_number, mtime_ns, size, stats FROM device_stats")}
+
+    def drop_stats(self, k_numbers):
+        """Forget the stats of devices whose structured files are gone."""
+        self._conn.executemany("DELETE FROM device_stats WHERE k_number = ?",
+                               [(k,) for k in k_numbers])
+
+    def checkpoint(self):
+        """Commit recorded devices."""
+        self._conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.checkpoint()
+        self._conn.close()
+
+
+def legacy_text(content) -> str:
+    """Text of a pdf_data.json entry (a dict with 'text', or the text itself)."""
+    # Handle different content formats
+    if isinstance(content, dict):
+        return content.get('text', '')
+    return str(content)
+
+
+def iter_build_tasks(source_path: Path, source_type: str):
+    """
+    Yield one build task per device in a source cache.
+
+    Per-device tasks carry the device file path (workers read it); legacy
+    tasks carry the text itself. pdf_data.json is streamed one entry at a
+    time, so memory does not grow with the size of the legacy file.
+    """
     if source_type == 'per-device':
         with open(source_path) as f:
             index = json.load(f)
@@ -416,112 +813,245 @@ def build_structured_cache(source_path: Path, output_dir: Path, source_type: str
         print(f"Processing {len(index)} devices from per-device cache...")
 
         for k_number, meta in index.items():
-            device_path = source_path.parent.parent / meta['file_path']
-            if not device_path.exists():
-                print(f"  ⚠ Missing: {k_number} (expected at {device_path})")
-                continue
+            yield {
+                'k_number': k_number,
+                'source': 'per-device-cache',
+                'device_path': str(source_path.parent.parent / meta['file_path']),
+                'extracted_at': meta.get('extracted_at', 'unknown'),
+            }
 
-            with open(device_path) as f:
-                device_data = json.load(f)
+    elif source_type == 'legacy':
+        print("Processing PDFs from legacy cache (streaming)...")
 
-            text = device_data.get('text', '')
-            if not text:
-                print(f"  ⚠ Empty: {k_number}")
-                continue
+        with open(source_path, 'rb') as f:
+            for filename, content in iter_json_object_items(f):
+                yield {
+                    'k_number': filename.replace('.pdf', '').upper(),
+                    'source': 'legacy-pdf_data.json',
+                    'source_path': str(source_path),
+                    'text': legacy_text(content),
+                }
 
-            # Detect sections with OCR correction and quality assessment
-            sections, detection_metadata = detect_sections(text)
+    else:
+        raise ValueError(f"Unknown source_type: {source_type}")
 
-            # Build structured output
-            structured = {
-                'k_number': k_number,
-                'source': 'per-device-cache',
-                'source_path': str(device_path),
-                'extracted_at': device_data.get('extracted_at', meta.get('extracted_at', 'unknown')),
-                'structured_at': datetime.now().isoformat(),
-                'full_text': text,
-                'full_text_length': len(text),
-                'sections': sections,
-                'section_count': len(sections),
-                'ocr_quality': detection_metadata['ocr_quality'],
-                'ocr_confidence': detection_metadata['ocr_confidence'],
-                'tier1_sections': detection_metadata['tier1_sections'],
-                'tier2_sections': detection_metadata['tier2_sections'],
-                'tier2_corrections': detection_metadata.get('tier2_corrections'),
-                'metadata': device_data.get('metadata', {})
-            }
 
-            # Write structured file
-            output_file = output_dir / f"{k_number}.json"
-            with open(output_file, 'w') as f:
-                json.dump(structured, f, indent=2)
+def build_device(task: Dict, output_dir: Path, previous_hash: Optional[str] = None,
+                 output_format: str = 'full') -> Dict:
+    """
+    Detect sections for one device and write its structured file.
 
-            print(f"  ✓ {k_number}: {len(text)} chars, {len(sections)} sections")
+    Runs in pool workers, so it reads the source and writes the output itself
+    and returns only a small result.
 
-    elif source_type == 'legacy':
-        with open(source_path) as f:
-            pdf_data = json.load(f)
+    Args:
+        task: Build task from iter_build_tasks()
+        output_dir: Structured cache output directory
+        previous_hash: Source hash of the existing output; the device is
+            skipped as 'unchanged' when the source still has this hash
+        output_format: 'full', 'compact' or 'compact-gzip' (see structured_cache)
 
-        print(f"Processing {len(pdf_data)} PDFs from legacy cache...")
+    Returns:
+        Dict with k_number, status ('built', 'unchanged', 'missing', 'empty'
+        or 'failed'), and chars, sections, source_hash, stats, mtime_ns and
+        size (of the written file) or error
+    """
+    k_number = task['k_number']
+    result = {'k_number': k_number}
+    try:
+        if 'device_path' in task:
+            device_path = Path(task['device_path'])
+            if not device_path.exists():
+                return dict(result, status='missing', path=str(device_path))
+            with open(device_path) as f:
+                device_data = json.load(f)
+            text = device_data.get('text', '')
+            source_path = str(device_path)
+            extracted_at = device_data.get('extracted_at', task['extracted_at'])
+            metadata = device_data.get('metadata', {})
+        else:
+            text = task['text']
+            source_path = task['source_path']
+            extracted_at = 'unknown'
+            metadata = {}
+
+        if not text:
+            return dict(result, status='empty')
+        digest = source_hash(text)
+        if digest == previous_hash:
+            return dict(result, status='unchanged', source_hash=digest)
+
+        # Detect sections with OCR correction and quality assessment
+        sections, detection_metadata = detect_sections(text)
+
+        # Build structured output
+        structured = {
+            'k_number': k_number,
+            'source': task['source'],
+            'source_path': source_path,
+            'extracted_at': extracted_at,
+            'structured_at': datetime.now().isoformat(),
+            'source_hash': digest,
+            'detector_version': DETECTOR_VERSION,
+            'full_text': text,
+            'full_text_length': len(text),
+            'sections': sections,
+            'section_count': len(sections),
+            'ocr_quality': detection_metadata['ocr_quality'],
+            'ocr_confidence': detection_metadata['ocr_confidence'],
+            'tier1_sections': detection_metadata['tier1_sections'],
+            'tier2_sections': detection_metadata['tier2_sections'],
+            'tier2_corrections': detection_metadata.get('tier2_corrections'),
+            'metadata': metadata
+        }
 
-        for filename, content in pdf_data.items():
-            # Extract K-number from filename
-            k_number = filename.replace('.pdf', '').upper()
+        # Write structured file (atomically, so an interrupted build never
+        # leaves a truncated one)
+        written = os.stat(write_document(output_dir, structured, output_format))
+    except Exception as e:
+        return dict(result, status='failed', error=f"{type(e).__name__}: {e}")
 
-            # Handle different content formats
-            if isinstance(content, dict):
-                text = content.get('text', '')
-            else:
-                text = str(content)
+    return dict(result, status='built', chars=len(text), sections=len(sections),
+                source_hash=digest, stats=device_stats(structured),
+                mtime_ns=written.st_mtime_ns, size=written.st_size)
+
+
+def _run_builds(tasks, output_dir: Path, previous_hash, workers: int, output_format: str):
+    """Yield build_device() results, in a process pool when workers > 1.
 
-            if not text:
+    At most workers * 4 tasks are in flight, so memory stays bounded however
+    many tasks the source yields.
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield build_device(task, output_dir, previous_hash(task['k_number']), output_format)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = set()
+    try:
+        for task in tasks:
+            pending.add(pool.submit(build_device, task, output_dir,
+                                    previous_hash(task['k_number']), output_format))
+            if len(pending) >= workers * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def build_structured_cache(source_path: Path, output_dir: Path, source_type: str = 'per-device',
+                           workers: int = 1, incremental: bool = False,
+                           output_format: str = 'full') -> Dict[str, int]:
+    """
+    Build structured cache from source PDF text data.
+
+    Args:
+        source_path: Path to source data (index.json or pdf_data.json)
+        output_dir: Path to structured cache output directory
+        source_type: 'per-device' or 'legacy'
+        workers: Worker processes for section detection (1 = in-process)
+        incremental: Skip devices whose source text and detector version
+            are unchanged since their structured file was written
+        output_format: 'full' (text per section, the original layout),
+            'compact' (section offsets + texts/{K}.txt) or 'compact-gzip'
+            (texts/{K}.txt.gz)
+
+    Returns:
+        Count of devices per result status (built, unchanged, missing, empty, failed)
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    state = BuildState(output_dir)
+
+    def previous_hash(k_number):
+        # A device is only unchanged if all of its files are still there
+        if not incremental or not all(
+                path.exists() for path in document_paths(output_dir, k_number, output_format)):
+            return None
+        return state.previous_hash(k_number, output_format)
+
+    counts = Counter()
+    try:
+        for result in _run_builds(iter_build_tasks(source_path, source_type), output_dir,
+                                  previous_hash, workers, output_format):
+            k_number, status = result['k_number'], result['status']
+            counts[status] += 1
+            if status == 'built':
+                state.record(k_number, result['source_hash'], output_format)
+                state.put_stats(k_number, result['mtime_ns'], result['size'], result['stats'])
+                print(f"  ✓ {k_number}: {result['chars']} chars, {result['sections']} sections")
+            elif status == 'missing':
+                print(f"  ⚠ Missing: {k_number} (expected at {result['path']})")
+            elif status == 'empty':
                 print(f"  ⚠ Empty: {k_number}")
-                continue
+            elif status == 'failed':
+                print(f"  ✗ Failed: {k_number} ({result['error']})")
+    finally:
+        state.close()
 
-            # Detect sections with OCR correction and quality assessment
-            sections, detection_metadata = detect_sections(text)
+    if incremental:
+        print(f"  Built {counts['built']}, skipped {counts['unchanged']} unchanged")
+    return dict(counts)
 
-            # Build structured output
-            structured = {
-                'k_number': k_number,
-                'source': 'legacy-pdf_data.json',
-                'source_path': str(source_path),
-                'extracted_at': 'unknown',
-                'structured_at': datetime.now().isoformat(),
-                'full_text': text,
-                'full_text_length': len(text),
-                'sections': sections,
-                'section_count': len(sections),
-                'ocr_quality': detection_metadata['ocr_quality'],
-                'ocr_confidence': detection_metadata['ocr_confidence'],
-                'tier1_sections': detection_metadata['tier1_sections'],
-                'tier2_sections': detection_metadata['tier2_sections'],
-                'tier2_corrections': detection_metadata.get('tier2_corrections'),
-                'metadata': {}
-            }
 
-            # Write structured file
-            output_file = output_dir / f"{k_number}.json"
-            with open(output_file, 'w') as f:
-                json.dump(structured, f, indent=2)
+def load_device_stats(structured_dir: Path) -> Tuple[List[Dict], int]:
+    """
+    device_stats() of every structured file, from the build state.
 
-            print(f"  ✓ {k_number}: {len(text)} chars, {len(sections)} sections")
+    Only files that are not in the build state, or whose mtime or size
+    changed since their stats were recorded (written by something other
+    than build_structured_cache), are read; their stats are recorded for
+    next time. Stats of deleted files are dropped.
 
-    else:
-        raise ValueError(f"Unknown source_type: {source_type}")
+    Returns:
+        (stats list, number of structured files that had to be read)
+    """
+    state = BuildState(structured_dir)
+    try:
+        recorded = state.all_stats()
+        all_stats = []
+        found = set()
+        reread = 0
+        with os.scandir(structured_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json') or entry.name in RESERVED_FILES:
+                    continue
+                k_number = entry.name[:-len('.json')]
+                found.add(k_number)
+                st = entry.stat()
+                mtime_ns, size, stats = recorded.get(k_number, (None, None, None))
+                if (mtime_ns, size) != (st.st_mtime_ns, st.st_size):
+                    with open(entry.path) as f:
+                        stats = device_stats(json.load(f))
+                    state.put_stats(k_number, st.st_mtime_ns, st.st_size, stats)
+                    reread += 1
+                all_stats.append(stats)
+        state.drop_stats(set(recorded) - found)
+    finally:
+        state.close()
+    return all_stats, reread
 
 
 def generate_coverage_manifest(structured_dir: Path):
-    """Generate coverage manifest summarizing the structured cache with OCR quality metrics."""
+    """
+    Generate coverage manifest summarizing the structured cache with OCR quality metrics.
+
+    Built from the per-device stats in the build state (see
+    load_device_stats()), so structured files are not re-read.
+    """
 
-    structured_files = list(structured_dir.glob('*.json'))
-    if 'manifest.json' in [f.name for f in structured_files]:
-        structured_files = [f for f in structured_files if f.name != 'manifest.json']
+    all_stats, reread = load_device_stats(structured_dir)
 
-    print(f"\nGenerating coverage manifest for {len(structured_files)} files...")
+    print(f"\nGenerating coverage manifest for {len(all_stats)} files "
+          f"({reread} read, {len(all_stats) - reread} from build state)...")
 
     # Statistics
-    total_devices = len(structured_files)
+    total_devices = len(all_stats)
     total_chars = 0
     section_counts = Counter()
     extraction_quality = {'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
@@ -531,10 +1061,7 @@ def generate_coverage_manifest(structured_dir: Path):
     total_tier2 = 0
     ocr_confidence_sum = 0.0
 
-    for file_path in structured_files:
-        with open(file_path) as f:
-            data = json.load(f)
-
+    for data in all_stats:
         total_chars += data['full_text_length']
         section_counts[data['section_count']] += 1
 
@@ -547,15 +1074,15 @@ def generate_coverage_manifest(structured_dir: Path):
             extraction_quality['LOW'] += 1
 
         # OCR quality tracking (Priority 3)
-        ocr_quality = data.get('ocr_quality', 'UNKNOWN')
+        ocr_quality = data['ocr_quality']
         if ocr_quality in ocr_quality_counts:
             ocr_quality_counts[ocr_quality] += 1
 
-        ocr_confidence_sum += data.get('ocr_confidence', 0.0)
+        ocr_confidence_sum += data['ocr_confidence']
 
         # Tier usage tracking
-        tier1 = data.get('tier1_sections', 0)
-        tier2 = data.get('tier2_sections', 0)
+        tier1 = data['tier1_sections']
+        tier2 = data['tier2_sections']
         total_tier1 += tier1
         total_tier2 += tier2
 
@@ -623,6 +1150,135 @@ def generate_coverage_manifest(structured_dir: Path):
     print(f"    Devices needing Tier 2: {tier_usage['tier1_and_tier2'] + tier_usage['tier2_only']} ({round(100*(tier_usage['tier1_and_tier2'] + tier_usage['tier2_only'])/total_devices,1) if total_devices > 0 else 0}%)")
 
 
+def load_benchmark_texts(cache_dir: Optional[Path] = None, legacy: Optional[Path] = None,
+                         structured_dir: Optional[Path] = None, limit: int = 0) -> List[str]:
+    """Collect document texts for benchmark_section_detection().
+
+    Reads the per-device cache (cache_dir/index.json), a legacy
+    pdf_data.json, or the full_text of an existing structured cache.
+    """
+    texts = []
+    if cache_dir and (cache_dir / 'index.json').exists():
+        with open(cache_dir / 'index.json') as f:
+            index = json.load(f)
+        for meta in index.values():
+            device_path = cache_dir.parent / meta['file_path']
+            if device_path.exists():
+                with open(device_path) as f:
+                    texts.append(json.load(f).get('text', ''))
+    if legacy and legacy.exists() and not (limit and len(texts) >= limit):
+        with open(legacy, 'rb') as f:
+            for _, content in iter_json_object_items(f):
+                texts.append(legacy_text(content))
+                if limit and len(texts) >= limit:
+                    break
+    if structured_dir and structured_dir.exists() and not texts:
+        for doc in iter_documents(structured_dir):
+            texts.append(doc.read_text())
+    texts = [t for t in texts if t]
+    return texts[:limit] if limit else texts
+
+
+# Words and section titles for synthetic_ocr_texts()
+_SYNTHETIC_WORDS = (
+    'the device is a single use sterile catheter with a polymer shaft and a distal tip '
+    'tested to the same standards as the predicate under simulated use conditions with '
+    'results that met all acceptance criteria and raised no new questions of safety'
+).split()
+_SYNTHETIC_HEADERS = (
+    'Indications for Use', 'Device Description', 'Substantial Equivalence Discussion',
+    'Performance Testing', 'Biocompatibility', 'Sterilization', 'Shelf Life',
+    'Software Validation', 'Electrical Safety', 'Labeling', 'Clinical Testing',
+    'Risk Management', 'Predicate Device Comparison', 'Conclusions',
+)
+
+
+def synthetic_ocr_texts(count: int, lines: int = 600, seed: int = 0) -> List[str]:
+    """
+    Generate LOW-quality OCR documents for benchmarking Tier 2.
+
+    Short lines of filler and section titles, with OCR character errors
+    (the OCR_SUBSTITUTIONS table in reverse), split words and repeated
+    page headers.
+    """
+    import random
+    rnd = random.Random(seed)
+    errors = {}
+    for ocr_char, correct_char in OCR_SUBSTITUTIONS.items():
+        errors.setdefault(correct_char.lower(), []).append(ocr_char)
+
+    def garble(line):
+        chars = [rnd.choice(errors[c.lower()]) if c.lower() in errors and rnd.random() < 0.12
+                 else c for c in line]
+        line = ''.join(chars)
+        if rnd.random() < 0.2 and len(line) > 6:
+            cut = rnd.randrange(2, 4)
+            line = line[:cut] + ' ' + line[cut:]
+        return line
+
+    texts = []
+    for n in range(count):
+        out = []
+        for i in range(lines):
+            if i % 50 == 0:
+                out.append(garble(f"K{n:06d} 510(k) Summary Page {i // 50 + 1}"))
+            elif rnd.random() < 0.04:
+                out.append(garble(rnd.choice(_SYNTHETIC_HEADERS)))
+            else:
+                out.append(garble(' '.join(rnd.choice(_SYNTHETIC_WORDS)
+                                           for _ in range(rnd.randrange(4, 11)))))
+        texts.append('\n'.join(out))
+    return texts
+
+
+def benchmark_section_detection(texts: List[str]) -> Dict:
+    """
+    Time the single-pass prefilters against the reference scans.
+
+    Returns:
+        Dict with document and character counts, seconds for each Tier 1
+        and Tier 2 scan, the speedups, and whether both produced identical
+        matches.
+    """
+    matching_sections.cache_clear()
+    start = time.perf_counter()
+    reference = [scan_sections_naive(t) for t in texts]
+    naive_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    combined = [find_section_matches(t) for t in texts]
+    prefilter_seconds = time.perf_counter() - start
+
+    matching_sections.cache_clear()
+    start = time.perf_counter()
+    reference_tier2 = [scan_tier2_naive(t) for t in texts]
+    tier2_naive_seconds = time.perf_counter() - start
+
+    matching_sections.cache_clear()
+    tier2_line_sections.cache_clear()
+    start = time.perf_counter()
+    streamed_tier2 = [find_tier2_matches(t) for t in texts]
+    tier2_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for t in texts:
+        detect_sections(t)
+    detect_seconds = time.perf_counter() - start
+
+    return {
+        'documents': len(texts),
+        'chars': sum(len(t) for t in texts),
+        'naive_seconds': round(naive_seconds, 3),
+        'prefilter_seconds': round(prefilter_seconds, 3),
+        'speedup': round(naive_seconds / prefilter_seconds, 2) if prefilter_seconds else None,
+        'tier2_naive_seconds': round(tier2_naive_seconds, 3),
+        'tier2_seconds': round(tier2_seconds, 3),
+        'tier2_speedup': round(tier2_naive_seconds / tier2_seconds, 2) if tier2_seconds else None,
+        'detect_sections_seconds': round(detect_seconds, 3),
+        'identical': reference == combined and reference_tier2 == streamed_tier2,
+    }
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Build structured text cache with section detection'
@@ -633,12 +1289,49 @@ def main():
                         help='Legacy monolithic pdf_data.json file')
     parser.add_argument('--both', action='store_true',
                         help='Process both caches if available')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes for section detection (default: 1)')
+    parser.add_argument('--format', dest='output_format', choices=OUTPUT_FORMATS,
+                        default='full',
+                        help='Structured file layout: full (text per section, default), compact '
+                             '(section offsets, text stored once) or compact-gzip (text '
+                             'gzip-compressed); readers of the compact layouts must use '
+                             'structured_cache.read_document')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Skip devices whose source text and detector version are unchanged '
+                             '(also resumes an interrupted build)')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Time section detection on --cache-dir / --legacy (or the existing '
+                             '--output cache) instead of building')
+    parser.add_argument('--limit', type=int, default=0,
+                        help='Max documents for --benchmark (default: all)')
+    parser.add_argument('--synthetic', type=int, default=0, metavar='N',
+                        help='Benchmark on N generated LOW-quality OCR documents instead')
     parser.add_argument('--output', type=Path,
                         default=Path.home() / 'fda-510k-data' / 'extraction' / 'structured_text_cache',
                         help='Output directory for structured cache (default: ~/fda-510k-data/extraction/structured_text_cache)')
 
     args = parser.parse_args()
 
+    if args.benchmark:
+        if args.synthetic:
+            texts = synthetic_ocr_texts(args.synthetic)
+        else:
+            texts = load_benchmark_texts(args.cache_dir, args.legacy, args.output, args.limit)
+        if not texts:
+            parser.error('No documents found for --benchmark')
+        result = benchmark_section_detection(texts)
+        print(f"Documents: {result['documents']} ({result['chars']:,} chars)")
+        print(f"Tier 1 per-pattern scan:   {result['naive_seconds']:.3f}s")
+        print(f"Tier 1 prefilter scan:     {result['prefilter_seconds']:.3f}s "
+              f"({result['speedup']}x)")
+        print(f"Tier 2 line-by-line scan:  {result['tier2_naive_seconds']:.3f}s")
+        print(f"Tier 2 streaming scan:     {result['tier2_seconds']:.3f}s "
+              f"({result['tier2_speedup']}x)")
+        print(f"detect_sections (total):   {result['detect_sections_seconds']:.3f}s")
+        print(f"Identical matches: {'yes' if result['identical'] else 'NO'}")
+        return
+
     if not (args.cache_dir or args.legacy or args.both):
         parser.error('Must specify --cache-dir, --legacy, or --both')
 
@@ -654,7 +1347,9 @@ def main():
 
         if index_file.exists():
             print(f"Processing per-device cache: {cache_dir}")
-            build_structured_cache(index_file, args.output, source_type='per-device')
+            build_structured_cache(index_file, args.output, source_type='per-device',
+                                   workers=args.workers, incremental=args.incremental,
+                                   output_format=args.output_format)
         else:
             print(f"⚠ Per-device cache not found at {index_file}")
 
@@ -664,7 +1359,9 @@ def main():
 
         if legacy_file.exists():
             print(f"Processing legacy cache: {legacy_file}")
-            build_structured_cache(legacy_file, args.output, source_type='legacy')
+            build_structured_cache(legacy_file, args.output, source_type='legacy',
+                                   workers=args.workers, incremental=args.incremental,
+                                   output_format=args.output_format)
         else:
             print(f"⚠ Legacy cache not found at {legacy_file}")
 
@@ -0,0 +1,1052 @@
+#!/usr/bin/env python3
+"""
+Storage backends for the openFDA API response cache.
+
+FDAClient stores every API response under a short hash of its endpoint and
+params. Two interchangeable backends are provided:
+
+    SQLiteCacheStore  Single-file SQLite database (WAL mode) with indexed
+                      cached_at/endpoint columns. Stats, expiry sweeps and
+                      lookups are indexed queries, and several processes can
+                      share one cache safely. Payloads are compressed (zstd
+                      when the zstandard package is installed, else zlib)
+                      and the database is held under a size cap by LRU or
+                      LFU eviction, with periodic background compaction.
+                      Default.
+    FileCacheStore    Legacy layout: one {cache_key}.json file per response.
+
+Both expose the same small interface (get/set/stats/clear/clear_expired) so
+FDAClient does not care which one is active. MemoryLRU is an in-process tier
+that FDAClient puts in front of either backend so repeated lookups within
+one process skip the disk read and JSON decode. FetchLeases gives FDAClient
+cross-process single-flight fetches: one process fetches a missing key
+while the others wait for its result to land in the shared cache.
+
+Usage:
+    from fda_api_cache import open_cache_store
+
+    store = open_cache_store("~/fda-510k-data/api_cache", backend="sqlite")
+    store.set("abc123", {"results": []}, endpoint="510k")
+    cached_at, data = store.get("abc123")
+"""
+
+import json
+import os
+import re
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # zlib (stdlib) is used instead
+    zstandard = None
+
+
+# Backend names accepted by open_cache_store()
+BACKEND_SQLITE = "sqlite"
+BACKEND_FILES = "files"
+BACKENDS = (BACKEND_SQLITE, BACKEND_FILES)
+DEFAULT_BACKEND = BACKEND_SQLITE
+
+# SQLite database filename inside the cache directory
+SQLITE_FILENAME = "api_cache.db"
+
+# Payload compression codecs. Rows record the codec they were written
+# with, so a cache written with zstd stays readable after switching to zlib
+# (and vice versa, when zstandard is installed).
+CODEC_NONE = "none"
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+CODECS = (CODEC_NONE, CODEC_ZLIB, CODEC_ZSTD)
+
+# Payloads smaller than this are stored as plain JSON text
+COMPRESS_MIN_BYTES = 1024
+
+# Default cap on stored payload bytes (0 disables the cap). Eviction runs
+# down to EVICT_LOW_WATERMARK of the cap so it does not trigger on every write.
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+EVICT_LOW_WATERMARK = 0.9
+
+# Eviction order when the cap is exceeded: least recently or least
+# frequently read entries go first
+EVICTION_LRU = "lru"
+EVICTION_LFU = "lfu"
+EVICTION_POLICIES = (EVICTION_LRU, EVICTION_LFU)
+
+# Reads are recorded in memory and written back in batches of this size
+ACCESS_FLUSH_EVERY = 64
+
+# Background compaction (recompress + VACUUM) runs at most this often
+COMPACT_INTERVAL = 7 * 24 * 60 * 60
+
+# Seconds after which a fetch lease is presumed abandoned. Covers the worst
+# case FDAClient fetch (3 attempts x 15 s timeout plus backoff).
+LEASE_TIMEOUT = 90
+
+# Seconds between checks while waiting on another process's lease
+LEASE_POLL_INTERVAL = 0.05
+
+LEASE_DIRNAME = ".leases"
+
+# In-memory tier bounds (per FDAClient instance)
+MEMORY_MAX_ENTRIES = 512
+MEMORY_MAX_BYTES = 64 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    cache_key TEXT PRIMARY KEY,
+    endpoint  TEXT,
+    cached_at REAL NOT NULL,
+    size      INTEGER NOT NULL DEFAULT 0,
+    data      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_cached_at ON responses (cached_at, size);
+CREATE INDEX IF NOT EXISTS idx_responses_endpoint ON responses (endpoint);
+CREATE TABLE IF NOT EXISTS cache_meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns added after the first release of the SQLite cache. size is the
+# stored (possibly compressed) byte count; raw_size is the JSON length.
+_ADDED_COLUMNS = (
+    ("codec", "TEXT NOT NULL DEFAULT ''"),
+    ("raw_size", "INTEGER NOT NULL DEFAULT 0"),
+    ("last_access", "REAL NOT NULL DEFAULT 0"),
+    ("hits", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+
+def default_codec():
+    """zstd when the zstandard package is installed, otherwise zlib."""
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def encode_payload(payload, codec):
+    """Compress a JSON string for storage.
+
+    Returns:
+        (codec, value, size): codec is '' for plain text, value is the str
+        or bytes to store and size its length in bytes.
+    """
+    raw = payload.encode()
+    if codec == CODEC_NONE or len(raw) < COMPRESS_MIN_BYTES:
+        return "", payload, len(raw)
+    if codec == CODEC_ZSTD and zstandard is not None:
+        blob = zstandard.ZstdCompressor(level=3).compress(raw)
+    else:
+        codec = CODEC_ZLIB
+        blob = zlib.compress(raw, 6)
+    return codec, blob, len(blob)
+
+
+def decode_payload(codec, value):
+    """Inverse of encode_payload(). Raises ValueError if undecodable."""
+    if not codec:
+        return json.loads(value)
+    if codec == CODEC_ZLIB:
+        raw = zlib.decompress(value)
+    elif codec == CODEC_ZSTD and zstandard is not None:
+        raw = zstandard.ZstdDecompressor().decompress(value)
+    else:
+        raise ValueError(f"Cannot decode cache payload compressed with {codec}")
+    return json.loads(raw)
+
+
+class MemoryLRU:
+    """Thread-safe in-process LRU bounded by entry count and approximate bytes.
+
+    Entries are (cached_at, data) pairs keyed like the disk cache. The size
+    of an entry is the length of its JSON encoding, which tracks the disk
+    payload closely. Cached objects are returned as-is, so callers must
+    treat them as read-only.
+    """
+
+    def __init__(self, max_entries=MEMORY_MAX_ENTRIES, max_bytes=MEMORY_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, cache_key):
+        """Return (cached_at, data) and mark the entry most recently used."""
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, cache_key, data, cached_at, size=None):
+        """Insert or replace an entry, evicting least recently used ones."""
+        if not self.enabled:
+            return
+        if size is None:
+            size = len(json.dumps(data))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(cache_key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[cache_key] = (cached_at, data, size)
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[2]
+                self.evictions += 1
+
+    def delete(self, cache_key):
+        with self._lock:
+            old = self._entries.pop(cache_key, None)
+            if old is not None:
+                self._bytes -= old[2]
+
+    def clear(self, older_than=None):
+        """Drop all entries, or only those cached before older_than."""
+        with self._lock:
+            if older_than is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            for key in [k for k, v in self._entries.items() if v[0] < older_than]:
+                self._bytes -= self._entries.pop(key)[2]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+class FileCacheStore:
+    """One JSON file per cache key (the original cache layout).
+
+    Files are not compressed; the size cap evicts the oldest files first.
+    """
+
+    backend = BACKEND_FILES
+    codec = CODEC_NONE
+    eviction = EVICTION_LRU
+
+    def __init__(self, cache_dir, max_bytes=0):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes or 0
+        self.evicted = 0
+
+    def _path(self, cache_key):
+        return self.cache_dir / f"{cache_key}.json"
+
+    def get(self, cache_key):
+        """Return (cached_at, data) or None if the key is not cached."""
+        cache_file = self._path(cache_key)
+        if not cache_file.exists():
+            return None
+        try:
+            with open(cache_file) as f:
+                cached = json.load(f)
+            return cached.get("_cached_at", 0), cached.get("data")
+        except (json.JSONDecodeError, OSError):
+            return None
+
+    def set(self, cache_key, data, endpoint=None, cached_at=None):
+        """Store a response. Write failures are non-fatal."""
+        try:
+            with open(self._path(cache_key), "w") as f:
+                json.dump({"_cached_at": cached_at or time.time(), "data": data}, f)
+        except OSError:
+            pass
+
+    def set_many(self, items, endpoint=None, cached_at=None):
+        """Store (cache_key, data) pairs, then check the size cap once."""
+        cached_at = cached_at or time.time()
+        for cache_key, data in items:
+            self.set(cache_key, data, endpoint=endpoint, cached_at=cached_at)
+        if items:
+            self.enforce_size_cap()
+
+    def delete(self, cache_key):
+        self._path(cache_key).unlink(missing_ok=True)
+
+    def stats(self, ttl, endpoint_ttls=None):
+        """Return entry counts and on-disk size, split by TTL validity.
+
+        Files do not record their endpoint, so endpoint_ttls is ignored.
+        """
+        cache_files = list(self.cache_dir.glob("*.json"))
+        total_size = 0
+        expired = 0
+        valid = 0
+        now = time.time()
+        for f in cache_files:
+            try:
+                total_size += f.stat().st_size
+                with open(f) as fh:
+                    data = json.load(fh)
+                if now - data.get("_cached_at", 0) > ttl:
+                    expired += 1
+                else:
+                    valid += 1
+            except (json.JSONDecodeError, OSError):
+                expired += 1
+        return {
+            "total_entries": len(cache_files),
+            "valid": valid,
+            "expired": expired,
+            "total_size_bytes": total_size,
+            "raw_size_bytes": total_size,
+            "file_size_bytes": total_size,
+            "codec": self.codec,
+            "max_bytes": self.max_bytes,
+            "eviction": self.eviction,
+            "evicted": self.evicted,
+        }
+
+    def clear(self):
+        """Delete every cached response. Returns the number removed."""
+        count = 0
+        for f in self.cache_dir.glob("*.json"):
+            f.unlink(missing_ok=True)
+            count += 1
+        return count
+
+    def clear_expired(self, ttl, endpoint_ttls=None):
+        """Delete responses older than ttl seconds (and unreadable files)."""
+        count = 0
+        now = time.time()
+        for f in self.cache_dir.glob("*.json"):
+            try:
+                with open(f) as fh:
+                    data = json.load(fh)
+                if now - data.get("_cached_at", 0) > ttl:
+                    f.unlink()
+                    count += 1
+            except (json.JSONDecodeError, OSError):
+                f.unlink(missing_ok=True)
+                count += 1
+        return count
+
+    def enforce_size_cap(self, max_bytes=None):
+        """Delete the oldest files until the total is under the cap."""
+        cap = self.max_bytes if max_bytes is None else max_bytes
+        if not cap:
+            return 0
+        files = []
+        for f in self.cache_dir.glob("*.json"):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, f))
+        total = sum(size for _, size, _ in files)
+        if total <= cap:
+            return 0
+        excess = total - cap * EVICT_LOW_WATERMARK
+        count = 0
+        for _, size, f in sorted(files, key=lambda item: item[0]):
+            if excess <= 0:
+                break
+            f.unlink(missing_ok=True)
+            excess -= size
+            count += 1
+        self.evicted += count
+        return count
+
+    def compact(self):
+        """Enforce the size cap (files have nothing to recompress or vacuum)."""
+        before = self.stats(0)["total_size_bytes"]
+        evicted = self.enforce_size_cap()
+        return {
+            "rewritten": 0,
+            "evicted": evicted,
+            "vacuumed": False,
+            "bytes_before": before,
+            "bytes_after": self.stats(0)["total_size_bytes"],
+        }
+
+    def maybe_compact_async(self, interval=COMPACT_INTERVAL):
+        return None
+
+    def close(self):
+        pass
+
+
+class SQLiteCacheStore:
+    """Single-file SQLite cache shared safely between processes.
+
+    The database runs in WAL mode so readers never block the writer, and
+    a busy timeout lets concurrent writers from other processes queue
+    instead of failing. One connection is shared by all threads of a
+    process behind a lock.
+
+    Payloads of COMPRESS_MIN_BYTES or more are compressed with ``codec``.
+    When the stored bytes exceed ``max_bytes``, the least recently (LRU)
+    or least frequently (LFU) read entries are evicted. Reads are tracked
+    in memory and written back in batches so lookups stay read-only.
+    """
+
+    backend = BACKEND_SQLITE
+
+    def __init__(self, cache_dir, filename=SQLITE_FILENAME, codec=None,
+                 max_bytes=DEFAULT_MAX_BYTES, eviction=EVICTION_LRU):
+        """Open or create the cache database.
+
+        Args:
+            cache_dir: Directory holding the database file.
+            filename: Database filename.
+            codec: 'zstd', 'zlib' or 'none'. Default: default_codec().
+            max_bytes: Cap on stored payload bytes (0 = unbounded).
+            eviction: 'lru' or 'lfu'.
+        """
+        if codec not in (None,) + CODECS:
+            raise ValueError(f"Unknown cache codec: {codec} (expected one of {CODECS})")
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy: {eviction} "
+                             f"(expected one of {EVICTION_POLICIES})")
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / filename
+        self.codec = codec or default_codec()
+        if self.codec == CODEC_ZSTD and zstandard is None:
+            self.codec = CODEC_ZLIB
+        self.max_bytes = max_bytes or 0
+        self.eviction = eviction
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._pending_access = {}
+        self._written = 0
+        self._conn = sqlite3.connect(
+            str(self.db_path), timeout=30, check_same_thread=False,
+            isolation_level=None,
+        )
+        # Only takes effect on a new database; older ones switch on their
+        # first compact() (VACUUM)
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._add_columns()
+
+    def _add_columns(self):
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+        missing = [(name, decl) for name, decl in _ADDED_COLUMNS if name not in columns]
+        if missing:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+                for name, decl in missing:
+                    if name not in columns:  # another process may have added it
+                        self._conn.execute(f"ALTER TABLE responses ADD COLUMN {name} {decl}")
+                self._conn.execute("UPDATE responses SET last_access = cached_at, "
+                                   "raw_size = size WHERE last_access = 0")
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access "
+                           "ON responses (last_access)")
+
+    def get(self, cache_key):
+        """Return (cached_at, data) or None if the key is not cached."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cached_at, codec, data FROM responses WHERE cache_key = ?",
+                (cache_key,),
+            ).fetchone()
+            if row is not None:
+                self._pending_access[cache_key] = self._pending_access.get(cache_key, 0) + 1
+                if len(self._pending_access) >= ACCESS_FLUSH_EVERY:
+                    self._flush_access()
+        if row is None:
+            return None
+        try:
+            return row[0], decode_payload(row[1], row[2])
+        except (TypeError, ValueError, zlib.error):
+            return None
+
+    def _flush_access(self):
+        # Caller holds self._lock
+        if not self._pending_access:
+            return
+        now = time.time()
+        pending, self._pending_access = self._pending_access, {}
+        try:
+            self._conn.executemany(
+                "UPDATE responses SET hits = hits + ?, last_access = ? WHERE cache_key = ?",
+                [(n, now, key) for key, n in pending.items()],
+            )
+        except sqlite3.Error:
+            pass
+
+    def set(self, cache_key, data, endpoint=None, cached_at=None):
+        """Store a response. Write failures are non-fatal."""
+        payload = json.dumps(data)
+        codec, value, size = encode_payload(payload, self.codec)
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (cache_key, endpoint, cached_at, size, "
+                    "data, codec, raw_size, last_access, hits) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                    (cache_key, endpoint, cached_at or now, size, value, codec,
+                     len(payload), now),
+                )
+                self._written += size
+                check = self.max_bytes and self._written >= self.max_bytes * 0.01
+        except sqlite3.Error:
+            return
+        if check:
+            self.enforce_size_cap()
+
+    def set_many(self, items, endpoint=None, cached_at=None):
+        """Store (cache_key, data) pairs in one transaction.
+
+        The size cap is checked once after the batch instead of per row.
+        Write failures are non-fatal.
+        """
+        now = time.time()
+        rows = []
+        for cache_key, data in items:
+            payload = json.dumps(data)
+            codec, value, size = encode_payload(payload, self.codec)
+            rows.append((cache_key, endpoint, cached_at or now, size, value, codec,
+                         len(payload), now))
+        if not rows:
+            return
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO responses (cache_key, endpoint, cached_at, "
+                        "size, data, codec, raw_size, last_access, hits) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                        rows,
+                    )
+                    self._conn.execute("COMMIT")
+                except sqlite3.Error:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                self._written += sum(row[3] for row in rows)
+                check = self.max_bytes and self._written >= self.max_bytes * 0.01
+        except sqlite3.Error:
+            return
+        if check:
+            self.enforce_size_cap()
+
+    def delete(self, cache_key):
+        with self._lock:
+            self._pending_access.pop(cache_key, None)
+            self._conn.execute("DELETE FROM responses WHERE cache_key = ?", (cache_key,))
+
+    @staticmethod
+    def _expired_where(ttl, endpoint_ttls):
+        """WHERE clause matching rows past their (per-endpoint) TTL."""
+        now = time.time()
+        if not endpoint_ttls:
+            return "cached_at < ?", [now - ttl]
+        cases = " ".join("WHEN ? THEN ?" for _ in endpoint_ttls)
+        args = []
+        for endpoint, endpoint_ttl in endpoint_ttls.items():
+            args.extend([endpoint, now - endpoint_ttl])
+        return f"cached_at < CASE endpoint {cases} ELSE ? END", args + [now - ttl]
+
+    def stats(self, ttl, endpoint_ttls=None):
+        """Return entry counts and payload size, split by TTL validity.
+
+        Args:
+            ttl: Default TTL in seconds.
+            endpoint_ttls: Optional {endpoint: ttl} overrides.
+        """
+        where, args = self._expired_where(ttl, endpoint_ttls)
+        with self._lock:
+            total, size, raw_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(raw_size), 0) "
+                "FROM responses"
+            ).fetchone()
+            expired = self._conn.execute(
+                f"SELECT COUNT(*) FROM responses WHERE {where}", args
+            ).fetchone()[0]
+            by_endpoint = dict(self._conn.execute(
+                "SELECT COALESCE(endpoint, '?'), COUNT(*) FROM responses GROUP BY endpoint"
+            ).fetchall())
+        return {
+            "total_entries": total,
+            "valid": total - expired,
+            "expired": expired,
+            "total_size_bytes": size,
+            "raw_size_bytes": raw_size,
+            "file_size_bytes": self.file_size(),
+            "by_endpoint": by_endpoint,
+            "codec": self.codec,
+            "max_bytes": self.max_bytes,
+            "eviction": self.eviction,
+            "evicted": self.evicted,
+        }
+
+    def file_size(self):
+        """Bytes on disk for the database and its WAL."""
+        total = 0
+        for suffix in ("", "-wal"):
+            try:
+                total += os.path.getsize(f"{self.db_path}{suffix}")
+            except OSError:
+                pass
+        return total
+
+    def clear(self):
+        """Delete every cached response. Returns the number removed."""
+        with self._lock:
+            self._pending_access = {}
+            cur = self._conn.execute("DELETE FROM responses")
+            self._incremental_vacuum()
+        return cur.rowcount
+
+    def clear_expired(self, ttl, endpoint_ttls=None):
+        """Delete responses older than their TTL (ttl or endpoint_ttls[endpoint])."""
+        where, args = self._expired_where(ttl, endpoint_ttls)
+        with self._lock:
+            cur = self._conn.execute(f"DELETE FROM responses WHERE {where}", args)
+            self._incremental_vacuum()
+        return cur.rowcount
+
+    def enforce_size_cap(self, max_bytes=None):
+        """Evict entries until the stored bytes are under the cap.
+
+        Nothing happens while the total is at or below the cap; once it is
+        exceeded, entries are evicted in LRU or LFU order down to
+        EVICT_LOW_WATERMARK of the cap.
+
+        Args:
+            max_bytes: Cap to enforce. Default: the store's max_bytes.
+
+        Returns:
+            Number of entries evicted.
+        """
+        cap = self.max_bytes if max_bytes is None else max_bytes
+        if not cap:
+            return 0
+        order = "hits, last_access" if self.eviction == EVICTION_LFU else "last_access"
+        with self._lock:
+            self._written = 0
+            self._flush_access()
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= cap:
+                return 0
+            excess = total - cap * EVICT_LOW_WATERMARK
+            victims = []
+            cur = self._conn.execute(f"SELECT cache_key, size FROM responses ORDER BY {order}")
+            for cache_key, size in cur:
+                if excess <= 0:
+                    break
+                victims.append((cache_key,))
+                excess -= size
+            cur.close()
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany("DELETE FROM responses WHERE cache_key = ?", victims)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                return 0
+            self._incremental_vacuum()
+            self.evicted += len(victims)
+        return len(victims)
+
+    def _incremental_vacuum(self):
+        # Caller holds self._lock. Returns free pages to the OS on databases
+        # created with auto_vacuum=INCREMENTAL; a no-op on older ones.
+        try:
+            self._conn.execute("PRAGMA incremental_vacuum").fetchall()
+        except sqlite3.Error:
+            pass
+
+    def recompress(self, batch_size=500):
+        """Rewrite rows stored with a different codec than the current one.
+
+        Returns:
+            Number of rows rewritten.
+        """
+        if self.codec == CODEC_NONE:
+            where, args = "codec != ''", []
+        else:
+            where = "((codec = '' AND raw_size >= ?) OR (codec != '' AND codec != ?))"
+            args = [COMPRESS_MIN_BYTES, self.codec]
+        rewritten = 0
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT rowid, cache_key, codec, data FROM responses "
+                    f"WHERE {where} AND rowid > ? ORDER BY rowid LIMIT ?",
+                    args + [last_rowid, batch_size],
+                ).fetchall()
+                if not rows:
+                    return rewritten
+                updates = []
+                for rowid, cache_key, codec, value in rows:
+                    last_rowid = rowid
+                    try:
+                        payload = json.dumps(decode_payload(codec, value))
+                    except (TypeError, ValueError, zlib.error):
+                        continue
+                    new_codec, new_value, size = encode_payload(payload, self.codec)
+                    updates.append((new_codec, new_value, size, len(payload), cache_key))
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    "UPDATE responses SET codec = ?, data = ?, size = ?, raw_size = ? "
+                    "WHERE cache_key = ?", updates,
+                )
+                self._conn.execute("COMMIT")
+                rewritten += len(updates)
+
+    def compact(self):
+        """Recompress, enforce the size cap and VACUUM the database.
+
+        VACUUM runs on its own connection and is skipped (not retried) if
+        another process holds the database busy.
+
+        Returns:
+            Dict with rewritten, evicted, vacuumed, bytes_before, bytes_after.
+        """
+        before = self.file_size()
+        rewritten = self.recompress()
+        evicted = self.enforce_size_cap()
+        vacuumed = False
+        with self._lock:
+            self._flush_access()
+            self._set_meta("last_compacted", time.time())
+        conn = sqlite3.connect(str(self.db_path), timeout=5, isolation_level=None)
+        try:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            vacuumed = True
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.close()
+        return {
+            "rewritten": rewritten,
+            "evicted": evicted,
+            "vacuumed": vacuumed,
+            "bytes_before": before,
+            "bytes_after": self.file_size(),
+        }
+
+    def _set_meta(self, name, value):
+        # Caller holds self._lock
+        self._conn.execute("INSERT OR REPLACE INTO cache_meta (name, value) VALUES (?, ?)",
+                           (name, str(value)))
+
+    def maybe_compact_async(self, interval=COMPACT_INTERVAL):
+        """Start compact() on a daemon thread if the last one is older than interval.
+
+        The compaction time is claimed in the database first, so only one
+        of several processes opening the cache at once runs it.
+
+        Returns:
+            The started thread, or None.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache_meta WHERE name = 'last_compacted'"
+            ).fetchone()
+            if row is None:
+                # New (or pre-compaction) cache: start the clock now
+                self._conn.execute("INSERT OR IGNORE INTO cache_meta (name, value) "
+                                   "VALUES ('last_compacted', ?)", (str(now),))
+                return None
+            if now - float(row[0]) < interval:
+                return None
+            claimed = self._conn.execute(
+                "UPDATE cache_meta SET value = ? WHERE name = 'last_compacted' AND value = ?",
+                (str(now), row[0]),
+            ).rowcount
+        if not claimed:
+            return None
+        thread = threading.Thread(target=self._compact_quietly, name="api-cache-compact",
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def _compact_quietly(self):
+        try:
+            self.compact()
+        except (sqlite3.Error, OSError):
+            pass
+
+    def import_from(self, file_store, remove=True):
+        """One-time migration of a per-file cache into this database.
+
+        Every readable {cache_key}.json file in file_store's directory is
+        inserted with its original _cached_at timestamp. Rows that already
+        exist in the database are kept. Migrated files are deleted when
+        remove is True so the import is not repeated.
+
+        Returns:
+            (migrated, skipped) counts.
+        """
+        migrated = 0
+        skipped = 0
+        rows = []
+        migrated_files = []
+        for f in file_store.cache_dir.glob("*.json"):
+            try:
+                with open(f) as fh:
+                    cached = json.load(fh)
+                payload = json.dumps(cached["data"])
+                cached_at = cached.get("_cached_at", 0)
+                codec, value, size = encode_payload(payload, self.codec)
+                rows.append((f.stem, None, cached_at, size, value, codec, len(payload), cached_at))
+                migrated_files.append(f)
+            except (json.JSONDecodeError, OSError, KeyError, TypeError):
+                skipped += 1
+                continue
+            if len(rows) >= 1000:
+                migrated += self._insert_ignore(rows)
+                rows = []
+        if rows:
+            migrated += self._insert_ignore(rows)
+        if remove:
+            for f in migrated_files:
+                f.unlink(missing_ok=True)
+        return migrated, skipped
+
+    def _insert_ignore(self, rows):
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO responses (cache_key, endpoint, cached_at, size, "
+                "data, codec, raw_size, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    def close(self):
+        with self._lock:
+            self._flush_access()
+            self._conn.close()
+
+
+class FetchLeases:
+    """Lock-file leases that let one process fetch a cache key at a time.
+
+    acquire() creates ``{cache_key}.lock`` with O_CREAT | O_EXCL, so exactly
+    one process (or thread) holds the lease for a key. The lock records the
+    holder's host and pid; a lease is broken when it is older than
+    ``timeout`` or its holder is a dead process on this host, so a crashed
+    fetcher never blocks the others for long. Breaking is best effort: two
+    waiters that break the same stale lease may both fetch, which costs a
+    duplicate request but never a wrong answer.
+    """
+
+    def __init__(self, cache_dir, timeout=LEASE_TIMEOUT, poll_interval=LEASE_POLL_INTERVAL):
+        self.lease_dir = Path(cache_dir) / LEASE_DIRNAME
+        self.lease_dir.mkdir(parents=True, exist_ok=True)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._host = socket.gethostname()
+
+    def _path(self, cache_key):
+        return self.lease_dir / f"{cache_key}.lock"
+
+    def acquire(self, cache_key):
+        """Take the lease for cache_key without waiting.
+
+        Returns:
+            True if this caller now holds the lease, False if someone else does.
+        """
+        path = self._path(cache_key)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._break_if_stale(path):
+                    return False
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(f"{self._host} {os.getpid()} {time.time():.3f}")
+            return True
+        return False
+
+    def release(self, cache_key):
+        try:
+            self._path(cache_key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def held(self, cache_key):
+        """True while a live lease exists for cache_key (stale ones are broken)."""
+        path = self._path(cache_key)
+        return path.exists() and not self._break_if_stale(path)
+
+    def wait(self, cache_key, timeout=None):
+        """Block until nobody holds the lease for cache_key.
+
+        Returns:
+            True if the lease was released (or broken), False on timeout.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while self.held(cache_key):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def _break_if_stale(self, path):
+        """Remove the lock at path if it is abandoned. Returns True if gone."""
+        try:
+            age = time.time() - path.stat().st_mtime
+            with open(path) as f:
+                holder = f.read().split()
+        except FileNotFoundError:
+            return True
+        except OSError:
+            return False
+        stale = age > self.timeout
+        if not stale and len(holder) >= 2 and holder[0] == self._host:
+            stale = not _pid_alive(holder[1])
+        if not stale:
+            return False
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        return True
+
+
+def _pid_alive(pid):
+    """Best-effort check that a local process exists (always True off POSIX)."""
+    try:
+        pid = int(pid)
+    except ValueError:
+        return True
+    if os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def resolve_backend(backend=None):
+    """Pick the cache backend from the argument, env, settings, or default.
+
+    Precedence: explicit argument > FDA_API_CACHE_BACKEND env var >
+    ``api_cache_backend:`` in ~/.claude/fda-tools.local.md > sqlite. An
+    unknown env var value is reported on stderr and skipped, like an
+    unknown setting; an unknown argument is left for open_cache_store()
+    to reject.
+    """
+    if backend:
+        return backend
+    env = os.environ.get("FDA_API_CACHE_BACKEND", "").strip().lower()
+    if env in BACKENDS:
+        return env
+    if env:
+        print(f"WARNING: ignoring unknown FDA_API_CACHE_BACKEND={env!r} "
+              f"(expected one of {', '.join(BACKENDS)})", file=sys.stderr)
+    settings_path = os.path.expanduser("~/.claude/fda-tools.local.md")
+    if os.path.exists(settings_path):
+        with open(settings_path) as f:
+            m = re.search(r"api_cache_backend:\s*(\S+)", f.read())
+        if m and m.group(1).lower() in BACKENDS:
+            return m.group(1).lower()
+    return DEFAULT_BACKEND
+
+
+def _configured(env_var, setting):
+    """Raw value of env_var, else of ``setting:`` in the settings file, else None."""
+    env = os.environ.get(env_var)
+    if env:
+        return env.strip()
+    settings_path = os.path.expanduser("~/.claude/fda-tools.local.md")
+    if os.path.exists(settings_path):
+        with open(settings_path) as f:
+            m = re.search(rf"{setting}:\s*(\S+)", f.read())
+        if m:
+            return m.group(1)
+    return None
+
+
+def resolve_cache_limits(codec=None, max_mb=None, eviction=None):
+    """Resolve compression, size cap and eviction policy.
+
+    Precedence for each: explicit argument > env var (FDA_API_CACHE_COMPRESSION,
+    FDA_API_CACHE_MAX_MB, FDA_API_CACHE_EVICTION) > settings
+    (api_cache_compression, api_cache_max_mb, api_cache_eviction) > defaults
+    (zstd or zlib, 1024 MB, lru).
+
+    Returns:
+        (codec, max_bytes, eviction); max_bytes 0 means unbounded.
+    """
+    codec = (codec or _configured("FDA_API_CACHE_COMPRESSION", "api_cache_compression")
+             or default_codec()).lower()
+    if codec not in CODECS:
+        codec = default_codec()
+    if max_mb is None:
+        try:
+            max_mb = float(_configured("FDA_API_CACHE_MAX_MB", "api_cache_max_mb"))
+        except (TypeError, ValueError):
+            max_mb = DEFAULT_MAX_BYTES / (1024 * 1024)
+    eviction = (eviction or _configured("FDA_API_CACHE_EVICTION", "api_cache_eviction")
+                or EVICTION_LRU).lower()
+    if eviction not in EVICTION_POLICIES:
+        eviction = EVICTION_LRU
+    return codec, int(max(0, max_mb) * 1024 * 1024), eviction
+
+
+def open_cache_store(cache_dir, backend=None, codec=None, max_mb=None, eviction=None):
+    """Open the cache store for cache_dir using the resolved backend.
+
+    When the SQLite backend is opened on a directory that still holds
+    legacy per-file entries, they are migrated into the database once.
+    codec, max_mb and eviction are resolved by resolve_cache_limits().
+    """
+    backend = resolve_backend(backend)
+    codec, max_bytes, eviction = resolve_cache_limits(codec, max_mb, eviction)
+    if backend == BACKEND_FILES:
+        return FileCacheStore(cache_dir, max_bytes)
+    if backend != BACKEND_SQLITE:
+        raise ValueError(f"Unknown cache backend: {backend} (expected one of {BACKENDS})")
+
+    is_new = not (Path(cache_dir) / SQLITE_FILENAME).exists()
+    store = SQLiteCacheStore(cache_dir, codec=codec, max_bytes=max_bytes, eviction=eviction)
+    if is_new and any(Path(cache_dir).glob("*.json")):
+        store.import_from(FileCacheStore(cache_dir))
+    return store
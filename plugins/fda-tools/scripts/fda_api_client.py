@@ -2,8 +2,11 @@
 """
 Centralized FDA API Client with caching and retry logic.
 
-Provides LRU caching (7-day TTL), exponential backoff retry, and degraded mode
-on failure for all openFDA Device API endpoints.
+Provides two-tier response caching (7-day TTL): a size-bounded in-process
+LRU in front of a shared SQLite store or per-file JSON cache (see
+fda_api_cache.py), pooled keep-alive connections (fda_http.py), exponential
+backoff retry, and degraded mode on failure for all openFDA Device API
+endpoints.
 
 Usage:
     from fda_api_client import FDAClient
@@ -19,16 +22,58 @@ import hashlib
 import json
 import os
 import re
+import threading
 import time
-import urllib.error
 import urllib.parse
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 
+from fda_api_cache import (
+    BACKEND_SQLITE,
+    LEASE_TIMEOUT,
+    MEMORY_MAX_BYTES,
+    MEMORY_MAX_ENTRIES,
+    FetchLeases,
+    FileCacheStore,
+    MemoryLRU,
+    open_cache_store,
+)
+from fda_http import http_get
+from fda_metrics import (
+    FORMAT_JSONL,
+    command_name,
+    configured_dump,
+    format_metrics,
+    process_metrics,
+    register_exit_dump,
+    summarize_metrics_log,
+)
+from fda_rate_limit import openfda_rate_limiter
 
-# Cache TTL in seconds (7 days)
+
+# Default cache TTL in seconds (7 days), for endpoints without their own TTL
 CACHE_TTL = 7 * 24 * 60 * 60
 
+# Per-endpoint TTLs: safety data (recalls, adverse events, enforcement)
+# changes daily; classifications, clearances, PMAs and UDI are stable.
+ENDPOINT_TTLS = {
+    "recall": 24 * 60 * 60,
+    "event": 24 * 60 * 60,
+    "enforcement": 24 * 60 * 60,
+}
+
+# 404 / empty results expire sooner so new records show up promptly
+NEGATIVE_TTL = 6 * 60 * 60
+
+# In stale-while-revalidate mode, entries up to this far past their TTL are
+# served immediately while a background refresh runs
+STALE_MAX_AGE = 30 * 24 * 60 * 60
+
+# Background refreshes running at once (on daemon threads, so a CLI process
+# exits without waiting for them; an interrupted refresh is simply redone)
+REFRESH_WORKERS = 2
+
 # Max retries for transient failures
 MAX_RETRIES = 3
 
@@ -38,6 +83,29 @@ BASE_BACKOFF = 1.0
 # API base URL
 BASE_URL = "https://api.fda.gov/device"
 
+# openFDA paging limits: max records per page, and max skip offset before
+# deeper pages must be requested with search_after
+MAX_PAGE_SIZE = 1000
+OPENFDA_MAX_SKIP = 25000
+
+# Batched ID lookups: max encoded length of one OR search (well under the
+# ~8 KB URL limit of the openFDA front end), max IDs per query, and how
+# many chunk queries run at once (all still share the rate limiter)
+MAX_SEARCH_LENGTH = 4000
+MAX_BATCH_IDS = 100
+BATCH_WORKERS = 4
+
+# How a request was answered (FDAClient.last_source)
+SOURCE_LOCAL = "local"        # local bulk datasets
+SOURCE_CACHE = "cache"        # fresh API cache entry
+SOURCE_STALE = "stale"        # expired entry, refreshing in the background
+SOURCE_SHARED = "shared"      # fetched by another process holding the lease
+SOURCE_NETWORK = "network"    # fetched by this process
+SOURCES = (SOURCE_LOCAL, SOURCE_CACHE, SOURCE_STALE, SOURCE_SHARED, SOURCE_NETWORK)
+
+# Parallel queries used by FDAClient.warm()
+WARM_WORKERS = 4
+
 # User agent
 try:
     from version import PLUGIN_VERSION
@@ -46,21 +114,285 @@ except Exception:
     USER_AGENT = "Mozilla/5.0 (FDA-Plugin/0.0.0)"
 
 
+def endpoint_ttl(endpoint):
+    """Default cache TTL in seconds for an endpoint's (non-empty) responses."""
+    return ENDPOINT_TTLS.get(endpoint, CACHE_TTL)
+
+
+def _is_negative(data):
+    """True for 404 / empty-result responses (cached with NEGATIVE_TTL)."""
+    return isinstance(data, dict) and data.get("results") == [] and not data.get("degraded")
+
+
+def _resolve_stale_while_revalidate(value=None):
+    """Resolve the SWR flag: argument > FDA_API_CACHE_SWR > settings > off."""
+    if value is not None:
+        return bool(value)
+    env = os.environ.get("FDA_API_CACHE_SWR")
+    if env:
+        return env.lower() in ("1", "true", "yes", "on")
+    settings_path = os.path.expanduser("~/.claude/fda-tools.local.md")
+    if os.path.exists(settings_path):
+        with open(settings_path) as f:
+            m = re.search(r"api_cache_stale_while_revalidate:\s*(\S+)", f.read())
+        if m:
+            return m.group(1).lower() == "true"
+    return False
+
+
+# Data modes: network only, local bulk datasets first, local only
+DATA_MODE_ONLINE = "online"
+DATA_MODE_LOCAL = "local"
+DATA_MODE_OFFLINE = "offline"
+DATA_MODES = (DATA_MODE_ONLINE, DATA_MODE_LOCAL, DATA_MODE_OFFLINE)
+
+
+def resolve_data_mode(mode=None):
+    """Resolve the data mode: argument > FDA_DATA_MODE > settings > online."""
+    if not mode:
+        mode = os.environ.get("FDA_DATA_MODE")
+    if not mode:
+        settings_path = os.path.expanduser("~/.claude/fda-tools.local.md")
+        if os.path.exists(settings_path):
+            with open(settings_path) as f:
+                m = re.search(r"openfda_data_mode:\s*(\w+)", f.read())
+            if m:
+                mode = m.group(1)
+    mode = (mode or DATA_MODE_ONLINE).lower()
+    if mode not in DATA_MODES:
+        raise ValueError(f"Unknown data mode {mode!r}; expected one of {', '.join(DATA_MODES)}")
+    return mode
+
+
+# Endpoints whose responses carry full records worth caching individually
+RECORD_ENDPOINTS = ("510k", "pma", "udi")
+
+
+def single_record_response(record, meta=None):
+    """Shape one record (or None for not found) like a single-lookup response."""
+    meta = dict(meta or {})
+    meta["results"] = {"skip": 0, "limit": 1, "total": 1 if record else 0}
+    return {"meta": meta, "results": [record] if record else []}
+
+
+def plan_or_chunks(field, values, max_ids=MAX_BATCH_IDS, max_length=MAX_SEARCH_LENGTH):
+    """Split values into chunks whose ``field:"v" OR ...`` search fits one request.
+
+    A chunk closes when adding the next value would exceed max_ids (never
+    more than openFDA's 1000-record page) or push the URL-encoded search
+    past max_length characters.
+
+    Returns:
+        List of (values, search) tuples in input order.
+    """
+    max_ids = max(1, min(max_ids, MAX_PAGE_SIZE))
+    separator = len(urllib.parse.quote_plus(" OR "))
+    chunks = []
+    current, length = [], 0
+    for value in values:
+        term = len(urllib.parse.quote_plus(f'{field}:"{value}"'))
+        added = term + (separator if current else 0)
+        if current and (len(current) >= max_ids or length + added > max_length):
+            chunks.append(current)
+            current, length, added = [], 0, term
+        current.append(value)
+        length += added
+    if current:
+        chunks.append(current)
+    return [(chunk, "+OR+".join(f'{field}:"{v}"' for v in chunk)) for chunk in chunks]
+
+
+def _parse_search_after(link_header):
+    """Extract the search_after token from an openFDA rel="next" Link header."""
+    if not link_header or 'rel="next"' not in link_header:
+        return None
+    m = re.search(r"<([^>]+)>", link_header)
+    if not m:
+        return None
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(m.group(1)).query)
+    values = query.get("search_after")
+    return values[0] if values else None
+
+
+def _count_by_product_code(endpoint, field):
+    def query(client, product_code):
+        return client._request(endpoint, {"search": f'product_code:"{product_code}"',
+                                          "count": field})
+    return query
+
+
+def _events_count(field):
+    def query(client, product_code):
+        return client.get_events(product_code, count=field)
+    return query
+
+
+# The per-product-code queries the plugin's commands and scripts issue,
+# in the exact form they issue them, so FDAClient.warm() leaves nothing
+# for an interactive session to fetch.
+WARM_QUERIES = (
+    ("classification", lambda client, code: client.get_classification(code)),
+    ("clearances", lambda client, code: client.get_clearances(code)),
+    ("clearances by year", _count_by_product_code("510k", "decision_date")),
+    ("clearances by applicant", _count_by_product_code("510k", "applicant.exact")),
+    ("clearances by type", _count_by_product_code("510k", "clearance_type.exact")),
+    ("clearances by decision", _count_by_product_code("510k", "decision_code.exact")),
+    ("recalls", lambda client, code: client.get_recalls(code)),
+    ("recalls (100)", lambda client, code: client.get_recalls(code, limit=100)),
+    ("recalls by status", _count_by_product_code("recall", "recall_status")),
+    ("recalls by firm", _count_by_product_code("recall", "recalling_firm.exact")),
+    ("enforcement", lambda client, code: client.get_enforcement(code)),
+    ("events", lambda client, code: client.get_events(code)),
+    ("events by type", _events_count("event_type.exact")),
+    ("events by date", _events_count("date_received")),
+    ("events by manufacturer", _events_count("device.manufacturer_d_name.exact")),
+    ("events by device name", _events_count("device.generic_name.exact")),
+    ("pma", lambda client, code: client.get_pma_by_product_code(code)),
+    ("pma (100)", lambda client, code: client.get_pma_by_product_code(code, limit=100)),
+)
+
+PRODUCT_CODE_RE = re.compile(r"^[A-Z]{3}$")
+
+
+def collect_product_codes(obj):
+    """Collect product codes from parsed query.json / review.json content.
+
+    Walks the document for ``product_code`` strings and ``product_codes``
+    lists at any depth (top level, filters, predicates, reference devices).
+
+    Returns:
+        Product codes in first-seen order.
+    """
+    codes = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "product_code" and isinstance(value, str):
+                    codes.append(value)
+                elif key == "product_codes" and isinstance(value, list):
+                    codes.extend(v for v in value if isinstance(v, str))
+                else:
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(obj)
+    return [c for c in dict.fromkeys(c.strip().upper() for c in codes) if PRODUCT_CODE_RE.match(c)]
+
+
+def format_warm_report(report):
+    """Render FDAClient.warm() output as per-code coverage lines."""
+    lines = []
+    total = warm = 0
+    for code, statuses in report.items():
+        counts = {"cached": 0, "fetched": 0, "stale": 0, "error": 0}
+        for status in statuses.values():
+            counts["error" if status.startswith("error") else status] += 1
+        ok = counts["cached"] + counts["fetched"] + counts["stale"]
+        total += len(statuses)
+        warm += ok
+        stale = f"{counts['stale']} stale, " if counts["stale"] else ""
+        lines.append(f"  {code}  {ok}/{len(statuses)} warm  ({counts['fetched']} fetched, "
+                     f"{counts['cached']} already cached, {stale}{counts['error']} errors)")
+        for label, status in statuses.items():
+            if status.startswith("error"):
+                lines.append(f"      {label}: {status}")
+    pct = 100.0 * warm / total if total else 100.0
+    lines.append(f"Warm coverage: {warm}/{total} queries ({pct:.0f}%)")
+    return "\n".join(lines)
+
+
 class FDAClient:
     """Centralized openFDA API client with caching and retry."""
 
-    def __init__(self, cache_dir=None, api_key=None):
+    def __init__(self, cache_dir=None, api_key=None, cache_backend=None,
+                 memory_cache_entries=MEMORY_MAX_ENTRIES,
+                 memory_cache_bytes=MEMORY_MAX_BYTES, rate_limiter=None,
+                 data_mode=None, local_store=None, endpoint_ttls=None,
+                 negative_ttl=NEGATIVE_TTL, stale_while_revalidate=None, metrics=None,
+                 single_flight=True, lease_timeout=LEASE_TIMEOUT, cache_max_mb=None,
+                 cache_compression=None, cache_eviction=None):
         """Initialize the FDA API client.
 
         Args:
             cache_dir: Directory for API response cache. Default: ~/fda-510k-data/api_cache/
             api_key: openFDA API key. If not provided, reads from env/settings.
+            cache_backend: 'sqlite' (single-file database, default) or 'files'
+                (one JSON file per response). If not provided, reads
+                FDA_API_CACHE_BACKEND or api_cache_backend from settings.
+            memory_cache_entries: Max responses held in the in-process LRU
+                tier (0 disables it).
+            memory_cache_bytes: Approximate byte budget for the LRU tier.
+            rate_limiter: Object with an acquire() method called before every
+                network attempt. Default: the process-wide openFDA token
+                bucket for this client's quota (see fda_rate_limit.py).
+            data_mode: 'online' (default), 'local' (answer from the ingested
+                bulk datasets first, network fallback for unsupported queries
+                and empty non-count results) or 'offline' (local only, never
+                touches the network). If not provided, reads
+                FDA_DATA_MODE or openfda_data_mode from settings.
+            local_store: fda_bulk_store.BulkStore to use in local/offline
+                mode. Default: the store at FDA_BULK_DB or
+                ~/fda-510k-data/openfda_bulk/openfda.db.
+            endpoint_ttls: Overrides for ENDPOINT_TTLS, e.g. {"510k": 86400}.
+            negative_ttl: TTL in seconds for 404 / empty results.
+            stale_while_revalidate: Serve expired entries immediately and
+                refresh them in the background. If not provided, reads
+                FDA_API_CACHE_SWR or api_cache_stale_while_revalidate.
+            metrics: fda_metrics.ClientMetrics receiving per-endpoint request,
+                latency, retry and cache counters. Default: the process-wide
+                registry, dumped at exit when FDA_METRICS_FILE or
+                api_metrics_file is set.
+            single_flight: Coordinate cache misses with other processes
+                sharing cache_dir so only one of them fetches a given
+                request; the rest wait and read its cached result.
+            lease_timeout: Seconds after which another process's fetch
+                lease is treated as abandoned (crashed or hung holder).
+            cache_max_mb: Cap on cached payload size in MB (0 = unbounded).
+                If not provided, reads FDA_API_CACHE_MAX_MB or
+                api_cache_max_mb from settings (default 1024).
+            cache_compression: 'zstd', 'zlib' or 'none'. If not provided,
+                reads FDA_API_CACHE_COMPRESSION or api_cache_compression
+                (default zstd when installed, else zlib).
+            cache_eviction: 'lru' or 'lfu' order for size-cap eviction. If
+                not provided, reads FDA_API_CACHE_EVICTION or
+                api_cache_eviction (default lru).
         """
         self.api_key = api_key or self._load_api_key()
         self.cache_dir = Path(cache_dir or os.path.expanduser("~/fda-510k-data/api_cache"))
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._store = open_cache_store(self.cache_dir, cache_backend, cache_compression,
+                                       cache_max_mb, cache_eviction)
+        self._store.maybe_compact_async()
+        self._memory = MemoryLRU(memory_cache_entries, memory_cache_bytes)
+        self.rate_limiter = rate_limiter or openfda_rate_limiter(self.api_key)
+        self.base_url = BASE_URL
+        self.data_mode = resolve_data_mode(data_mode)
+        self._local_store = local_store
         self.enabled = self._check_enabled()
-        self._stats = {"hits": 0, "misses": 0, "errors": 0}
+        self.endpoint_ttls = dict(ENDPOINT_TTLS, **(endpoint_ttls or {}))
+        self.negative_ttl = negative_ttl
+        self.stale_while_revalidate = _resolve_stale_while_revalidate(stale_while_revalidate)
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._refresh_slots = threading.BoundedSemaphore(REFRESH_WORKERS)
+        self._leases = FetchLeases(self.cache_dir, lease_timeout) if single_flight else None
+        self._source = threading.local()
+        self._stats = {"hits": 0, "misses": 0, "errors": 0, "local": 0, "stale": 0}
+        self.metrics = metrics or process_metrics()
+        if metrics is None:
+            register_exit_dump()
+
+    # Session counter -> fda_metrics counter
+    _METRIC_NAMES = {"hits": "cache_hits", "misses": "cache_misses", "errors": "errors",
+                     "local": "local_answers", "stale": "stale_served"}
+
+    def _count(self, stat, endpoint):
+        """Bump a session counter and its per-endpoint metric."""
+        self._stats[stat] += 1
+        self.metrics.increment(endpoint, self._METRIC_NAMES[stat])
 
     def _load_api_key(self):
         """Load API key from environment or settings file."""
@@ -95,52 +427,243 @@ class FDAClient:
         raw = f"{endpoint}:{json.dumps(cache_params, sort_keys=True)}"
         return hashlib.sha256(raw.encode()).hexdigest()[:16]
 
-    def _get_cached(self, cache_key):
-        """Get a cached response if valid."""
-        cache_file = self.cache_dir / f"{cache_key}.json"
-        if not cache_file.exists():
+    def ttl_for(self, endpoint, data=None):
+        """Cache TTL in seconds for a response from endpoint."""
+        ttl = self.endpoint_ttls.get(endpoint, CACHE_TTL)
+        if _is_negative(data):
+            ttl = min(ttl, self.negative_ttl)
+        return ttl
+
+    def _read_cache(self, cache_key, endpoint=None):
+        """Return (data, age_seconds, ttl) for a cached entry, or None.
+
+        Entries too old to serve at all are deleted from both tiers.
+        """
+        cached = self._memory.get(cache_key)
+        from_memory = cached is not None
+        if cached is None:
+            cached = self._store.get(cache_key)
+        if cached is None:
             return None
 
-        try:
-            with open(cache_file) as f:
-                cached = json.load(f)
+        cached_at, data = cached
+        age = time.time() - cached_at
+        ttl = self.ttl_for(endpoint, data)
+        if age > ttl and (not self.stale_while_revalidate or age > ttl + STALE_MAX_AGE):
+            self._memory.delete(cache_key)
+            self._store.delete(cache_key)
+            return None
 
-            # Check TTL
-            cached_at = cached.get("_cached_at", 0)
-            if time.time() - cached_at > CACHE_TTL:
-                cache_file.unlink(missing_ok=True)
-                return None
+        if not from_memory:
+            self._memory.put(cache_key, data, cached_at)
+        return data, age, ttl
 
-            self._stats["hits"] += 1
-            return cached.get("data")
-        except (json.JSONDecodeError, OSError):
+    def _get_cached(self, cache_key, endpoint=None):
+        """Get a cached response if still within its TTL (memory tier first)."""
+        entry = self._read_cache(cache_key, endpoint)
+        if entry is None or entry[1] > entry[2]:
             return None
+        self._count("hits", endpoint)
+        return entry[0]
+
+    def _revalidate(self, endpoint, params, cache_key):
+        """Refresh a stale entry on a background thread (once per key)."""
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
 
-    def _set_cached(self, cache_key, data):
-        """Cache a response."""
-        cache_file = self.cache_dir / f"{cache_key}.json"
+        def refresh():
+            with self._refresh_slots:
+                leased = self._leases is None or self._leases.acquire(cache_key)
+                try:
+                    # Another process holding the lease is already refreshing it
+                    if leased:
+                        self._fetch(endpoint, dict(params), cache_key)
+                finally:
+                    if leased and self._leases is not None:
+                        self._leases.release(cache_key)
+                    with self._refresh_lock:
+                        self._refreshing.discard(cache_key)
+
+        threading.Thread(target=refresh, name="openfda-refresh", daemon=True).start()
+
+    def _set_cached(self, cache_key, data, endpoint=None):
+        """Cache a response. Cache write failures are non-fatal."""
+        now = time.time()
+        self._memory.put(cache_key, data, now)
+        self._store.set(cache_key, data, endpoint=endpoint, cached_at=now)
+
+    def _record_lookups(self, endpoint, record):
+        """Single-lookup params a full record answers (K-number, PMA, DI)."""
+        if endpoint == "510k" and record.get("k_number"):
+            return [self._510k_params(record["k_number"])]
+        if endpoint == "pma" and record.get("pma_number") and not record.get("supplement_number"):
+            return [self._pma_params(record["pma_number"])]
+        if endpoint == "udi":
+            return [self._udi_di_params(ident["id"])
+                    for ident in record.get("identifiers") or [] if ident.get("id")]
+        return []
+
+    def _cache_records(self, endpoint, params, data):
+        """Cache each record of a multi-record response under its own lookup.
+
+        batch, search and clearance responses carry full records, so a later
+        get_510k/get_pma/get_udi(di=...) for any of them, or a batch with a
+        different subset or ordering, is served without a network call.
+        """
+        if "count" in params or endpoint not in RECORD_ENDPOINTS:
+            return 0
+        own_key = self._cache_key(endpoint, params)
+        meta = data.get("meta") or {}
+        items = []
+        for record in data.get("results") or []:
+            if not isinstance(record, dict):
+                continue
+            for lookup in self._record_lookups(endpoint, record):
+                key = self._cache_key(endpoint, lookup)
+                if key != own_key:
+                    items.append((key, single_record_response(record, meta)))
+        # Disk tier only, in one write: a page of records would otherwise
+        # push the repeated queries out of the memory LRU
+        self._store.set_many(items, endpoint=endpoint, cached_at=time.time())
+        return len(items)
+
+    @property
+    def local_store(self):
+        """Bulk dataset store, opened on first use (None if not ingested)."""
+        if self._local_store is None:
+            from fda_bulk_store import BulkStore, DEFAULT_DB_PATH
+            path = os.environ.get("FDA_BULK_DB") or DEFAULT_DB_PATH
+            if not os.path.exists(path):
+                return None
+            self._local_store = BulkStore(path)
+        return self._local_store
+
+    def _query_local(self, endpoint, params):
+        store = self.local_store
+        if store is None:
+            return None
         try:
-            with open(cache_file, "w") as f:
-                json.dump({"_cached_at": time.time(), "data": data}, f)
-        except OSError:
-            pass  # Cache write failures are non-fatal
+            return store.query(endpoint, params)
+        except Exception:
+            return None
 
     def _request(self, endpoint, params):
         """Make an API request with retry and exponential backoff.
 
         Returns parsed JSON data or None on failure.
         """
+        self.metrics.increment(endpoint, "calls")
+        if self.data_mode != DATA_MODE_ONLINE:
+            local = self._query_local(endpoint, params)
+            # In local mode an empty lookup may only mean the bulk snapshot
+            # predates the record, so it falls through to openFDA
+            if local is not None and (self.data_mode == DATA_MODE_OFFLINE or "count" in params
+                                      or local.get("results")):
+                self._count("local", endpoint)
+                self._source.value = SOURCE_LOCAL
+                return local
+            if self.data_mode == DATA_MODE_OFFLINE:
+                return {"error": f"Offline mode: {endpoint} query not answerable from local "
+                                 f"openFDA datasets", "degraded": True}
+
         if not self.enabled:
             return {"error": "API disabled", "degraded": True}
 
-        # Check cache first
         key = self._cache_key(endpoint, params)
-        cached = self._get_cached(key)
-        if cached is not None:
-            return cached
+        if self.bypassing_cache:
+            self._count("misses", endpoint)
+            self._source.value = SOURCE_NETWORK
+            return self._fetch_single_flight(endpoint, params, key, refresh=True)
+
+        # Check cache first
+        entry = self._read_cache(key, endpoint)
+        if entry is not None:
+            data, age, ttl = entry
+            if age <= ttl:
+                self._count("hits", endpoint)
+                self._source.value = SOURCE_CACHE
+                return data
+            # Stale-while-revalidate: answer now, refresh in the background
+            self._count("stale", endpoint)
+            self._source.value = SOURCE_STALE
+            self._source.cached_at = time.time() - age
+            self._revalidate(endpoint, params, key)
+            return data
+
+        self._count("misses", endpoint)
+        self._source.value = SOURCE_NETWORK
+        return self._fetch_single_flight(endpoint, params, key)
 
-        self._stats["misses"] += 1
+    @property
+    def last_source(self):
+        """How this thread's last _request() was answered: one of SOURCES, or None."""
+        return getattr(self._source, "value", None)
 
+    @property
+    def last_cached_at(self):
+        """When the entry behind this thread's last SOURCE_STALE answer was fetched."""
+        return getattr(self._source, "cached_at", None)
+
+    @property
+    def bypassing_cache(self):
+        """Whether this thread is inside a bypass_cache() block."""
+        return getattr(self._source, "bypass", False)
+
+    def _request_as(self, bypass, endpoint, params):
+        """_request() on a worker thread, bypassing the cache if the caller was."""
+        if not bypass:
+            return self._request(endpoint, params)
+        with self.bypass_cache():
+            return self._request(endpoint, params)
+
+    @contextmanager
+    def bypass_cache(self):
+        """Re-fetch this thread's requests from openFDA inside the block.
+
+        The cached entries are not read but are rewritten with the new
+        responses. Local and offline data modes still answer from the bulk
+        store.
+        """
+        previous = self.bypassing_cache
+        self._source.bypass = True
+        try:
+            yield self
+        finally:
+            self._source.bypass = previous
+
+    def _fetch_single_flight(self, endpoint, params, key, refresh=False):
+        """Fetch key unless another process is already fetching it.
+
+        The process holding the lease fetches and caches the response;
+        the others wait for the lease to go away and read the cache. If the
+        holder failed (nothing cached) or the wait times out, the waiter
+        takes the lease, or as a last resort fetches without it. With
+        refresh=True a waiter only accepts an entry cached after it started.
+        """
+        if self._leases is None:
+            return self._fetch(endpoint, params, key)
+        started = time.time()
+        deadline = time.monotonic() + self._leases.timeout
+        while True:
+            if self._leases.acquire(key):
+                try:
+                    return self._fetch(endpoint, params, key)
+                finally:
+                    self._leases.release(key)
+            self.metrics.increment(endpoint, "single_flight_waits")
+            released = self._leases.wait(key, max(0.0, deadline - time.monotonic()))
+            entry = self._read_cache(key, endpoint)
+            if (entry is not None and entry[1] <= entry[2]
+                    and (not refresh or entry[1] <= time.time() - started)):
+                self._source.value = SOURCE_SHARED
+                return entry[0]
+            if not released or time.monotonic() >= deadline:
+                return self._fetch(endpoint, params, key)
+
+    def _fetch(self, endpoint, params, key):
+        """Fetch from the network with retry and cache the result under key."""
         # Add API key if available
         if self.api_key:
             params["api_key"] = self.api_key
@@ -150,53 +673,82 @@ class FDAClient:
         # Fix: replace + with space in search before encoding.
         if "search" in params:
             params["search"] = params["search"].replace("+", " ")
-        url = f"{BASE_URL}/{endpoint}.json?{urllib.parse.urlencode(params)}"
-        req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+        url = f"{self.base_url}/{endpoint}.json?{urllib.parse.urlencode(params)}"
+        headers = {"User-Agent": USER_AGENT, "Accept": "application/json"}
 
         last_error = None
         for attempt in range(MAX_RETRIES):
+            if attempt:
+                self.metrics.increment(endpoint, "retries")
+            waited = time.monotonic()
+            allowed = self.rate_limiter.acquire()
+            self.metrics.increment(endpoint, "rate_limit_wait_seconds", time.monotonic() - waited)
+            if not allowed:
+                self._count("errors", endpoint)
+                return {"error": "openFDA daily request quota exhausted", "degraded": True}
+            resp = None
+            started = time.monotonic()
             try:
-                with urllib.request.urlopen(req, timeout=15) as resp:
-                    data = json.loads(resp.read())
-                    self._set_cached(key, data)
+                # Pooled keep-alive connection (fda_http) instead of a new
+                # TCP + TLS handshake per request.
+                resp = http_get(url, headers=headers, timeout=15)
+                self.metrics.record_attempt(endpoint, time.monotonic() - started, resp.status,
+                                            resp.wire_bytes, len(resp.body))
+                if resp.status == 200:
+                    data = json.loads(resp.body)
+                    next_search_after = _parse_search_after(resp.headers.get("Link"))
+                    if next_search_after and isinstance(data.get("meta"), dict):
+                        data["meta"]["next_search_after"] = next_search_after
+                    self._set_cached(key, data, endpoint)
+                    self._cache_records(endpoint, params, data)
                     return data
-            except urllib.error.HTTPError as e:
-                if e.code == 404:
-                    # Not found is a valid response, cache it
-                    result = {"results": [], "meta": {"results": {"total": 0}}}
-                    self._set_cached(key, result)
-                    return result
-                elif e.code == 429:
-                    # Rate limited — wait longer
-                    wait = BASE_BACKOFF * (2 ** attempt) * 2
-                    time.sleep(wait)
-                    last_error = e
-                elif e.code >= 500:
-                    # Server error — retry with backoff
-                    wait = BASE_BACKOFF * (2 ** attempt)
-                    time.sleep(wait)
-                    last_error = e
-                else:
-                    # Client error (400, 403, etc.) — don't retry
-                    self._stats["errors"] += 1
-                    return {"error": f"HTTP {e.code}: {e.reason}", "degraded": True}
             except Exception as e:
-                wait = BASE_BACKOFF * (2 ** attempt)
-                time.sleep(wait)
+                if resp is None:
+                    self.metrics.record_attempt(endpoint, time.monotonic() - started)
+                self._backoff(endpoint, BASE_BACKOFF * (2 ** attempt))
                 last_error = e
+                continue
+
+            if resp.status == 404:
+                # Not found is a valid response, cache it
+                result = {"results": [], "meta": {"results": {"total": 0}}}
+                self._set_cached(key, result, endpoint)
+                return result
+            elif resp.status == 429:
+                # Rate limited — wait longer
+                self._backoff(endpoint, BASE_BACKOFF * (2 ** attempt) * 2)
+                last_error = f"HTTP 429: {resp.reason}"
+            elif resp.status >= 500:
+                # Server error — retry with backoff
+                self._backoff(endpoint, BASE_BACKOFF * (2 ** attempt))
+                last_error = f"HTTP {resp.status}: {resp.reason}"
+            else:
+                # Client error (400, 403, etc.) — don't retry
+                self._count("errors", endpoint)
+                return {"error": f"HTTP {resp.status}: {resp.reason}", "degraded": True}
 
         # All retries exhausted
-        self._stats["errors"] += 1
+        self._count("errors", endpoint)
         return {
             "error": f"API unavailable after {MAX_RETRIES} retries: {last_error}",
             "degraded": True,
         }
 
+    def _backoff(self, endpoint, seconds):
+        """Sleep before a retry, recording the time spent."""
+        self.metrics.increment(endpoint, "backoff_seconds", seconds)
+        time.sleep(seconds)
+
     # --- Convenience Methods ---
 
+    @staticmethod
+    def _510k_params(k_number):
+        """Query params for a single K-number lookup (also its cache key)."""
+        return {"search": f'k_number:"{k_number}"', "limit": "1"}
+
     def get_510k(self, k_number):
         """Look up a 510(k) clearance by K-number."""
-        return self._request("510k", {"search": f'k_number:"{k_number}"', "limit": "1"})
+        return self._request("510k", self._510k_params(k_number))
 
     def get_classification(self, product_code):
         """Look up device classification by product code."""
@@ -211,15 +763,192 @@ class FDAClient:
             params["sort"] = sort
         return self._request("510k", params)
 
-    def batch_510k(self, k_numbers, limit=None):
-        """Look up multiple K-numbers in a single API call using OR query."""
+    def iter_results(self, endpoint, params, page_size=MAX_PAGE_SIZE, max_records=None,
+                     prefetch=True):
+        """Yield every record matching a query, fetching one page at a time.
+
+        Pages use skip up to openFDA's 25,000 offset limit and continue with
+        search_after when the server supplies it. Each page is cached like
+        any other request. With prefetch, the next page is requested in the
+        background while the caller processes the current one. At most two
+        pages are held in memory.
+
+        Iteration stops early if a page fails; the degraded response is
+        left in self.last_page_error. The total reported by the first page
+        is left in self.last_total.
+
+        Args:
+            endpoint: API endpoint, e.g. '510k', 'pma', 'event'.
+            params: Query params ('search', 'sort', ...). limit/skip are managed here.
+            page_size: Records per request (max 1000).
+            max_records: Stop after this many records (None for all).
+            prefetch: Fetch the next page concurrently.
+        """
+        if "count" in params:
+            raise ValueError("count queries return a single page and cannot be iterated")
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        base = {k: v for k, v in params.items() if k not in ("limit", "skip", "search_after")}
+        self.last_page_error = None
+        self.last_total = None
+
+        def page_params(skip, search_after):
+            p = dict(base, limit=str(page_size))
+            if search_after:
+                p["search_after"] = search_after
+            elif skip:
+                p["skip"] = str(skip)
+            return p
+
+        def next_params(page, fetched):
+            meta = page.get("meta") or {}
+            total = (meta.get("results") or {}).get("total")
+            if len(page.get("results") or []) < page_size:
+                return None
+            if total is not None and fetched >= total:
+                return None
+            if max_records is not None and fetched >= max_records:
+                return None
+            if meta.get("next_search_after"):
+                return page_params(None, meta["next_search_after"])
+            if fetched > OPENFDA_MAX_SKIP:
+                return None
+            return page_params(fetched, None)
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        bypass = self.bypassing_cache
+        try:
+            fetched = 0
+            yielded = 0
+            page = self._request(endpoint, page_params(0, None))
+            if page and not page.get("degraded"):
+                self.last_total = ((page.get("meta") or {}).get("results") or {}).get("total")
+            while True:
+                if not page or page.get("degraded") or "results" not in page:
+                    self.last_page_error = page
+                    return
+                results = page["results"]
+                fetched += len(results)
+                upcoming = next_params(page, fetched)
+                pending = None
+                if upcoming is not None:
+                    if executor is not None:
+                        pending = executor.submit(self._request_as, bypass, endpoint, upcoming)
+                for record in results:
+                    if max_records is not None and yielded >= max_records:
+                        return
+                    yield record
+                    yielded += 1
+                if upcoming is None:
+                    return
+                page = pending.result() if pending is not None else self._request(endpoint, upcoming)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def iter_clearances(self, product_code, sort="decision_date:desc", page_size=MAX_PAGE_SIZE,
+                        max_records=None):
+        """Stream all 510(k) clearances for a product code (see iter_results)."""
+        params = {"search": f'product_code:"{product_code}"'}
+        if sort:
+            params["sort"] = sort
+        return self.iter_results("510k", params, page_size=page_size, max_records=max_records)
+
+    def iter_510k(self, page_size=MAX_PAGE_SIZE, max_records=None, **filters):
+        """Stream all 510(k) records matching search_510k() filters."""
+        params = self._search_510k_params(**filters)
+        if params is None:
+            raise ValueError("Provide at least one search filter")
+        return self.iter_results("510k", params, page_size=page_size, max_records=max_records)
+
+    def iter_events(self, product_code, page_size=MAX_PAGE_SIZE, max_records=None):
+        """Stream all MAUDE adverse events for a product code."""
+        params = {"search": f'device.device_report_product_code:"{product_code}"'}
+        return self.iter_results("event", params, page_size=page_size, max_records=max_records)
+
+    def iter_pma_by_product_code(self, product_code, page_size=MAX_PAGE_SIZE, max_records=None):
+        """Stream all PMA approvals and supplements for a product code."""
+        params = {"search": f'product_code:"{product_code}"'}
+        return self.iter_results("pma", params, page_size=page_size, max_records=max_records)
+
+    def batch_510k(self, k_numbers, limit=None, max_ids=MAX_BATCH_IDS, max_workers=BATCH_WORKERS):
+        """Look up multiple K-numbers with as few OR queries as possible.
+
+        K-numbers whose records are already cached (from earlier lookups,
+        batches or searches) are served locally. The rest are split by
+        plan_or_chunks() into URL-safe queries of at most max_ids K-numbers,
+        which run concurrently (up to max_workers at a time) under the
+        client's rate limiter. Results follow the order of k_numbers and
+        are de-duplicated.
+
+        A chunk that fails does not fail the batch: its K-numbers are left
+        out of the results and listed under ``errors`` as
+        ``{"k_numbers": [...], "error": "..."}`` with ``partial`` set. When
+        every chunk fails the first failure is returned unchanged.
+        """
         if not k_numbers:
             return {"results": [], "meta": {"results": {"total": 0}}}
-        search = "+OR+".join(f'k_number:"{k}"' for k in k_numbers)
-        return self._request("510k", {
-            "search": search,
-            "limit": str(limit or len(k_numbers))
-        })
+
+        records = {}
+        missing = []
+        bypass = self.bypassing_cache
+        self._source.value = SOURCE_CACHE
+        for k in dict.fromkeys(str(k).upper() for k in k_numbers):
+            cached = None if bypass else self._get_cached(
+                self._cache_key("510k", self._510k_params(k)), "510k")
+            if cached is None:
+                missing.append(k)
+            elif cached.get("results"):
+                records[k] = cached["results"][0]
+
+        meta = {}
+        errors = []
+        if missing:
+            chunks = plan_or_chunks("k_number", missing, max_ids)
+
+            def run(chunk):
+                values, search = chunk
+                return values, self._request_as(bypass, "510k",
+                                                {"search": search, "limit": str(len(values))})
+
+            if len(chunks) == 1 or max_workers <= 1:
+                responses = [run(chunk) for chunk in chunks]
+            else:
+                with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)),
+                                        thread_name_prefix="openfda-batch") as pool:
+                    responses = list(pool.map(run, chunks))
+
+            failed = None
+            for values, response in responses:
+                if not response or response.get("degraded") or "results" not in response:
+                    failed = failed or response
+                    errors.append({"k_numbers": values,
+                                   "error": (response or {}).get("error", "No response")})
+                    continue
+                meta = meta or response.get("meta") or {}
+                for record in response["results"]:
+                    records.setdefault(str(record.get("k_number", "")).upper(), record)
+                # Complete answer for this chunk: remember K-numbers openFDA does not have
+                for k in values:
+                    if k not in records:
+                        self._set_cached(self._cache_key("510k", self._510k_params(k)),
+                                         single_record_response(None, meta), "510k")
+            if len(errors) == len(chunks):
+                return failed
+
+        results = []
+        for k in dict.fromkeys(str(k).upper() for k in k_numbers):
+            if k in records:
+                results.append(records[k])
+        if limit is not None:
+            results = results[:limit]
+        response = {
+            "meta": dict(meta, results={"skip": 0, "limit": len(results), "total": len(results)}),
+            "results": results,
+        }
+        if errors:
+            response["errors"] = errors
+            response["partial"] = True
+        return response
 
     def get_events(self, product_code, count=None, limit=100):
         """Get MAUDE adverse events for a product code."""
@@ -238,9 +967,20 @@ class FDAClient:
             "recall", {"search": f'product_code:"{product_code}"', "limit": str(limit)}
         )
 
+    def get_enforcement(self, product_code, limit=100):
+        """Get enforcement reports for a product code."""
+        return self._request(
+            "enforcement", {"search": f'product_code:"{product_code}"', "limit": str(limit)}
+        )
+
+    @staticmethod
+    def _pma_params(pma_number):
+        """Query params for a single PMA lookup (also its cache key)."""
+        return {"search": f'pma_number:"{pma_number}"', "limit": "1"}
+
     def get_pma(self, pma_number):
         """Look up a PMA approval by P-number."""
-        return self._request("pma", {"search": f'pma_number:"{pma_number}"', "limit": "1"})
+        return self._request("pma", self._pma_params(pma_number))
 
     def get_pma_supplements(self, pma_number, limit=50):
         """Get PMA supplements for a base PMA number."""
@@ -254,6 +994,11 @@ class FDAClient:
             "pma", {"search": f'product_code:"{product_code}"', "limit": str(limit)}
         )
 
+    @staticmethod
+    def _udi_di_params(di):
+        """Query params for a single device identifier lookup (also its cache key)."""
+        return {"search": f'identifiers.id:"{di}"', "limit": "10"}
+
     def get_udi(self, product_code=None, company_name=None, di=None, limit=10):
         """Look up UDI/GUDID records by product code, company, or device identifier."""
         if di:
@@ -268,19 +1013,10 @@ class FDAClient:
             return {"error": "Provide product_code, company_name, or di", "degraded": True}
         return self._request("udi", {"search": search, "limit": str(limit)})
 
-    def search_510k(self, query=None, product_code=None, applicant=None,
-                    year_start=None, year_end=None, limit=25, sort=None):
-        """Interactive 510(k) database search with combined filters.
-
-        Args:
-            query: Free-text search against device_name
-            product_code: Filter by product code
-            applicant: Filter by applicant name
-            year_start: Start year (YYYY) for decision_date range
-            year_end: End year (YYYY) for decision_date range
-            limit: Max results (default 25)
-            sort: Sort field and direction (e.g., 'decision_date:desc')
-        """
+    @staticmethod
+    def _search_510k_params(query=None, product_code=None, applicant=None,
+                            year_start=None, year_end=None, sort=None):
+        """Build search_510k() params without limit; None if no filter given."""
         parts = []
         if query:
             parts.append(f'device_name:"{query}"')
@@ -293,11 +1029,31 @@ class FDAClient:
             end = f"{year_end}1231" if year_end else "29991231"
             parts.append(f"decision_date:[{start}+TO+{end}]")
         if not parts:
-            return {"error": "Provide at least one search filter", "degraded": True}
-        search = "+AND+".join(parts)
-        params = {"search": search, "limit": str(limit)}
+            return None
+        params = {"search": "+AND+".join(parts)}
         if sort:
             params["sort"] = sort
+        return params
+
+    def search_510k(self, query=None, product_code=None, applicant=None,
+                    year_start=None, year_end=None, limit=25, sort=None):
+        """Interactive 510(k) database search with combined filters.
+
+        Args:
+            query: Free-text search against device_name
+            product_code: Filter by product code
+            applicant: Filter by applicant name
+            year_start: Start year (YYYY) for decision_date range
+            year_end: End year (YYYY) for decision_date range
+            limit: Max results (default 25)
+            sort: Sort field and direction (e.g., 'decision_date:desc')
+        """
+        params = self._search_510k_params(query=query, product_code=product_code,
+                                          applicant=applicant, year_start=year_start,
+                                          year_end=year_end, sort=sort)
+        if params is None:
+            return {"error": "Provide at least one search filter", "degraded": True}
+        params["limit"] = str(limit)
         return self._request("510k", params)
 
     def validate_device(self, device_number):
@@ -321,35 +1077,85 @@ class FDAClient:
         else:
             return {"error": f"Unsupported device number format: {device_number}", "degraded": True}
 
+    # --- Cache Warm-up ---
+
+    def warm(self, product_codes, queries=None, max_workers=WARM_WORKERS):
+        """Pre-load the standard queries for a portfolio of product codes.
+
+        Every (product code, query) pair in WARM_QUERIES is requested
+        through _request(), so responses land in the cache exactly as the
+        interactive commands will ask for them. Queries run on a thread
+        pool; the shared rate limiter still paces network requests.
+
+        Args:
+            product_codes: Iterable of FDA product codes.
+            queries: (label, fn(client, product_code)) pairs. Default: WARM_QUERIES.
+            max_workers: Concurrent queries.
+
+        Returns:
+            {product_code: {label: status}} where status is 'cached' (already
+            fresh), 'fetched', 'stale' (expired entry served while it
+            refreshes in the background) or 'error: ...'.
+        """
+        codes = list(dict.fromkeys(str(c).strip().upper() for c in product_codes if str(c).strip()))
+        queries = WARM_QUERIES if queries is None else queries
+        tasks = [(code, label, fn) for code in codes for label, fn in queries]
+
+        def run(task):
+            code, label, fn = task
+            result = fn(self, code)
+            if not result or result.get("degraded"):
+                return code, label, f"error: {(result or {}).get('error', 'no response')}"
+            if self.last_source == SOURCE_STALE:
+                return code, label, "stale"
+            cached = self.last_source in (SOURCE_LOCAL, SOURCE_CACHE)
+            return code, label, "cached" if cached else "fetched"
+
+        report = {code: {} for code in codes}
+        if not tasks:
+            return report
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks))),
+                                thread_name_prefix="openfda-warm") as pool:
+            for code, label, status in pool.map(run, tasks):
+                report[code][label] = status
+        return report
+
     # --- Cache Management ---
 
     def cache_stats(self):
         """Return cache statistics."""
-        cache_files = list(self.cache_dir.glob("*.json"))
-        total_size = sum(f.stat().st_size for f in cache_files)
-        expired = 0
-        valid = 0
-        for f in cache_files:
-            try:
-                with open(f) as fh:
-                    data = json.load(fh)
-                if time.time() - data.get("_cached_at", 0) > CACHE_TTL:
-                    expired += 1
-                else:
-                    valid += 1
-            except (json.JSONDecodeError, OSError):
-                expired += 1
-
+        stats = self._store.stats(CACHE_TTL, self.endpoint_ttls)
+        total_size = stats["total_size_bytes"]
         return {
             "cache_dir": str(self.cache_dir),
-            "total_files": len(cache_files),
-            "valid": valid,
-            "expired": expired,
+            "backend": self._store.backend,
+            "total_files": stats["total_entries"],
+            "total_entries": stats["total_entries"],
+            "valid": stats["valid"],
+            "expired": stats["expired"],
+            "by_endpoint": stats.get("by_endpoint", {}),
             "total_size_bytes": total_size,
             "total_size_mb": round(total_size / (1024 * 1024), 2),
+            "raw_size_mb": round(stats.get("raw_size_bytes", total_size) / (1024 * 1024), 2),
+            "file_size_mb": round(stats.get("file_size_bytes", total_size) / (1024 * 1024), 2),
+            "compression": stats.get("codec"),
+            "max_size_mb": round(stats.get("max_bytes", 0) / (1024 * 1024), 2),
+            "eviction": stats.get("eviction"),
+            "session_evicted": stats.get("evicted", 0),
             "session_hits": self._stats["hits"],
             "session_misses": self._stats["misses"],
             "session_errors": self._stats["errors"],
+            "session_local": self._stats["local"],
+            "session_stale": self._stats["stale"],
+            "ttl_policy": {
+                "default": CACHE_TTL,
+                "negative": self.negative_ttl,
+                "endpoints": dict(self.endpoint_ttls),
+                "stale_while_revalidate": self.stale_while_revalidate,
+            },
+            "data_mode": self.data_mode,
+            "memory": self._memory.stats(),
+            "metrics": self.metrics.snapshot(),
         }
 
     def clear_cache(self, category=None):
@@ -358,24 +1164,30 @@ class FDAClient:
         Args:
             category: None for all, or 'api', 'expired' to clear specific types.
         """
-        count = 0
         if category == "expired":
-            for f in self.cache_dir.glob("*.json"):
-                try:
-                    with open(f) as fh:
-                        data = json.load(fh)
-                    if time.time() - data.get("_cached_at", 0) > CACHE_TTL:
-                        f.unlink()
-                        count += 1
-                except (json.JSONDecodeError, OSError):
-                    f.unlink()
-                    count += 1
-        else:
-            for f in self.cache_dir.glob("*.json"):
-                f.unlink()
-                count += 1
+            shortest = min([CACHE_TTL, self.negative_ttl] + list(self.endpoint_ttls.values()))
+            self._memory.clear(older_than=time.time() - shortest)
+            return self._store.clear_expired(CACHE_TTL, self.endpoint_ttls)
+        self._memory.clear()
+        return self._store.clear()
 
-        return count
+    def compact_cache(self):
+        """Recompress, enforce the size cap and vacuum the cache store.
+
+        Returns:
+            Dict with rewritten, evicted, vacuumed, bytes_before, bytes_after.
+        """
+        return self._store.compact()
+
+    def migrate_cache(self):
+        """Import legacy per-file cache entries into the SQLite backend.
+
+        Returns:
+            (migrated, skipped) counts. (0, 0) when the files backend is active.
+        """
+        if self._store.backend != BACKEND_SQLITE:
+            return 0, 0
+        return self._store.import_from(FileCacheStore(self.cache_dir))
 
 
 def main():
@@ -387,11 +1199,28 @@ def main():
     parser.add_argument("--stats", action="store_true", help="Show cache stats")
     parser.add_argument("--clear", action="store_true", help="Clear cache")
     parser.add_argument("--clear-expired", action="store_true", help="Clear expired cache")
+    parser.add_argument("--compact", action="store_true",
+                        help="Recompress, apply the size cap and vacuum the cache")
+    parser.add_argument("--migrate-cache", action="store_true",
+                        help="Import legacy per-file cache entries into the SQLite cache")
+    parser.add_argument("--cache-backend", choices=["sqlite", "files"],
+                        help="Cache backend (default: sqlite, or api_cache_backend setting)")
+    parser.add_argument("--mode", choices=["online", "local", "offline"],
+                        help="Data mode (default: online, or openfda_data_mode setting)")
+    parser.add_argument("--warm", nargs="+", metavar="CODE_OR_FILE",
+                        help="Pre-load the standard queries for product codes, or for the "
+                             "codes in query.json / review.json files or project directories")
+    parser.add_argument("--warm-workers", type=int, default=WARM_WORKERS,
+                        help=f"Concurrent warm-up queries (default: {WARM_WORKERS})")
     parser.add_argument("--lookup", help="Look up a device number (K/P/DEN)")
     parser.add_argument("--classify", help="Classify a product code")
+    parser.add_argument("--metrics", nargs="?", const="table",
+                        choices=["table", "json", "prometheus"],
+                        help="Print per-endpoint request metrics for this run; on its own, "
+                             "summarize the FDA_METRICS_FILE / api_metrics_file log by command")
     args = parser.parse_args()
 
-    client = FDAClient()
+    client = FDAClient(cache_backend=args.cache_backend, data_mode=args.mode)
 
     if args.test:
         print("Testing openFDA API endpoints...")
@@ -412,9 +1241,14 @@ def main():
 
     elif args.stats:
         stats = client.cache_stats()
-        print(f"Cache directory: {stats['cache_dir']}")
-        print(f"Files: {stats['total_files']} ({stats['valid']} valid, {stats['expired']} expired)")
-        print(f"Size: {stats['total_size_mb']} MB")
+        print(f"Cache directory: {stats['cache_dir']} ({stats['backend']})")
+        print(f"Entries: {stats['total_entries']} ({stats['valid']} valid, {stats['expired']} expired)")
+        for endpoint, count in sorted(stats["by_endpoint"].items()):
+            print(f"  {endpoint:20s}  {count}")
+        cap = f"{stats['max_size_mb']} MB cap, {stats['eviction']}" if stats["max_size_mb"] \
+            else "no cap"
+        print(f"Size: {stats['total_size_mb']} MB stored ({stats['raw_size_mb']} MB uncompressed, "
+              f"{stats['compression']}), {stats['file_size_mb']} MB on disk; {cap}")
 
     elif args.clear:
         count = client.clear_cache()
@@ -424,6 +1258,36 @@ def main():
         count = client.clear_cache("expired")
         print(f"Cleared {count} expired cached responses")
 
+    elif args.compact:
+        result = client.compact_cache()
+        print(f"Recompressed {result['rewritten']} entries, evicted {result['evicted']}; "
+              f"{result['bytes_before'] / (1024 * 1024):.1f} MB -> "
+              f"{result['bytes_after'] / (1024 * 1024):.1f} MB"
+              + ("" if result["vacuumed"] else " (vacuum skipped: cache busy)"))
+
+    elif args.migrate_cache:
+        migrated, skipped = client.migrate_cache()
+        print(f"Migrated {migrated} cached responses ({skipped} unreadable files skipped)")
+
+    elif args.warm:
+        codes = []
+        for item in args.warm:
+            paths = [item]
+            if os.path.isdir(item):
+                paths = [os.path.join(item, name) for name in ("query.json", "review.json")]
+            if not any(os.path.isfile(p) for p in paths):
+                codes.extend(c.strip() for c in item.split(",") if c.strip())
+                continue
+            for path in paths:
+                if os.path.isfile(path):
+                    with open(path) as f:
+                        codes.extend(collect_product_codes(json.load(f)))
+        codes = list(dict.fromkeys(c.upper() for c in codes))
+        print(f"Warming {len(WARM_QUERIES)} queries for {len(codes)} product codes: "
+              f"{', '.join(codes)}")
+        report = client.warm(codes, max_workers=args.warm_workers)
+        print(format_warm_report(report))
+
     elif args.lookup:
         result = client.validate_device(args.lookup)
         print(json.dumps(result, indent=2))
@@ -439,6 +1303,33 @@ def main():
         else:
             print(f"Not found: {args.classify}")
 
+    elif args.metrics:
+        path, fmt = configured_dump()
+        if path is None or fmt != FORMAT_JSONL or not os.path.exists(path):
+            print("No JSON-lines metrics log. Set FDA_METRICS_FILE (or api_metrics_file) "
+                  "to a .jsonl path to record one line per run.")
+            return
+        summary = summarize_metrics_log(path)
+        if args.metrics == "json":
+            print(json.dumps(summary, indent=2))
+            return
+        print(f"openFDA usage by command ({path}):")
+        for command, agg in summary.items():
+            print(f"  {command:32s} {agg['runs']:5d} runs  {agg['http_requests']:7d} requests  "
+                  f"{agg['rate_limited']:4d} x 429  {agg['errors']:4d} errors  "
+                  f"{agg['request_seconds']:8.1f}s")
+        return
+
+    if args.metrics:
+        snapshot = client.metrics.snapshot()
+        print()
+        if args.metrics == "json":
+            print(json.dumps(snapshot, indent=2))
+        elif args.metrics == "prometheus":
+            print(client.metrics.to_prometheus({"command": command_name()}), end="")
+        else:
+            print(format_metrics(snapshot))
+
 
 if __name__ == "__main__":
     main()
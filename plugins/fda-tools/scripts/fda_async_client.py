@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Asyncio front-end for the openFDA client.
+
+AsyncFDAClient exposes the FDAClient convenience methods as coroutines so
+callers can fan out hundreds of lookups with asyncio.gather(). Requests
+run on a bounded worker pool (the concurrency limit) and every network
+attempt draws from the shared openFDA token bucket (fda_rate_limit.py), so
+throughput rises to the quota without tripping HTTP 429. Cache hits never
+touch the rate limiter and return immediately.
+
+The transport is the same stdlib HTTP stack FDAClient uses, so there are
+no extra dependencies and both clients share one response cache.
+
+Usage:
+    import asyncio
+    from fda_async_client import AsyncFDAClient
+
+    async def main():
+        async with AsyncFDAClient(max_concurrency=8) as client:
+            results = await asyncio.gather(
+                *(client.get_510k(k) for k in ["K241335", "K200123"])
+            )
+            recalls = await client.map("get_recalls", ["OVE", "DQY"])
+
+    asyncio.run(main())
+"""
+
+import asyncio
+import functools
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fda_api_client import FDAClient
+from fda_dataloader import KNumberLoader
+
+# Default number of requests in flight at once
+DEFAULT_CONCURRENCY = 8
+
+
+class AsyncFDAClient:
+    """Concurrent, rate-limited asyncio wrapper around FDAClient."""
+
+    def __init__(self, client=None, max_concurrency=DEFAULT_CONCURRENCY, coalesce=False,
+                 **client_kwargs):
+        """Initialize the async client.
+
+        Args:
+            client: Existing FDAClient to share cache and limiter with.
+                If omitted, one is created from client_kwargs (cache_dir,
+                api_key, cache_backend, rate_limiter, ...).
+            max_concurrency: Maximum number of requests in flight.
+            coalesce: Batch concurrent get_510k() calls into OR queries via
+                KNumberLoader (fda_dataloader.py) instead of one request each.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.client = client or FDAClient(**client_kwargs)
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="openfda"
+        )
+        self._loader = KNumberLoader(self.client) if coalesce else None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Shut down the worker pool."""
+        if self._loader is not None:
+            self._loader.flush()
+        self._executor.shutdown(wait=True)
+
+    @property
+    def rate_limiter(self):
+        return self.client.rate_limiter
+
+    async def _call(self, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        fn = functools.partial(getattr(self.client, method), *args, **kwargs)
+        return await loop.run_in_executor(self._executor, fn)
+
+    async def map(self, method, args_list):
+        """Run one convenience method over many arguments concurrently.
+
+        Args:
+            method: FDAClient method name, e.g. 'get_510k'.
+            args_list: Iterable of single arguments or argument tuples.
+
+        Returns:
+            Results in the same order as args_list.
+        """
+        calls = []
+        for args in args_list:
+            if not isinstance(args, tuple):
+                args = (args,)
+            calls.append(self._call(method, *args))
+        return await asyncio.gather(*calls)
+
+    # --- Convenience Methods (mirror FDAClient) ---
+
+    async def request(self, endpoint, params):
+        """Raw openFDA request (see FDAClient._request)."""
+        return await self._call("_request", endpoint, dict(params))
+
+    async def get_510k(self, k_number):
+        if self._loader is not None:
+            return await asyncio.wrap_future(self._loader.submit(k_number))
+        return await self._call("get_510k", k_number)
+
+    async def get_classification(self, product_code):
+        return await self._call("get_classification", product_code)
+
+    async def get_clearances(self, product_code, limit=100, sort="decision_date:desc"):
+        return await self._call("get_clearances", product_code, limit=limit, sort=sort)
+
+    async def batch_510k(self, k_numbers, limit=None):
+        return await self._call("batch_510k", k_numbers, limit=limit)
+
+    async def get_events(self, product_code, count=None, limit=100):
+        return await self._call("get_events", product_code, count=count, limit=limit)
+
+    async def get_recalls(self, product_code, limit=10):
+        return await self._call("get_recalls", product_code, limit=limit)
+
+    async def get_enforcement(self, product_code, limit=100):
+        return await self._call("get_enforcement", product_code, limit=limit)
+
+    async def get_pma(self, pma_number):
+        return await self._call("get_pma", pma_number)
+
+    async def get_pma_supplements(self, pma_number, limit=50):
+        return await self._call("get_pma_supplements", pma_number, limit=limit)
+
+    async def get_pma_by_product_code(self, product_code, limit=50):
+        return await self._call("get_pma_by_product_code", product_code, limit=limit)
+
+    async def get_udi(self, product_code=None, company_name=None, di=None, limit=10):
+        return await self._call(
+            "get_udi", product_code=product_code, company_name=company_name, di=di, limit=limit
+        )
+
+    async def search_510k(self, query=None, product_code=None, applicant=None,
+                          year_start=None, year_end=None, limit=25, sort=None):
+        return await self._call(
+            "search_510k", query=query, product_code=product_code, applicant=applicant,
+            year_start=year_start, year_end=year_end, limit=limit, sort=sort,
+        )
+
+    async def validate_device(self, device_number):
+        return await self._call("validate_device", device_number)
+
+    def cache_stats(self):
+        return self.client.cache_stats()
@@ -0,0 +1,779 @@
+#!/usr/bin/env python3
+"""
+Local openFDA device datasets — bulk-download ingestion and query engine.
+
+openFDA publishes every device dataset as zipped JSON partitions listed in
+https://api.fda.gov/download.json. This module streams those zips (one
+record at a time, never the whole file) into a local SQLite store with a
+term index on the fields our commands search, count and sort by, and
+answers openFDA-style queries from it. FDAClient uses it in "local" mode
+(local first, network fallback) and "offline" mode (local only).
+
+Supported query subset:
+    field:"value" / field:value       exact match (phrase match on name fields)
+    field:[A TO B]                    range, dates as YYYYMMDD or YYYY-MM-DD
+    field:prefix*                     prefix match
+    AND / OR / whitespace (= OR)      no parentheses
+    sort=field:asc|desc, skip, limit, count=field[.exact]
+
+Queries outside that subset (or on fields not indexed for the dataset)
+return None so the caller can go to the network instead.
+
+Usage:
+    python3 fda_bulk_store.py --ingest 510k classification recall
+    python3 fda_bulk_store.py --ingest-zip 510k ~/Downloads/device-510k-0001-of-0001.json.zip
+    python3 fda_bulk_store.py --status
+
+    from fda_bulk_store import BulkStore
+    store = BulkStore()
+    store.query("510k", {"search": 'k_number:"K241335"', "limit": "1"})
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import urllib.request
+import zipfile
+from pathlib import Path
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+DOWNLOAD_INDEX_URL = "https://api.fda.gov/download.json"
+DEFAULT_DB_PATH = os.path.expanduser("~/fda-510k-data/openfda_bulk/openfda.db")
+
+# Device datasets under results.device in download.json
+DATASETS = ("510k", "classification", "recall", "enforcement", "pma", "udi", "event")
+
+# Fields indexed per dataset (openFDA field names, dotted for nested fields)
+INDEXED_FIELDS = {
+    "510k": ("k_number", "product_code", "applicant", "device_name", "decision_date",
+             "decision_code", "clearance_type", "advisory_committee"),
+    "classification": ("product_code", "device_name", "device_class", "regulation_number",
+                       "medical_specialty", "review_panel"),
+    "recall": ("product_code", "k_numbers", "res_event_number", "recall_status",
+               "event_date_initiated", "root_cause_description"),
+    "enforcement": ("product_code", "recall_number", "status", "classification",
+                    "report_date", "recalling_firm"),
+    "pma": ("pma_number", "supplement_number", "product_code", "applicant",
+            "decision_date", "trade_name"),
+    "udi": ("identifiers.id", "product_codes.code", "company_name", "brand_name",
+            "publish_date"),
+    "event": ("device.device_report_product_code", "event_type", "date_received",
+              "device.brand_name", "device.manufacturer_d_name", "report_number"),
+}
+
+# Name-like fields: field:"x" matches when the phrase occurs in the value,
+# like openFDA's analyzed text fields. field.exact:"x" stays an exact match.
+PHRASE_FIELDS = {"device_name", "applicant", "company_name", "brand_name", "trade_name",
+                 "recalling_firm", "device.brand_name", "device.manufacturer_d_name",
+                 "root_cause_description"}
+
+# Records inserted per transaction during ingestion
+INSERT_BATCH = 5000
+
+# openFDA default and maximum limits
+DEFAULT_LIMIT = 1
+DEFAULT_COUNT_LIMIT = 100
+MAX_LIMIT = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    dataset TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    raw TEXT NOT NULL,
+    record_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_terms_lookup ON terms(dataset, field, value);
+CREATE INDEX IF NOT EXISTS idx_terms_record ON terms(record_id, field);
+CREATE TABLE IF NOT EXISTS partitions (
+    dataset TEXT NOT NULL,
+    name TEXT NOT NULL,
+    records INTEGER NOT NULL,
+    ingested_at REAL NOT NULL,
+    PRIMARY KEY (dataset, name)
+);
+"""
+
+# Columns added after the first release: (table, name, declaration)
+_ADDED_COLUMNS = (
+    ("records", "partition", "TEXT"),
+    ("partitions", "version", "TEXT"),
+)
+
+
+# ------------------------------------------------------------------
+# Streaming JSON
+# ------------------------------------------------------------------
+
+def iter_json_records(fileobj, key="results", chunk_size=1 << 20):
+    """Yield the items of the top-level ``key`` array of a JSON document.
+
+    Reads ``fileobj`` (binary) incrementally, so memory stays bounded by
+    the largest single record rather than the file. Uses ijson when it is
+    installed and a json.JSONDecoder.raw_decode scanner otherwise.
+    """
+    if ijson is not None:
+        yield from ijson.items(fileobj, f"{key}.item", use_float=True)
+        return
+
+    text = io.TextIOWrapper(fileobj, encoding="utf-8")
+    decoder = json.JSONDecoder()
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buf = ""
+    eof = False
+    # Read size for retrying a cut-off value; doubled on each retry so a
+    # value spanning many chunks is re-decoded O(log n) times, not O(n)
+    want = chunk_size
+
+    def fill(size=chunk_size):
+        nonlocal buf, eof
+        chunk = text.read(size)
+        if not chunk:
+            eof = True
+        buf += chunk
+
+    # Find the opening bracket of the array (skipping e.g. meta.results {...})
+    while True:
+        fill()
+        m = start.search(buf)
+        if m:
+            pos = m.end()
+            break
+        if eof:
+            return
+        buf = buf[-(len(key) + 64):]
+
+    while True:
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            buf, pos = buf[pos:], 0
+            fill()
+        if pos >= len(buf):
+            raise ValueError(f"Unterminated '{key}' array")
+        if buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            buf, pos = buf[pos:], 0
+            fill(want)
+            want *= 2
+            continue
+        if end == len(buf) and not eof and not isinstance(obj, (dict, list)):
+            # A scalar ending exactly at the buffer edge may be truncated
+            buf, pos = buf[pos:], 0
+            fill(want)
+            want *= 2
+            continue
+        want = chunk_size
+        yield obj
+        pos = end
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
+
+
+def iter_json_object_items(fileobj, chunk_size=1 << 20):
+    """Yield the (key, value) pairs of a top-level JSON object.
+
+    Like iter_json_records, reads ``fileobj`` (binary) incrementally so
+    memory stays bounded by the largest single value. Uses ijson when it is
+    installed and a json.JSONDecoder.raw_decode scanner otherwise.
+    """
+    if ijson is not None:
+        yield from ijson.kvitems(fileobj, "", use_float=True)
+        return
+
+    text = io.TextIOWrapper(fileobj, encoding="utf-8")
+    decoder = json.JSONDecoder()
+    buf = ""
+    eof = False
+    # Read size for retrying a cut-off value; doubled on each retry so a
+    # value spanning many chunks is re-decoded O(log n) times, not O(n)
+    want = chunk_size
+
+    def fill(size=chunk_size):
+        nonlocal buf, eof
+        chunk = text.read(size)
+        if not chunk:
+            eof = True
+        buf += chunk
+
+    def skip(pos, chars=" \t\r\n"):
+        while pos < len(buf) and buf[pos] in chars:
+            pos += 1
+        return pos
+
+    # Find the opening brace
+    while True:
+        fill()
+        pos = skip(0)
+        if pos < len(buf) or eof:
+            break
+        buf = ""
+    if pos >= len(buf):
+        return
+    if buf[pos] != "{":
+        raise ValueError("JSON document is not an object")
+    pos += 1
+
+    while True:
+        pos = skip(pos, " \t\r\n,")
+        if pos >= len(buf) and not eof:
+            buf, pos = buf[pos:], 0
+            fill()
+            continue
+        if pos >= len(buf):
+            raise ValueError("Unterminated JSON object")
+        if buf[pos] == "}":
+            return
+        # Decode "key": value, refilling and retrying while the pair is cut off
+        try:
+            key, end = decoder.raw_decode(buf, pos)
+            end = skip(end)
+            if end >= len(buf) or buf[end] != ":":
+                raise json.JSONDecodeError("Expecting ':' delimiter", buf, end)
+            value, end = decoder.raw_decode(buf, skip(end + 1))
+            # A number or literal is only complete once a delimiter follows it
+            truncated = (not isinstance(value, (dict, list, str))
+                         and (end == len(buf) or buf[end] not in " \t\r\n,}"))
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            truncated = True
+        if truncated and not eof:
+            buf, pos = buf[pos:], 0
+            fill(want)
+            want *= 2
+            continue
+        want = chunk_size
+        yield key, value
+        pos = end
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
+
+
+def iter_zip_records(path_or_file, key="results"):
+    """Yield records from every .json member of a zipped openFDA partition."""
+    with zipfile.ZipFile(path_or_file) as zf:
+        for name in zf.namelist():
+            if name.endswith(".json"):
+                with zf.open(name) as member:
+                    yield from iter_json_records(member, key)
+
+
+# ------------------------------------------------------------------
+# Field extraction and query parsing
+# ------------------------------------------------------------------
+
+def _is_date_field(field):
+    leaf = field.rsplit(".", 1)[-1]
+    return leaf.endswith("_date") or leaf.startswith("date_") or leaf == "event_date_initiated"
+
+
+def _normalize(field, value):
+    value = str(value).strip()
+    if _is_date_field(field):
+        return value.replace("-", "")
+    return value.lower()
+
+
+def extract_values(record, field):
+    """Return the scalar values at a dotted path, flattening lists."""
+    values = [record]
+    for part in field.split("."):
+        nxt = []
+        for v in values:
+            if isinstance(v, list):
+                v = [x.get(part) for x in v if isinstance(x, dict)]
+                nxt.extend(x for x in v if x is not None)
+            elif isinstance(v, dict) and v.get(part) is not None:
+                nxt.append(v[part])
+        values = nxt
+    flat = []
+    for v in values:
+        if isinstance(v, list):
+            flat.extend(x for x in v if not isinstance(x, (dict, list)))
+        elif not isinstance(v, dict):
+            flat.append(v)
+    return [v for v in flat if v != ""]
+
+
+_TOKEN_RE = re.compile(
+    r'\s*(?:(?P<conn>AND|OR)(?=\s)'
+    r'|(?P<field>[\w.]+):(?:"(?P<quoted>[^"]*)"'
+    r'|\[(?P<lo>\S+)\s+TO\s+(?P<hi>\S+)\]'
+    r'|(?P<bare>[^\s()\[\]"]+)))'
+)
+
+
+def parse_search(search):
+    """Parse an openFDA search string into OR-of-AND clauses.
+
+    Returns a list of clauses, each a list of (field, kind, args) terms,
+    or None when the expression is outside the supported subset.
+    """
+    s = search.replace("+", " ").strip()
+    clauses = [[]]
+    pos = 0
+    pending = None
+    while pos < len(s):
+        m = _TOKEN_RE.match(s, pos)
+        if not m or m.end() == pos:
+            if s[pos:].strip() == "":
+                break
+            return None
+        pos = m.end()
+        if m.group("conn"):
+            if pending is not None or not clauses[-1]:
+                return None
+            pending = m.group("conn")
+            continue
+        field = m.group("field")
+        exact = field.endswith(".exact")
+        if exact:
+            field = field[:-len(".exact")]
+        if m.group("lo") is not None:
+            term = (field, "range", (m.group("lo"), m.group("hi")))
+        else:
+            value = m.group("quoted") if m.group("quoted") is not None else m.group("bare")
+            if value.endswith("*") and m.group("quoted") is None:
+                term = (field, "prefix", value[:-1])
+            elif field in PHRASE_FIELDS and not exact:
+                term = (field, "phrase", value)
+            else:
+                term = (field, "eq", value)
+        if clauses[-1] and pending != "AND":
+            clauses.append([])  # OR, or whitespace (openFDA default is OR)
+        clauses[-1].append(term)
+        pending = None
+    if pending is not None or not clauses[-1]:
+        return None
+    return clauses
+
+
+# ------------------------------------------------------------------
+# Store
+# ------------------------------------------------------------------
+
+class BulkStore:
+    """SQLite store of bulk openFDA device records with a term index."""
+
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path or os.environ.get("FDA_BULK_DB") or DEFAULT_DB_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30,
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._add_columns()
+        self._datasets = None
+
+    def _add_columns(self):
+        for table, name, decl in _ADDED_COLUMNS:
+            columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            if name not in columns:
+                try:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+                except sqlite3.OperationalError:
+                    pass  # Added by another process in the meantime
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_records_partition "
+                           "ON records(dataset, partition)")
+
+    def close(self):
+        self._conn.close()
+
+    # --- Ingestion ---
+
+    def datasets(self):
+        """Names of datasets with ingested records (cached per instance)."""
+        if self._datasets is None:
+            with self._lock:
+                rows = self._conn.execute("SELECT DISTINCT dataset FROM partitions").fetchall()
+            self._datasets = {r[0] for r in rows}
+        return self._datasets
+
+    def has_dataset(self, dataset):
+        return dataset in self.datasets()
+
+    def delete_dataset(self, dataset):
+        """Remove every record of a dataset (before a full re-ingest)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM terms WHERE dataset = ?", (dataset,))
+            self._conn.execute("DELETE FROM records WHERE dataset = ?", (dataset,))
+            self._conn.execute("DELETE FROM partitions WHERE dataset = ?", (dataset,))
+            self._conn.execute("COMMIT")
+        self._datasets = None
+
+    def _delete_partition(self, dataset, partition):
+        # Caller holds self._lock inside a write transaction
+        self._conn.execute(
+            "DELETE FROM terms WHERE record_id IN "
+            "(SELECT id FROM records WHERE dataset = ? AND partition = ?)", (dataset, partition))
+        self._conn.execute("DELETE FROM records WHERE dataset = ? AND partition = ?",
+                           (dataset, partition))
+        self._conn.execute("DELETE FROM partitions WHERE dataset = ? AND name = ?",
+                           (dataset, partition))
+
+    def ingest_records(self, dataset, records, partition, version=None):
+        """Insert an iterable of records for one partition. Returns the count.
+
+        Records are committed in batches and tagged with their partition.
+        Whatever an earlier (possibly interrupted) ingest of the same
+        partition left behind is deleted first, so re-ingesting replaces
+        the partition instead of duplicating it. The partitions row, which
+        marks the partition complete, is written with the last batch.
+
+        Args:
+            dataset: Dataset name (see INDEXED_FIELDS).
+            records: Iterable of record dicts.
+            partition: Partition name, e.g. the zip file name.
+            version: Identifies the published partition contents (see
+                list_partition_entries); recorded for is_ingested().
+        """
+        if dataset not in INDEXED_FIELDS:
+            raise ValueError(f"Unknown dataset: {dataset}")
+        fields = INDEXED_FIELDS[dataset]
+        count = 0
+        batch = []
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_partition(dataset, partition)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._datasets = None
+
+        def flush(done=False):
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for record in batch:
+                        cur = self._conn.execute(
+                            "INSERT INTO records (dataset, partition, data) VALUES (?, ?, ?)",
+                            (dataset, partition, json.dumps(record, separators=(",", ":"))),
+                        )
+                        rid = cur.lastrowid
+                        rows = []
+                        for field in fields:
+                            for value in dict.fromkeys(extract_values(record, field)):
+                                rows.append((dataset, field, _normalize(field, value),
+                                             str(value), rid))
+                        self._conn.executemany(
+                            "INSERT INTO terms (dataset, field, value, raw, record_id) "
+                            "VALUES (?, ?, ?, ?, ?)", rows)
+                    if done:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO partitions "
+                            "(dataset, name, records, ingested_at, version) VALUES (?, ?, ?, ?, ?)",
+                            (dataset, partition, count, time.time(), version))
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            batch.clear()
+
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            batch.append(record)
+            count += 1
+            if len(batch) >= INSERT_BATCH:
+                flush()
+        flush(done=True)
+        self._datasets = None
+        return count
+
+    def ingest_zip(self, dataset, path, partition=None, version=None):
+        """Stream one zipped JSON partition into the store."""
+        partition = partition or Path(path).name
+        return self.ingest_records(dataset, iter_zip_records(path), partition, version)
+
+    def is_ingested(self, dataset, partition, version=None):
+        """Whether a partition was completely ingested (with this version, if given)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM partitions WHERE dataset = ? AND name = ?",
+                (dataset, partition)).fetchone()
+        return row is not None and (version is None or row[0] == version)
+
+    def status(self):
+        """Per-dataset partition and record counts."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT dataset, COUNT(*), SUM(records), MAX(ingested_at) "
+                "FROM partitions GROUP BY dataset").fetchall()
+        return {
+            r[0]: {"partitions": r[1], "records": r[2] or 0, "ingested_at": r[3]}
+            for r in rows
+        }
+
+    # --- Query ---
+
+    def _term_sql(self, dataset, term):
+        field, kind, arg = term
+        base = "SELECT record_id FROM terms WHERE dataset = ? AND field = ? AND "
+        if kind == "eq":
+            return base + "value = ?", [dataset, field, _normalize(field, arg)]
+        if kind == "phrase":
+            return base + "value LIKE ?", [dataset, field, f"%{_normalize(field, arg)}%"]
+        if kind == "prefix":
+            return base + "value LIKE ?", [dataset, field, f"{_normalize(field, arg)}%"]
+        lo, hi = arg
+        sql, args = base + "1", [dataset, field]
+        if lo != "*":
+            sql += " AND value >= ?"
+            args.append(_normalize(field, lo))
+        if hi != "*":
+            sql += " AND value <= ?"
+            args.append(_normalize(field, hi))
+        return sql, args
+
+    def _match_sql(self, dataset, search):
+        """SQL selecting matching record ids, or None if unsupported."""
+        if not search:
+            return "SELECT id AS record_id FROM records WHERE dataset = ?", [dataset]
+        clauses = parse_search(search)
+        if clauses is None:
+            return None
+        indexed = INDEXED_FIELDS[dataset]
+        parts, args = [], []
+        for clause in clauses:
+            selects = []
+            for term in clause:
+                if term[0] not in indexed:
+                    return None
+                sql, targs = self._term_sql(dataset, term)
+                selects.append(sql)
+                args.extend(targs)
+            parts.append("SELECT record_id FROM (" + " INTERSECT ".join(selects) + ")")
+        return " UNION ".join(parts), args
+
+    def query(self, dataset, params):
+        """Answer an openFDA-style query from the local store.
+
+        Returns:
+            openFDA-shaped response dict, or None if the dataset is not
+            ingested or the query is outside the supported subset.
+        """
+        if dataset not in INDEXED_FIELDS or not self.has_dataset(dataset):
+            return None
+        params = dict(params)
+        params.pop("api_key", None)
+        match = self._match_sql(dataset, params.get("search"))
+        if match is None:
+            return None
+        match_sql, match_args = match
+
+        if params.get("count"):
+            return self._count(dataset, params, match_sql, match_args)
+
+        try:
+            limit = min(int(params.get("limit", DEFAULT_LIMIT)), MAX_LIMIT)
+            skip = int(params.get("skip", 0))
+        except ValueError:
+            return None
+        order, order_args = "", []
+        if params.get("sort"):
+            field, _, direction = params["sort"].partition(":")
+            field = field[:-len(".exact")] if field.endswith(".exact") else field
+            if field not in INDEXED_FIELDS[dataset]:
+                return None
+            order = ("ORDER BY (SELECT MIN(t.value) FROM terms t WHERE t.record_id = r.id "
+                     f"AND t.field = ?) {'DESC' if direction.lower() == 'desc' else 'ASC'}, r.id")
+            order_args = [field]
+        else:
+            order = "ORDER BY r.id"
+
+        with self._lock:
+            total = self._conn.execute(
+                f"SELECT COUNT(*) FROM ({match_sql})", match_args).fetchone()[0]
+            rows = self._conn.execute(
+                f"WITH matched(record_id) AS ({match_sql}) "
+                f"SELECT r.data FROM records r JOIN matched m ON r.id = m.record_id "
+                f"{order} LIMIT ? OFFSET ?",
+                match_args + order_args + [limit, skip]).fetchall()
+        return {
+            "meta": self._meta(skip=skip, limit=limit, total=total),
+            "results": [json.loads(r[0]) for r in rows],
+        }
+
+    def _count(self, dataset, params, match_sql, match_args):
+        field = params["count"]
+        field = field[:-len(".exact")] if field.endswith(".exact") else field
+        if field not in INDEXED_FIELDS[dataset]:
+            return None
+        try:
+            limit = min(int(params.get("limit", DEFAULT_COUNT_LIMIT)), MAX_LIMIT)
+        except ValueError:
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                f"WITH matched(record_id) AS ({match_sql}) "
+                "SELECT t.raw, COUNT(DISTINCT t.record_id) AS c FROM terms t "
+                "JOIN matched m ON t.record_id = m.record_id "
+                "WHERE t.dataset = ? AND t.field = ? "
+                "GROUP BY t.raw ORDER BY c DESC, t.raw LIMIT ?",
+                match_args + [dataset, field, limit]).fetchall()
+        label = "time" if _is_date_field(field) else "term"
+        results = [{label: _normalize(field, raw) if label == "time" else raw, "count": c}
+                   for raw, c in rows]
+        return {"meta": self._meta(), "results": results}
+
+    def _meta(self, skip=None, limit=None, total=None):
+        meta = {"source": "local", "db_path": str(self.db_path)}
+        if total is not None:
+            meta["results"] = {"skip": skip, "limit": limit, "total": total}
+        return meta
+
+
+# ------------------------------------------------------------------
+# Download
+# ------------------------------------------------------------------
+
+def _user_agent():
+    try:
+        from version import PLUGIN_VERSION
+        return f"Mozilla/5.0 (FDA-Plugin/{PLUGIN_VERSION})"
+    except Exception:
+        return "Mozilla/5.0 (FDA-Plugin/0.0.0)"
+
+
+def list_partition_entries(dataset, index_url=DOWNLOAD_INDEX_URL):
+    """Return (file URL, version) for each partition of a device dataset.
+
+    openFDA keeps partition file names when it republishes a dataset, so
+    the version combines the dataset's export_date with the partition's
+    size_mb and record count.
+    """
+    req = urllib.request.Request(index_url, headers={"User-Agent": _user_agent()})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        index = json.load(resp)
+    entry = index.get("results", {}).get("device", {}).get(dataset, {})
+    export_date = entry.get("export_date", "")
+    return [(p["file"], f"{export_date}|{p.get('size_mb', '')}|{p.get('records', '')}")
+            for p in entry.get("partitions", []) if p.get("file")]
+
+
+def list_partitions(dataset, index_url=DOWNLOAD_INDEX_URL):
+    """Return the partition file URLs for a device dataset from download.json."""
+    return [url for url, _ in list_partition_entries(dataset, index_url)]
+
+
+def download_file(url, dest):
+    """Stream a URL to disk without holding it in memory."""
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_suffix(dest.suffix + ".part")
+    req = urllib.request.Request(url, headers={"User-Agent": _user_agent()})
+    with urllib.request.urlopen(req, timeout=120) as resp, open(tmp, "wb") as f:
+        shutil.copyfileobj(resp, f, 1 << 20)
+    os.replace(tmp, dest)
+    return dest
+
+
+def ingest_dataset(store, dataset, download_dir=None, force=False, keep_zips=False,
+                   partitions=None, progress=print):
+    """Download and ingest every partition of a dataset.
+
+    Partitions already ingested with the same version (export date, size
+    and record count in download.json) are skipped; a republished
+    partition replaces its old records. force=True clears the dataset
+    first.
+
+    Args:
+        partitions: Partition URLs, or (URL, version) pairs, instead of
+            the list from download.json.
+
+    Returns:
+        Number of records ingested in this run.
+    """
+    download_dir = Path(download_dir or Path(store.db_path).parent / "downloads")
+    entries = [p if isinstance(p, tuple) else (p, None) for p in partitions] if partitions \
+        else list_partition_entries(dataset)
+    if force:
+        store.delete_dataset(dataset)
+    total = 0
+    for i, (url, version) in enumerate(entries, 1):
+        name = url.rsplit("/", 1)[-1]
+        if store.is_ingested(dataset, name, version):
+            progress(f"  [{i}/{len(entries)}] {name}: already ingested")
+            continue
+        path = download_file(url, download_dir / dataset / name)
+        try:
+            count = store.ingest_zip(dataset, path, partition=name, version=version)
+        finally:
+            if not keep_zips:
+                path.unlink(missing_ok=True)
+        total += count
+        progress(f"  [{i}/{len(entries)}] {name}: {count} records")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest openFDA bulk device datasets")
+    parser.add_argument("--db", help=f"Store path (default: {DEFAULT_DB_PATH} or FDA_BULK_DB)")
+    parser.add_argument("--ingest", nargs="+", choices=DATASETS, metavar="DATASET",
+                        help=f"Download and ingest datasets: {', '.join(DATASETS)}")
+    parser.add_argument("--ingest-zip", nargs=2, metavar=("DATASET", "ZIP"),
+                        help="Ingest one already-downloaded partition zip")
+    parser.add_argument("--force", action="store_true",
+                        help="Clear and re-ingest datasets that are already present")
+    parser.add_argument("--keep-zips", action="store_true",
+                        help="Keep downloaded partition zips")
+    parser.add_argument("--status", action="store_true", help="Show ingested datasets")
+    args = parser.parse_args()
+
+    store = BulkStore(args.db)
+    if args.ingest:
+        for dataset in args.ingest:
+            print(f"Ingesting {dataset}...")
+            count = ingest_dataset(store, dataset, force=args.force, keep_zips=args.keep_zips)
+            print(f"  {dataset}: {count} records ingested")
+    elif args.ingest_zip:
+        dataset, path = args.ingest_zip
+        if dataset not in DATASETS:
+            parser.error(f"Unknown dataset: {dataset}")
+        count = store.ingest_zip(dataset, path)
+        print(f"{dataset}: {count} records ingested from {path}")
+    elif args.status:
+        status = store.status()
+        print(f"Store: {store.db_path}")
+        if not status:
+            print("  (empty — run with --ingest)")
+        for dataset, info in sorted(status.items()):
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(info["ingested_at"]))
+            print(f"  {dataset:15s} {info['records']:>10} records  "
+                  f"{info['partitions']} partition(s)  ingested {when}")
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
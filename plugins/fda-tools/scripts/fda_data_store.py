@@ -2,9 +2,13 @@
 """
 FDA Project Data Store — Context-Surviving API Cache.
 
-Wraps fda_api_client.py with a project-level manifest (data_manifest.json)
-so that commands can check "has this been fetched?" and reuse cached results
-without re-querying after context compaction.
+Wraps fda_api_client.py with a project-level manifest so that commands can
+check "has this been fetched?" and reuse cached results without re-querying
+after context compaction. The manifest lives in data_manifest.db (one row
+per query, see fda_manifest_store.py) and is exported to data_manifest.json
+after each change. Summaries are shared between projects through
+<projects_dir>/.summaries.db: a product code fetched for one project is
+reused, not re-fetched, by every other project until its TTL expires.
 
 Usage:
     python3 fda_data_store.py --project NAME --query classification --product-code OVE
@@ -14,30 +18,75 @@ Usage:
     python3 fda_data_store.py --project NAME --query 510k-batch --k-numbers K241335,K200123
     python3 fda_data_store.py --project NAME --query enforcement --product-code OVE
     python3 fda_data_store.py --project NAME --show-manifest
+    python3 fda_data_store.py --project NAME --prefetch [--product-codes OVE,DQY]
+    python3 fda_data_store.py --project NAME --batch queries.jsonl   # or --batch - (stdin)
+    python3 fda_data_store.py --project NAME --refresh-all [--eager]
     python3 fda_data_store.py --project NAME --query classification --product-code OVE --refresh
+
+While a daemon is running (python3 fda_store_daemon.py), --query,
+--show-manifest, --refresh-all and --clear are sent to it over its Unix
+socket; otherwise, or with --no-daemon, they run in this process. The
+forwarding happens before the imports below, so a call the daemon answers
+costs little more than interpreter startup.
 """
 
+import os
+import sys
+
+# Import sibling modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fda_store_client import DAEMON_ARGS, parse_args, run_in_daemon
+
+# Whether the daemon was already tried for this command line (below)
+_daemon_tried = False
+if __name__ == "__main__":
+    from fda_store_client import forward
+    if forward(sys.argv[1:]):
+        sys.exit(0)
+    _daemon_tried = parse_args(sys.argv[1:]) is not None
+
 import argparse
 import json
-import os
 import re
-import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
-# Import FDAClient from sibling module
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from fda_api_client import FDAClient
-
-# TTL tiers in hours
-TTL_TIERS = {
-    "classification": 168,   # 7 days — rarely changes
-    "510k": 168,             # 7 days — historical data
-    "510k-batch": 168,       # 7 days — historical data
-    "pma": 168,              # 7 days — historical data
-    "recalls": 24,           # 24 hours — safety-critical
-    "events": 24,            # 24 hours — new events filed daily
-    "enforcement": 24,       # 24 hours — active enforcement changes
-    "udi": 168,              # 7 days — device identifiers stable
+from fda_api_client import (
+    SOURCE_STALE,
+    WARM_WORKERS,
+    FDAClient,
+    collect_product_codes,
+    endpoint_ttl,
+    format_warm_report,
+)
+from fda_manifest_store import SUMMARY_DB, ManifestStore, SummaryStore, remove_manifest
+
+# TTL tiers in hours per query type, taken from FDAClient's per-endpoint
+# TTL policy so the manifest and the API cache expire together:
+# 7 days for classification / 510(k) / PMA / UDI, 24 hours for
+# safety-critical recalls, events and enforcement.
+QUERY_ENDPOINTS = {
+    "classification": "classification",
+    "510k": "510k",
+    "510k-batch": "510k",
+    "pma": "pma",
+    "recalls": "recall",
+    "events": "event",
+    "enforcement": "enforcement",
+    "udi": "udi",
+}
+TTL_TIERS = {qt: endpoint_ttl(ep) // 3600 for qt, ep in QUERY_ENDPOINTS.items()}
+
+# Query types accepted by --query and --batch, and the argument each requires
+QUERY_TYPES = ["classification", "recalls", "events", "510k", "510k-batch", "enforcement"]
+REQUIRED_ARGS = {
+    "classification": "product_code",
+    "recalls": "product_code",
+    "events": "product_code",
+    "enforcement": "product_code",
+    "510k": "k_number",
+    "510k-batch": "k_numbers",
 }
 
 
@@ -52,15 +101,92 @@ def get_projects_dir():
     return os.path.expanduser("~/fda-510k-data/projects")
 
 
+
+# Shared FDAClient and open manifest stores while running inside the
+# daemon (see enable_resident_state); None for one-shot CLI runs
+_resident = None
+
+
+def enable_resident_state(client=None):
+    """Keep one FDAClient and each project's ManifestStore open across calls.
+
+    Args:
+        client: FDAClient to share (default: a new one).
+    """
+    global _resident
+    _resident = {"client": client or FDAClient(), "stores": {}, "summaries": {},
+                 "lock": threading.Lock()}
+
+
+def disable_resident_state():
+    """Close resident manifest stores and return to per-call state."""
+    global _resident
+    resident, _resident = _resident, None
+    if resident:
+        for store in resident["stores"].values():
+            store.close()
+        for summaries in resident["summaries"].values():
+            summaries.close()
+
+
+def get_client():
+    """The resident FDAClient, or a new one."""
+    return _resident["client"] if _resident else FDAClient()
+
+
+def summary_store_path(project_dir):
+    """Path of the summary store shared by project_dir and its siblings."""
+    return os.path.join(os.path.dirname(os.path.abspath(project_dir)), SUMMARY_DB)
+
+
+def open_store(project_dir):
+    """The resident ManifestStore for project_dir, or a new one.
+
+    Stores are opened with the shared SummaryStore of the projects directory.
+    """
+    if _resident is None:
+        return ManifestStore(project_dir, summaries=SummaryStore(summary_store_path(project_dir)))
+    key = os.path.abspath(project_dir)
+    with _resident["lock"]:
+        store = _resident["stores"].get(key)
+        if store is not None and not store.db_path.exists():
+            store.close()  # Deleted behind our back; reopen a fresh database
+            store = None
+        if store is None:
+            path = summary_store_path(project_dir)
+            summaries = _resident["summaries"].get(path)
+            if summaries is None:
+                summaries = _resident["summaries"][path] = SummaryStore(path)
+            store = _resident["stores"][key] = ManifestStore(project_dir, summaries=summaries)
+        else:
+            store.sync()
+    return store
+
+
+def close_store(project_dir):
+    """Close the resident ManifestStore for project_dir, if any."""
+    if _resident is None:
+        return
+    with _resident["lock"]:
+        store = _resident["stores"].pop(os.path.abspath(project_dir), None)
+    if store is not None:
+        store.close()
+
+
 def load_manifest(project_dir):
-    """Load or create a project manifest."""
-    manifest_path = os.path.join(project_dir, "data_manifest.json")
-    if os.path.exists(manifest_path):
+    """Load or create a project manifest.
+
+    Returns:
+        The manifest as a data_manifest.json-style dict (a snapshot; use
+        ManifestStore to update single entries).
+    """
+    if os.path.isdir(project_dir):
+        store = ManifestStore(project_dir, summaries=SummaryStore(summary_store_path(project_dir)))
         try:
-            with open(manifest_path) as f:
-                return json.load(f)
-        except (json.JSONDecodeError, OSError):
-            pass
+            return store.to_dict()
+        finally:
+            store.close()
+            store.summaries.close()
     return {
         "project": os.path.basename(project_dir),
         "created_at": datetime.now(timezone.utc).isoformat(),
@@ -71,12 +197,20 @@ def load_manifest(project_dir):
 
 
 def save_manifest(project_dir, manifest):
-    """Save the project manifest."""
+    """Save the project manifest.
+
+    Entries and product codes are merged into the manifest store; entries
+    absent from manifest are kept, so saving an old snapshot never drops
+    entries written by another process.
+    """
     manifest["last_updated"] = datetime.now(timezone.utc).isoformat()
-    manifest_path = os.path.join(project_dir, "data_manifest.json")
-    os.makedirs(project_dir, exist_ok=True)
-    with open(manifest_path, "w") as f:
-        json.dump(manifest, f, indent=2)
+    store = ManifestStore(project_dir, summaries=SummaryStore(summary_store_path(project_dir)))
+    try:
+        store.update(manifest)
+        store.export_json()
+    finally:
+        store.close()
+        store.summaries.close()
 
 
 def is_expired(entry):
@@ -95,6 +229,15 @@ def is_expired(entry):
         return True
 
 
+def _fetched_after(entry, other):
+    """True if entry was fetched later than other."""
+    try:
+        return datetime.fromisoformat(entry["fetched_at"]) > datetime.fromisoformat(
+            other.get("fetched_at", ""))
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
 def make_query_key(query_type, **kwargs):
     """Generate a canonical query key from arguments."""
     parts = [query_type]
@@ -322,26 +465,27 @@ def print_enforcement(summary, cache_status, fetched_at):
     print(f"SOURCE:{source}")
 
 
-def handle_query(args):
-    """Handle a data store query — check manifest, fetch if needed, update manifest."""
-    projects_dir = get_projects_dir()
-    project_dir = os.path.join(projects_dir, args.project)
-    os.makedirs(project_dir, exist_ok=True)
-
-    manifest = load_manifest(project_dir)
-    client = FDAClient()
+def fetch_query(client, store, query_type, product_code=None, k_number=None,
+                k_numbers=None, count_field=None, refresh=False):
+    """Answer one query from the manifest, or fetch it and record it there.
 
-    query_type = args.query
-    product_code = getattr(args, "product_code", None)
-    k_number = getattr(args, "k_number", None)
-    k_numbers = getattr(args, "k_numbers", None)
-    count_field = getattr(args, "count", None)
-    refresh = getattr(args, "refresh", False)
+    A fetched entry is upserted into the ManifestStore immediately; the
+    caller exports data_manifest.json when it is done. When the store has
+    a SummaryStore, a fresh summary fetched by another project is adopted
+    (a HIT) instead of re-fetched, and new fetches are shared with others.
 
-    if k_numbers:
-        k_numbers = [k.strip().upper() for k in k_numbers.split(",") if k.strip()]
+    refresh=True skips the manifest, the shared summaries and the
+    client's API cache (see FDAClient.bypass_cache) and re-fetches.
 
-    # Build query key
+    Returns:
+        (cache_status, summary, fetched_at, error): cache_status is HIT,
+        MISS or STALE (API error, previous summary reused); on an error with
+        no previous entry summary is None and error holds the message. A
+        partial batch answer (some chunks failed) counts as an error when a
+        previous entry exists, and is otherwise returned without recording.
+        An expired API cache entry served by stale-while-revalidate is
+        returned as STALE with its original fetch time, without recording.
+    """
     key = make_query_key(
         query_type,
         product_code=product_code,
@@ -351,41 +495,56 @@ def handle_query(args):
     )
 
     # Check manifest for cached entry
-    entry = manifest["queries"].get(key)
+    entry = store.get(key)
+    if not refresh and store.summaries is not None:
+        shared = store.summaries.latest(key)
+        if (shared and not is_expired(shared)
+                and (entry is None or is_expired(entry) or _fetched_after(shared, entry))):
+            store.upsert(key, shared, product_code=product_code)
+            return "HIT", shared["summary"], shared["fetched_at"], None
     if entry and not refresh and not is_expired(entry):
-        summary = entry.get("summary", {})
-        fetched_at = entry.get("fetched_at", "unknown")
-        _print_result(query_type, summary, "HIT", fetched_at, count_field)
-        return
+        return "HIT", entry.get("summary", {}), entry.get("fetched_at", "unknown"), None
 
     # Cache miss — fetch from API
-    result = _fetch_from_api(client, query_type, product_code, k_number, k_numbers, count_field)
+    if refresh:
+        with client.bypass_cache():
+            result = _fetch_from_api(client, query_type, product_code, k_number, k_numbers,
+                                     count_field)
+    else:
+        result = _fetch_from_api(client, query_type, product_code, k_number, k_numbers,
+                                 count_field)
 
     if result.get("degraded") or result.get("error"):
-        # API error — check if we have a stale cache entry
+        # API error — fall back to a stale cache entry if we have one
         if entry:
-            summary = entry.get("summary", {})
-            fetched_at = entry.get("fetched_at", "unknown")
-            print("WARNING:API_ERROR — using stale cached data", file=sys.stderr)
-            _print_result(query_type, summary, "STALE", fetched_at, count_field)
-            return
-        print(f"CACHE_STATUS:MISS")
-        print(f"ERROR:{result.get('error', 'API unavailable')}")
-        return
+            return "STALE", entry.get("summary", {}), entry.get("fetched_at", "unknown"), None
+        return "MISS", None, None, result.get("error", "API unavailable")
 
     # Extract summary
     summary = _extract_summary(query_type, result, count_field)
 
+    if client.last_source == SOURCE_STALE:
+        # Expired data refreshing in the background: recording it would give
+        # it a new fetch time and a full TTL
+        return ("STALE", summary,
+                datetime.fromtimestamp(client.last_cached_at, timezone.utc).isoformat(), None)
+
+    if result.get("partial"):
+        # Some batch chunks failed: never record an incomplete answer
+        if entry:
+            return "STALE", entry.get("summary", {}), entry.get("fetched_at", "unknown"), None
+        return "MISS", summary, datetime.now(timezone.utc).isoformat(), None
+
     # Get cache key from the client's internal cache
     cache_key = client._cache_key(
         _get_endpoint(query_type),
         _get_params(query_type, product_code, k_number, k_numbers, count_field),
     )
 
-    # Update manifest
+    # Update manifest (and track the product code)
     now = datetime.now(timezone.utc).isoformat()
     total = result.get("meta", {}).get("results", {}).get("total", 0)
-    manifest["queries"][key] = {
+    entry = {
         "fetched_at": now,
         "ttl_hours": TTL_TIERS.get(query_type, 24),
         "source": "openFDA",
@@ -393,13 +552,231 @@ def handle_query(args):
         "summary": summary,
         "api_cache_key": cache_key,
     }
+    if store.summaries is not None:
+        entry["summary_ref"] = store.summaries.put(key, entry)
+    store.upsert(key, entry, product_code=product_code)
+    return "MISS", summary, now, None
+
+
+def parse_query_key(key):
+    """Invert make_query_key(): fetch_query() keyword arguments for a key.
+
+    Returns:
+        Dict with query_type, product_code, k_number, k_numbers and
+        count_field, or None for keys this version cannot re-run.
+    """
+    query_type, _, rest = key.partition(":")
+    required = REQUIRED_ARGS.get(query_type)
+    if required is None or not rest:
+        return None
+    value, _, count_field = rest.partition(":count:")
+    kwargs = {"query_type": query_type, "product_code": None, "k_number": None,
+              "k_numbers": None, "count_field": count_field or None}
+    kwargs[required] = parse_k_numbers(value) if required == "k_numbers" else value
+    return kwargs
+
+
+def parse_k_numbers(value):
+    """Normalize a comma-separated string or list of K-numbers (None if empty)."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    return [str(k).strip().upper() for k in value if str(k).strip()] or None
+
+
+def parse_batch_spec(line):
+    """Parse one --batch JSON line.
+
+    A spec looks like ``{"query": "events", "product_code": "OVE",
+    "count": "event_type.exact"}``; ``k_numbers`` may be a list or a
+    comma-separated string, ``refresh`` forces a fetch and an optional
+    ``id`` is echoed in the result.
+
+    Returns:
+        (spec_id, kwargs) where kwargs are fetch_query() keyword arguments.
+
+    Raises:
+        ValueError: If the line is not a JSON object or misses a required field.
+    """
+    try:
+        spec = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON: {e}") from e
+    if not isinstance(spec, dict):
+        raise ValueError("query spec must be a JSON object")
+    query_type = spec.get("query")
+    if query_type not in REQUIRED_ARGS:
+        raise ValueError(f"query must be one of: {', '.join(QUERY_TYPES)}")
+    kwargs = {
+        "query_type": query_type,
+        "product_code": spec.get("product_code"),
+        "k_number": spec.get("k_number"),
+        "k_numbers": parse_k_numbers(spec.get("k_numbers")),
+        "count_field": spec.get("count"),
+        "refresh": bool(spec.get("refresh", False)),
+    }
+    required = REQUIRED_ARGS[query_type]
+    if not kwargs[required]:
+        raise ValueError(f"{required} is required for query {query_type}")
+    return spec.get("id"), kwargs
+
+
+def handle_batch(args):
+    """Answer many queries from JSON lines with one client and one manifest export.
 
-    # Track product codes
-    if product_code and product_code not in manifest.get("product_codes", []):
-        manifest.setdefault("product_codes", []).append(product_code)
+    Specs are read from args.batch (a path, or ``-`` for stdin). Queries run
+    concurrently on args.workers threads; manifest hits return immediately
+    and misses share the client's rate limiter and cache. One JSON result is
+    printed per input line, in input order, with the same cache_status
+    (HIT, MISS or STALE) that --query prints.
+    """
+    projects_dir = get_projects_dir()
+    project_dir = os.path.join(projects_dir, args.project)
+    os.makedirs(project_dir, exist_ok=True)
+
+    if args.batch == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(args.batch) as f:
+            lines = f.read().splitlines()
+    jobs = [(n, line) for n, line in enumerate(lines, 1) if line.strip()]
+
+    store = open_store(project_dir)
+    client = get_client()
 
-    save_manifest(project_dir, manifest)
-    _print_result(query_type, summary, "MISS", now, count_field)
+    def run(job):
+        n, line = job
+        try:
+            spec_id, kwargs = parse_batch_spec(line)
+        except ValueError as e:
+            return {"line": n, "cache_status": "MISS", "error": str(e)}
+        status, summary, fetched_at, error = fetch_query(client, store, **kwargs)
+        result = {
+            "line": n,
+            "query": kwargs["query_type"],
+            "key": make_query_key(
+                kwargs["query_type"],
+                product_code=kwargs["product_code"],
+                k_number=kwargs["k_number"],
+                k_numbers=kwargs["k_numbers"],
+                count_field=kwargs["count_field"],
+            ),
+            "cache_status": status,
+            "fetched_at": fetched_at,
+            "summary": summary,
+        }
+        if spec_id is not None:
+            result["id"] = spec_id
+        if error:
+            result["error"] = error
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        results = list(pool.map(run, jobs))
+
+    counts = {"HIT": 0, "MISS": 0, "STALE": 0, "ERROR": 0}
+    for result in results:
+        counts["ERROR" if "error" in result else result["cache_status"]] += 1
+        print(json.dumps(result))
+    if counts["MISS"]:
+        store.export_json()
+    print(f"BATCH:{len(results)} queries, {counts['HIT']} hit, {counts['MISS']} miss, "
+          f"{counts['STALE']} stale, {counts['ERROR']} error", file=sys.stderr)
+
+
+def handle_query(args):
+    """Handle a data store query — check manifest, fetch if needed, update manifest."""
+    projects_dir = get_projects_dir()
+    project_dir = os.path.join(projects_dir, args.project)
+    os.makedirs(project_dir, exist_ok=True)
+
+    store = open_store(project_dir)
+    client = get_client()
+
+    query_type = args.query
+    k_numbers = parse_k_numbers(getattr(args, "k_numbers", None))
+    count_field = getattr(args, "count", None)
+
+    status, summary, fetched_at, error = fetch_query(
+        client, store, query_type,
+        product_code=getattr(args, "product_code", None),
+        k_number=getattr(args, "k_number", None),
+        k_numbers=k_numbers,
+        count_field=count_field,
+        refresh=getattr(args, "refresh", False),
+    )
+    if error:
+        print(f"CACHE_STATUS:MISS")
+        print(f"ERROR:{error}")
+        return
+    if status == "STALE":
+        print("WARNING:API_ERROR — using stale cached data", file=sys.stderr)
+    elif status == "MISS":
+        store.export_json()
+    _print_result(query_type, summary, status, fetched_at, count_field)
+
+
+# Manifest queries recorded per product code by --prefetch: (query type, count field)
+PREFETCH_QUERIES = (
+    ("classification", None),
+    ("recalls", None),
+    ("events", None),
+    ("events", "event_type.exact"),
+    ("enforcement", None),
+)
+
+
+def project_product_codes(project_dir):
+    """Product codes named in a project's query.json, review.json and manifest."""
+    codes = []
+    for name in ("query.json", "review.json", "data_manifest.json"):
+        path = os.path.join(project_dir, name)
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    codes.extend(collect_product_codes(json.load(f)))
+            except (json.JSONDecodeError, OSError):
+                continue
+    return list(dict.fromkeys(codes))
+
+
+def handle_prefetch(args):
+    """Warm the API cache and the project manifest for a portfolio of product codes."""
+    projects_dir = get_projects_dir()
+    project_dir = os.path.join(projects_dir, args.project)
+    os.makedirs(project_dir, exist_ok=True)
+
+    if args.product_codes:
+        codes = [c.strip().upper() for c in args.product_codes.split(",") if c.strip()]
+    else:
+        codes = project_product_codes(project_dir)
+    if not codes:
+        print(f"ERROR:no product codes given and none found in {project_dir}")
+        return
+
+    client = get_client()
+    report = client.warm(codes, max_workers=args.workers)
+
+    store = open_store(project_dir)
+    recorded = 0
+    for code in codes:
+        for query_type, count_field in PREFETCH_QUERIES:
+            status, _, _, error = fetch_query(client, store, query_type, product_code=code,
+                                              count_field=count_field,
+                                              refresh=getattr(args, "refresh", False))
+            label = query_type + (f" count:{count_field}" if count_field else "")
+            report[code][f"manifest {label}"] = (
+                f"error: {error}" if error else
+                {"HIT": "cached", "STALE": "stale"}.get(status, "fetched"))
+            recorded += 0 if error or status == "STALE" else 1
+    store.export_json()
+
+    print(f"PROJECT:{args.project}")
+    print(f"PRODUCT_CODES:{','.join(codes)}")
+    print(f"MANIFEST_ENTRIES:{recorded}")
+    print("WARM_REPORT:")
+    print(format_warm_report(report))
 
 
 def _fetch_from_api(client, query_type, product_code, k_number, k_numbers, count_field):
@@ -417,10 +794,7 @@ def _fetch_from_api(client, query_type, product_code, k_number, k_numbers, count
     elif query_type == "510k-batch":
         return client.batch_510k(k_numbers)
     elif query_type == "enforcement":
-        return client._request("enforcement", {
-            "search": f'product_code:"{product_code}"',
-            "limit": "100",
-        })
+        return client.get_enforcement(product_code, limit=100)
     else:
         return {"error": f"Unknown query type: {query_type}", "degraded": True}
 
@@ -444,14 +818,7 @@ def _extract_summary(query_type, result, count_field=None):
 
 def _get_endpoint(query_type):
     """Map query type to API endpoint."""
-    return {
-        "classification": "classification",
-        "recalls": "recall",
-        "events": "event",
-        "510k": "510k",
-        "510k-batch": "510k",
-        "enforcement": "enforcement",
-    }.get(query_type, query_type)
+    return QUERY_ENDPOINTS.get(query_type, query_type)
 
 
 def _get_params(query_type, product_code, k_number, k_numbers, count_field):
@@ -496,7 +863,12 @@ def handle_show_manifest(args):
     """Show the project manifest summary."""
     projects_dir = get_projects_dir()
     project_dir = os.path.join(projects_dir, args.project)
-    manifest = load_manifest(project_dir)
+    if os.path.isdir(project_dir):
+        store = open_store(project_dir)
+        manifest = store.to_dict()
+        store.export_json()
+    else:
+        manifest = load_manifest(project_dir)
 
     print(f"PROJECT:{manifest.get('project', args.project)}")
     print(f"LAST_UPDATED:{manifest.get('last_updated', 'never')}")
@@ -578,9 +950,8 @@ def handle_clear(args):
     """Clear all cached data for a project."""
     projects_dir = get_projects_dir()
     project_dir = os.path.join(projects_dir, args.project)
-    manifest_path = os.path.join(project_dir, "data_manifest.json")
-    if os.path.exists(manifest_path):
-        os.remove(manifest_path)
+    close_store(project_dir)
+    if remove_manifest(project_dir):
         print(f"CLEARED:data_manifest.json for project {args.project}")
     else:
         print(f"NO_MANIFEST:no data_manifest.json found for project {args.project}")
@@ -590,56 +961,144 @@ def handle_refresh_all(args):
     """Mark all manifest entries as stale by setting fetched_at to epoch."""
     projects_dir = get_projects_dir()
     project_dir = os.path.join(projects_dir, args.project)
-    manifest = load_manifest(project_dir)
-    count = 0
-    for key in manifest.get("queries", {}):
-        manifest["queries"][key]["fetched_at"] = "1970-01-01T00:00:00+00:00"
-        count += 1
-    save_manifest(project_dir, manifest)
+    store = open_store(project_dir)
+    count = store.mark_all_stale()
+    store.export_json()
     print(f"REFRESHED:{count} entries marked as stale for project {args.project}")
 
 
+def describe_changes(old, new):
+    """Summarize how a manifest entry changed, e.g. ``total 3→4, active_recalls 0→1``.
+
+    Compares total_matches and the scalar summary fields; summary fields
+    that only repeat the total change are left out, and nested summary
+    values are reported by name only.
+    """
+    changes = []
+    totals = (old.get("total_matches"), new.get("total_matches"))
+    if totals[0] != totals[1]:
+        changes.append(f"total {totals[0]}→{totals[1]}")
+    old_summary, new_summary = old.get("summary") or {}, new.get("summary") or {}
+    for field in new_summary:
+        before, after = old_summary.get(field), new_summary[field]
+        if before == after or (before, after) == totals:
+            continue
+        if isinstance(after, (dict, list)) or isinstance(before, (dict, list)):
+            changes.append(f"{field} changed")
+        else:
+            changes.append(f"{field} {before}→{after}")
+    return ", ".join(changes)
+
+
+def handle_refresh_eager(args):
+    """Re-fetch every manifest entry now, concurrently, and report what changed.
+
+    Queries run on args.workers threads under the client's shared rate
+    limiter. An entry whose re-fetch fails keeps its previous data and is
+    reported as FAILED; data_manifest.json is exported once at the end.
+    """
+    projects_dir = get_projects_dir()
+    project_dir = os.path.join(projects_dir, args.project)
+    store = open_store(project_dir)
+    client = get_client()
+    entries = store.to_dict()["queries"]
+
+    def refresh(key):
+        kwargs = parse_query_key(key)
+        if kwargs is None:
+            return key, "SKIPPED", "unrecognized query key"
+        status, _, _, error = fetch_query(client, store, refresh=True, **kwargs)
+        if error or status != "MISS":
+            return key, "FAILED", error or "API error, previous data kept"
+        changes = describe_changes(entries[key], store.get(key))
+        return key, "CHANGED" if changes else "UNCHANGED", changes
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers or WARM_WORKERS)) as pool:
+        results = list(pool.map(refresh, entries))
+    store.export_json()
+
+    counts = {}
+    for key, outcome, detail in results:
+        counts[outcome] = counts.get(outcome, 0) + 1
+        print(f"{outcome}:{key}" + (f" {detail}" if detail else ""))
+    print("---")
+    print(f"REFRESHED:{len(results)} entries re-fetched for project {args.project} "
+          f"({counts.get('CHANGED', 0)} changed, {counts.get('UNCHANGED', 0)} unchanged, "
+          f"{counts.get('FAILED', 0)} failed, {counts.get('SKIPPED', 0)} skipped)")
+
+
+def _run_in_daemon(args):
+    """Send a --query/--show-manifest/--refresh-all/--clear call to the daemon.
+
+    Skipped when the early forward() already tried the daemon with this
+    command line, so a failed attempt is not waited for twice.
+
+    Returns:
+        True if a daemon answered (its output has been printed), False to
+        run in this process.
+    """
+    if _daemon_tried:
+        return False
+    return run_in_daemon(vars(args))
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="FDA Project Data Store — Context-Surviving API Cache"
     )
     parser.add_argument("--project", required=True, help="Project name")
-    parser.add_argument(
-        "--query",
-        choices=["classification", "recalls", "events", "510k", "510k-batch", "enforcement"],
-        help="Query type",
-    )
+    parser.add_argument("--query", choices=QUERY_TYPES, help="Query type")
     parser.add_argument("--product-code", dest="product_code", help="FDA product code")
     parser.add_argument("--k-number", dest="k_number", help="Single K-number for 510k lookup")
     parser.add_argument("--k-numbers", dest="k_numbers", help="Comma-separated K-numbers for batch lookup")
     parser.add_argument("--count", help="Count field for events query (e.g., event_type.exact)")
-    parser.add_argument("--refresh", action="store_true", help="Force refresh (ignore manifest cache)")
+    parser.add_argument("--refresh", action="store_true", help="Force a re-fetch (ignore manifest and API cache)")
     parser.add_argument("--show-manifest", action="store_true", dest="show_manifest", help="Show manifest summary")
     parser.add_argument("--clear", action="store_true", help="Clear all cached data for project")
     parser.add_argument("--refresh-all", action="store_true", dest="refresh_all", help="Mark all entries as stale")
+    parser.add_argument("--eager", action="store_true",
+                        help="With --refresh-all, re-fetch every entry now and report changes")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="Warm the API cache and manifest for --product-codes, or for the "
+                             "codes in the project's query.json / review.json")
+    parser.add_argument("--product-codes", dest="product_codes",
+                        help="Comma-separated product codes for --prefetch")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="Run the query specs in a JSONL file (- for stdin) and print "
+                             "one JSON result per line")
+    parser.add_argument("--workers", type=int, default=WARM_WORKERS,
+                        help=f"Concurrent queries for --prefetch, --batch and --refresh-all --eager "
+                             f"(default: {WARM_WORKERS})")
+    parser.add_argument("--no-daemon", action="store_true", dest="no_daemon",
+                        help="Run in this process even if a data-store daemon is running")
+    parser.add_argument("--socket", help="Data-store daemon socket path")
 
     args = parser.parse_args()
 
+    if args.query:
+        # Validate required arguments per query type
+        required = REQUIRED_ARGS[args.query]
+        if not getattr(args, required):
+            parser.error(f"--{required.replace('_', '-')} is required for --query {args.query}")
+    if not args.no_daemon and _run_in_daemon(args):
+        return
+
     if args.clear:
         handle_clear(args)
+    elif args.refresh_all and args.eager:
+        handle_refresh_eager(args)
     elif args.refresh_all:
         handle_refresh_all(args)
     elif args.show_manifest:
         handle_show_manifest(args)
+    elif args.prefetch:
+        handle_prefetch(args)
+    elif args.batch:
+        handle_batch(args)
     elif args.query:
-        # Validate required arguments per query type
-        if args.query in ("classification", "recalls", "events", "enforcement"):
-            if not args.product_code:
-                parser.error(f"--product-code is required for --query {args.query}")
-        elif args.query == "510k":
-            if not args.k_number:
-                parser.error("--k-number is required for --query 510k")
-        elif args.query == "510k-batch":
-            if not args.k_numbers:
-                parser.error("--k-numbers is required for --query 510k-batch")
         handle_query(args)
     else:
-        parser.error("Specify --query, --show-manifest, --clear, or --refresh-all")
+        parser.error("Specify --query, --batch, --prefetch, --show-manifest, --clear, or --refresh-all")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Request coalescing for single K-number lookups.
+
+Most callers look up 510(k) clearances one K-number at a time, which costs
+one openFDA request (and one rate-limit token) per device. KNumberLoader
+collects pending lookups for a short window, or until a batch fills, and
+sends them as a single ``k_number:"..." OR ...`` query through
+FDAClient.batch_510k(). Each caller gets the same response shape as
+FDAClient.get_510k(), and batch_510k() caches every record under its
+single-key entry so later get_510k() calls are cache hits.
+
+Usage:
+    from fda_api_client import FDAClient
+    from fda_dataloader import KNumberLoader
+
+    loader = KNumberLoader(FDAClient())
+    result = loader.load("K241335")                 # coalesced with other threads
+    results = loader.load_many(["K241335", "K200123"])   # {k_number: result}
+"""
+
+import threading
+from concurrent.futures import Future
+
+from fda_api_client import single_record_response
+
+# Max K-numbers per OR query (keeps the URL well under server limits)
+DEFAULT_BATCH_SIZE = 100
+
+# Seconds to wait for more lookups before sending a partial batch
+DEFAULT_WINDOW = 0.02
+
+
+def normalize_k_number(k_number):
+    """Upper-case and strip a K-number, adding the K prefix if missing."""
+    k = str(k_number).strip().upper()
+    if k and k[0].isdigit():
+        k = "K" + k
+    return k
+
+
+class KNumberLoader:
+    """Coalesces concurrent get_510k() lookups into batched OR queries."""
+
+    def __init__(self, client, batch_size=DEFAULT_BATCH_SIZE, window=DEFAULT_WINDOW):
+        """Initialize the loader.
+
+        Args:
+            client: FDAClient used for the batched request and the cache.
+            batch_size: Max K-numbers per OR query.
+            window: Seconds a lookup may wait for others to join its batch.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.client = client
+        self.batch_size = batch_size
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+        self.batches_sent = 0
+        self.keys_requested = 0
+
+    def _cached(self, k_number):
+        key = self.client._cache_key("510k", self.client._510k_params(k_number))
+        return self.client._get_cached(key, "510k")
+
+    def submit(self, k_number):
+        """Queue a lookup and return a Future for its get_510k()-style result."""
+        k = normalize_k_number(k_number)
+        cached = self._cached(k)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+
+        batch = None
+        with self._lock:
+            future = self._pending.get(k)
+            if future is not None:
+                return future  # Same K-number already in flight
+            future = self._pending[k] = Future()
+            if len(self._pending) >= self.batch_size:
+                batch = self._take()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            self._dispatch(batch)
+        return future
+
+    def load(self, k_number):
+        """Look up one K-number, sharing a request with concurrent callers."""
+        return self.submit(k_number).result()
+
+    def load_many(self, k_numbers):
+        """Look up many K-numbers in as few requests as possible.
+
+        Returns:
+            Dict mapping each normalized K-number to its result.
+        """
+        futures = {normalize_k_number(k): self.submit(k) for k in k_numbers}
+        self.flush()
+        return {k: f.result() for k, f in futures.items()}
+
+    def flush(self):
+        """Send all pending lookups now."""
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._dispatch(batch)
+
+    def _take(self):
+        # Caller holds self._lock
+        batch, self._pending = self._pending, {}
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _dispatch(self, batch):
+        self.batches_sent += 1
+        self.keys_requested += len(batch)
+        try:
+            response = self.client.batch_510k(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                future.set_exception(e)
+            return
+
+        if not response or response.get("degraded") or "results" not in response:
+            # Errors are shared by the whole batch and never cached per key
+            for future in batch.values():
+                future.set_result(response)
+            return
+
+        # batch_510k() has already cached every record and every miss under
+        # its single K-number entry; split the response for the callers.
+        # K-numbers in a failed chunk get that chunk's error, not a miss.
+        failed = {}
+        for error in response.get("errors", []):
+            for k in error["k_numbers"]:
+                failed[k] = {"error": error["error"], "degraded": True}
+        by_k_number = {str(r.get("k_number", "")).upper(): r for r in response["results"]}
+        meta = response.get("meta")
+        for k, future in batch.items():
+            if k in failed:
+                future.set_result(failed[k])
+            else:
+                future.set_result(single_record_response(by_k_number.get(k), meta))
@@ -1,15 +1,48 @@
 #!/usr/bin/env python3
 """
-Shared FDA HTTP utilities — browser headers and session factory.
+Shared FDA HTTP transport — browser headers, pooled sessions, keep-alive.
 
-Provides consistent HTTP configuration across all FDA pipeline scripts
-(predicate_extractor.py, batchfetch.py, fda_api_client.py).
+Provides consistent HTTP configuration and connection reuse across all FDA
+pipeline scripts (predicate_extractor.py, batchfetch.py, fda_api_client.py,
+seed_test_project.py). Opening a new TLS connection per request dominated
+wall time in download and enrichment jobs, so every helper here keeps
+connections alive and reuses them:
+
+    get_session()   Per-thread requests.Session with a pooled HTTPAdapter,
+                    reused for every accessdata.fda.gov / api.fda.gov call
+                    made from that thread.
+    http_get()      Dependency-free keep-alive GET (http.client) with a
+                    per-thread, per-host connection pool. Used by FDAClient
+                    so the API client does not require requests. Honors
+                    HTTPS_PROXY / HTTP_PROXY / NO_PROXY like urlopen
+                    (HTTPS is tunneled through the proxy with CONNECT) and
+                    follows same-scheme redirects (up to MAX_REDIRECTS).
 
 Usage:
-    from fda_http import create_session, FDA_HEADERS
+    from fda_http import get_session, http_get, create_session, FDA_HEADERS
+
+    session = get_session()                  # pooled browser-style session
+    resp = session.get(pdf_url, timeout=60)
+
+    result = http_get("https://api.fda.gov/device/510k.json?search=...")
+    if result.status == 200:
+        data = json.loads(result.body)
 """
 
-import requests
+import base64
+import gzip
+import http.client
+import threading
+import urllib.parse
+import urllib.request
+from collections import namedtuple
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:  # http_get() still works without requests
+    requests = None
+    HTTPAdapter = None
 
 try:
     from version import PLUGIN_VERSION
@@ -32,6 +65,30 @@ OPENFDA_HEADERS = {
     'Accept': 'application/json',
 }
 
+# Consent cookies accessdata.fda.gov expects before serving PDFs
+FDA_COOKIES = {'fda_gdpr': 'true', 'fda_consent': 'true'}
+
+# Connection pool sizing for pooled sessions (per thread)
+POOL_CONNECTIONS = 10   # distinct hosts kept warm
+POOL_MAXSIZE = 10       # connections kept per host
+ADAPTER_MAX_RETRIES = 3
+MAX_REDIRECTS = 5
+
+# Statuses http_get() follows through the Location header, like urlopen
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+# Errors that mean a reused keep-alive connection was closed by the server
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.ResponseNotReady,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+HTTPResult = namedtuple("HTTPResult", ["status", "reason", "headers", "body", "wire_bytes"])
+
 
 def create_session(api_mode=False):
     """Create a requests.Session with appropriate FDA headers.
@@ -40,9 +97,198 @@ def create_session(api_mode=False):
         api_mode: If True, use openFDA API headers instead of browser headers.
 
     Returns:
-        requests.Session configured with appropriate headers.
+        requests.Session configured with appropriate headers and a pooled
+        adapter for http:// and https://.
     """
+    if requests is None:
+        raise ImportError("requests is required for create_session(); pip install requests")
     session = requests.Session()
     headers = OPENFDA_HEADERS if api_mode else FDA_HEADERS
     session.headers.update(headers)
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=ADAPTER_MAX_RETRIES,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.max_redirects = MAX_REDIRECTS
+    if not api_mode:
+        session.cookies.update(FDA_COOKIES)
     return session
+
+
+_local = threading.local()
+
+
+def get_session(api_mode=False):
+    """Return this thread's shared keep-alive session.
+
+    requests.Session is not guaranteed thread-safe, so each thread gets its
+    own session (one for browser-style traffic, one for API traffic).
+    Within a thread, every call reuses the same pooled connections.
+    """
+    sessions = getattr(_local, "sessions", None)
+    if sessions is None:
+        sessions = _local.sessions = {}
+    key = "api" if api_mode else "web"
+    session = sessions.get(key)
+    if session is None:
+        session = sessions[key] = create_session(api_mode)
+    return session
+
+
+def _proxy_for(scheme, host):
+    """Proxy URL (parsed) for a request to host, per the *_PROXY/NO_PROXY settings."""
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+    if "://" not in proxy:
+        proxy = "http://" + proxy
+    return urllib.parse.urlsplit(proxy)
+
+
+def _proxy_headers(proxy):
+    """Proxy-Authorization header for credentials in the proxy URL."""
+    if not proxy.username:
+        return {}
+    userpass = f"{urllib.parse.unquote(proxy.username)}:{urllib.parse.unquote(proxy.password or '')}"
+    return {"Proxy-Authorization": "Basic " + base64.b64encode(userpass.encode()).decode()}
+
+
+class KeepAlivePool:
+    """Per-thread, per-host pool of persistent http.client connections."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.requests_sent = 0
+
+    def _connections(self):
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+        return conns
+
+    def _get_connection(self, scheme, netloc, timeout):
+        conns = self._connections()
+        conn = conns.get((scheme, netloc))
+        if conn is None:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            proxy = _proxy_for(scheme, urllib.parse.urlsplit(f"//{netloc}").hostname or netloc)
+            if proxy is None:
+                conn = cls(netloc, timeout=timeout)
+            elif scheme == "https":
+                # Tunnel through the proxy (CONNECT), TLS end to end
+                conn = cls(proxy.hostname, proxy.port or 8080, timeout=timeout)
+                conn.set_tunnel(netloc, headers=_proxy_headers(proxy))
+            else:
+                # Plain HTTP goes to the proxy with absolute request URLs
+                conn = http.client.HTTPConnection(proxy.hostname, proxy.port or 8080,
+                                                  timeout=timeout)
+                conn.proxy_headers = _proxy_headers(proxy)
+            conns[(scheme, netloc)] = conn
+            with self._lock:
+                self.connections_opened += 1
+            return conn, False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _discard(self, scheme, netloc):
+        conn = self._connections().pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def request(self, method, url, headers=None, timeout=15, max_redirects=MAX_REDIRECTS):
+        """Send a request over a pooled connection and read the full body.
+
+        A request that fails because the server silently closed a reused
+        connection is retried once on a fresh connection; every other
+        error propagates to the caller. Redirects (REDIRECT_STATUSES) to a
+        URL with the same scheme are followed up to max_redirects times
+        (303 as a GET); otherwise the 3xx response itself is returned.
+        wire_bytes counts every response read.
+        """
+        wire_bytes = 0
+        for _ in range(max_redirects + 1):
+            result = self._send(method, url, headers, timeout)
+            wire_bytes += result.wire_bytes
+            location = result.headers.get("Location")
+            if result.status not in REDIRECT_STATUSES or not location:
+                break
+            target = urllib.parse.urljoin(url, location)
+            if urllib.parse.urlsplit(target).scheme != urllib.parse.urlsplit(url).scheme:
+                break
+            url = target
+            if result.status == 303:
+                method = "GET"
+        return result._replace(wire_bytes=wire_bytes)
+
+    def _send(self, method, url, headers, timeout):
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        headers = dict(headers or {})
+        headers.setdefault("Accept-Encoding", "gzip")
+        headers.setdefault("Connection", "keep-alive")
+
+        while True:
+            conn, reused = self._get_connection(parts.scheme, parts.netloc, timeout)
+            proxy_headers = getattr(conn, "proxy_headers", None)
+            try:
+                if proxy_headers is None:
+                    conn.request(method, path, headers=headers)
+                else:
+                    conn.request(method, urllib.parse.urlunsplit(parts._replace(fragment="")),
+                                 headers=dict(headers, **proxy_headers))
+                resp = conn.getresponse()
+                raw = resp.read()
+            except _STALE_CONNECTION_ERRORS:
+                self._discard(parts.scheme, parts.netloc)
+                if reused:
+                    continue
+                raise
+            except Exception:
+                self._discard(parts.scheme, parts.netloc)
+                raise
+            with self._lock:
+                self.requests_sent += 1
+            if resp.will_close:
+                self._discard(parts.scheme, parts.netloc)
+            body = raw
+            if (resp.getheader("Content-Encoding") or "").lower() == "gzip":
+                body = gzip.decompress(raw)
+            return HTTPResult(resp.status, resp.reason, resp.headers, body, len(raw))
+
+    def close(self):
+        """Close this thread's pooled connections."""
+        for key in list(self._connections()):
+            self._discard(*key)
+
+    def stats(self):
+        return {
+            "connections_opened": self.connections_opened,
+            "requests_sent": self.requests_sent,
+        }
+
+
+_pool = KeepAlivePool()
+
+
+def http_get(url, headers=None, timeout=15):
+    """GET a URL over the shared keep-alive pool.
+
+    Returns:
+        HTTPResult(status, reason, headers, body, wire_bytes); body is
+        already gunzipped. Non-2xx statuses are returned, not raised.
+    """
+    return _pool.request("GET", url, headers=headers, timeout=timeout)
+
+
+def pool_stats():
+    """Connection reuse counters for the shared keep-alive pool."""
+    return _pool.stats()
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Transactional storage for project data manifests.
+
+fda_data_store.py records every query it answers in a per-project manifest.
+ManifestStore keeps that manifest in ``data_manifest.db`` (SQLite, WAL
+mode) with one row per query key, so each query is a single-row upsert:
+concurrent fda_data_store.py processes for the same project never
+overwrite each other's entries, and a lookup reads one row instead of
+parsing the whole manifest.
+
+``data_manifest.json`` is kept as an export of the database for people and
+commands that read it (``--show-manifest``, ``/fda:cache``). Exports are
+written atomically under the database write lock. If the JSON file is
+changed by something else (an older plugin version, a hand edit), its
+entries are merged back in on the next open; an entry only replaces a
+database row that is missing or has an older ``fetched_at``.
+
+Summaries can be shared across projects: a SummaryStore (``.summaries.db``
+in the projects directory) keeps each summary once, addressed by the
+SHA-256 of its content, plus the latest fetch of every query key. Project
+entries then carry a ``summary_ref`` instead of their own copy, and a
+fetch made for one project is visible to all of them.
+
+Usage:
+    from fda_manifest_store import ManifestStore, SummaryStore
+
+    store = ManifestStore(project_dir, summaries=SummaryStore(summary_db))
+    entry = store.get("classification:OVE")
+    store.upsert("classification:OVE", {"fetched_at": ..., "summary": {...}})
+    store.export_json()
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+MANIFEST_DB = "data_manifest.db"
+MANIFEST_JSON = "data_manifest.json"
+
+# Shared summary store, kept in the projects directory
+SUMMARY_DB = ".summaries.db"
+
+# Epoch timestamp used to mark entries stale (see mark_all_stale)
+STALE_FETCHED_AT = "1970-01-01T00:00:00+00:00"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS queries (
+    key        TEXT PRIMARY KEY,
+    fetched_at TEXT,
+    entry      TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS product_codes (
+    position INTEGER PRIMARY KEY AUTOINCREMENT,
+    code     TEXT NOT NULL UNIQUE
+);
+"""
+
+
+_SUMMARY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    hash    TEXT PRIMARY KEY,
+    summary TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS latest (
+    key            TEXT PRIMARY KEY,
+    hash           TEXT NOT NULL,
+    fetched_at     TEXT,
+    ttl_hours      REAL,
+    total_matches  INTEGER,
+    api_cache_key  TEXT
+);
+"""
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _parse_time(value):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class ManifestStore:
+    """Per-project manifest with atomic per-key upserts."""
+
+    def __init__(self, project_dir, summaries=None):
+        """Open (creating if needed) the manifest database for project_dir.
+
+        Args:
+            project_dir: Project directory; created if missing.
+            summaries: Optional SummaryStore. Entries with a summary_ref are
+                stored without their summary and resolved through it.
+        """
+        self.summaries = summaries
+        self.project_dir = Path(project_dir)
+        self.project_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.project_dir / MANIFEST_DB
+        self.json_path = self.project_dir / MANIFEST_JSON
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        with self._write():
+            self._set_meta_default("project", self.project_dir.name)
+            self._set_meta_default("created_at", _now())
+            self._set_meta_default("last_updated", _now())
+            self._sync_from_json()
+
+    # --- Transactions ---
+
+    def _write(self):
+        return _WriteTransaction(self)
+
+    def _meta(self, name, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, name, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                           (name, value))
+
+    def _set_meta_default(self, name, value):
+        self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES (?, ?)",
+                           (name, value))
+
+    def _json_stamp(self):
+        try:
+            st = self.json_path.stat()
+        except OSError:
+            return None
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    def _sync_from_json(self):
+        # Caller holds the write transaction
+        stamp = self._json_stamp()
+        if stamp is None or stamp == self._meta("json_stamp"):
+            return
+        try:
+            with open(self.json_path) as f:
+                manifest = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            manifest = None
+        if isinstance(manifest, dict):
+            for name in ("project", "created_at"):
+                if isinstance(manifest.get(name), str):
+                    self._set_meta(name, manifest[name])
+            for code in manifest.get("product_codes") or []:
+                self._conn.execute("INSERT OR IGNORE INTO product_codes (code) VALUES (?)",
+                                   (code,))
+            for key, entry in (manifest.get("queries") or {}).items():
+                if isinstance(entry, dict):
+                    self._merge(key, entry)
+        self._set_meta("json_stamp", stamp)
+
+    def _merge(self, key, entry):
+        # Keep whichever copy of an entry was fetched last
+        row = self._conn.execute("SELECT fetched_at FROM queries WHERE key = ?",
+                                 (key,)).fetchone()
+        if row is not None:
+            current, incoming = _parse_time(row[0]), _parse_time(entry.get("fetched_at"))
+            if current is not None and (incoming is None or incoming <= current):
+                return
+        self._put(key, entry)
+
+    def _put(self, key, entry):
+        if self.summaries is not None and entry.get("summary_ref"):
+            entry = {k: v for k, v in entry.items() if k != "summary"}
+        self._conn.execute(
+            "INSERT OR REPLACE INTO queries (key, fetched_at, entry) VALUES (?, ?, ?)",
+            (key, entry.get("fetched_at"), json.dumps(entry)),
+        )
+
+    def _load(self, raw):
+        # None when the entry's summary is no longer in the SummaryStore
+        # (deleted or replaced .summaries.db): the query must be re-fetched
+        entry = json.loads(raw)
+        if "summary" not in entry and entry.get("summary_ref"):
+            summary = self.summaries.summary(entry["summary_ref"]) if self.summaries else None
+            if summary is None:
+                return None
+            entry["summary"] = summary
+        return entry
+
+    def _load_all(self):
+        # Caller holds self._lock
+        queries = {}
+        for key, raw in self._conn.execute("SELECT key, entry FROM queries ORDER BY rowid"):
+            entry = self._load(raw)
+            if entry is not None:
+                queries[key] = entry
+        return queries
+
+    def sync(self):
+        """Merge data_manifest.json if it changed since the last import or export."""
+        with self._lock:
+            imported = self._meta("json_stamp")
+        if self._json_stamp() in (None, imported):
+            return
+        with self._write():
+            self._sync_from_json()
+
+    # --- Reads ---
+
+    def get(self, key):
+        """Return the entry for a query key, or None (also if its summary is gone)."""
+        with self._lock:
+            row = self._conn.execute("SELECT entry FROM queries WHERE key = ?",
+                                     (key,)).fetchone()
+        return self._load(row[0]) if row else None
+
+    def product_codes(self):
+        with self._lock:
+            return [r[0] for r in self._conn.execute(
+                "SELECT code FROM product_codes ORDER BY position")]
+
+    def to_dict(self):
+        """Return the manifest in the data_manifest.json layout."""
+        with self._lock:
+            project = self._meta("project", self.project_dir.name)
+            created_at = self._meta("created_at")
+            last_updated = self._meta("last_updated")
+            codes = [r[0] for r in self._conn.execute(
+                "SELECT code FROM product_codes ORDER BY position")]
+            queries = self._load_all()
+        return {
+            "project": project,
+            "created_at": created_at,
+            "last_updated": last_updated,
+            "product_codes": codes,
+            "queries": queries,
+        }
+
+    # --- Writes ---
+
+    def upsert(self, key, entry, product_code=None):
+        """Insert or replace one query entry atomically.
+
+        Args:
+            key: Query key (see fda_data_store.make_query_key).
+            entry: Manifest entry dict.
+            product_code: Optional product code to add to the project's list.
+        """
+        with self._write():
+            self._put(key, entry)
+            if product_code:
+                self._conn.execute("INSERT OR IGNORE INTO product_codes (code) VALUES (?)",
+                                   (product_code,))
+            self._set_meta("last_updated", _now())
+
+    def update(self, manifest):
+        """Merge a data_manifest.json-style dict: upsert its entries and codes.
+
+        Entries missing from manifest are kept, so a caller holding an old
+        copy cannot delete entries another process added meanwhile.
+        """
+        with self._write():
+            for name in ("project", "created_at"):
+                if isinstance(manifest.get(name), str):
+                    self._set_meta(name, manifest[name])
+            for code in manifest.get("product_codes") or []:
+                self._conn.execute("INSERT OR IGNORE INTO product_codes (code) VALUES (?)",
+                                   (code,))
+            for key, entry in (manifest.get("queries") or {}).items():
+                self._put(key, entry)
+            self._set_meta("last_updated", _now())
+
+    def mark_all_stale(self):
+        """Set every entry's fetched_at to the epoch. Returns the count.
+
+        The shared summaries for these keys are marked stale too, so the
+        next lookup re-fetches instead of adopting the shared copy.
+        """
+        with self._write():
+            rows = self._conn.execute("SELECT key, entry FROM queries").fetchall()
+            for key, raw in rows:
+                entry = json.loads(raw)
+                entry["fetched_at"] = STALE_FETCHED_AT
+                self._put(key, entry)
+            self._set_meta("last_updated", _now())
+        if self.summaries is not None:
+            self.summaries.mark_stale([key for key, _ in rows])
+        return len(rows)
+
+    def export_json(self):
+        """Write data_manifest.json from the database (atomic replace)."""
+        with self._write():
+            manifest = {
+                "project": self._meta("project", self.project_dir.name),
+                "created_at": self._meta("created_at"),
+                "last_updated": self._meta("last_updated"),
+                "product_codes": [r[0] for r in self._conn.execute(
+                    "SELECT code FROM product_codes ORDER BY position")],
+                "queries": self._load_all(),
+            }
+            tmp = self.json_path.with_name(f".{MANIFEST_JSON}.{os.getpid()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp, self.json_path)
+            self._set_meta("json_stamp", self._json_stamp())
+        return self.json_path
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SummaryStore:
+    """Content-addressed summaries shared by every project manifest."""
+
+    def __init__(self, path):
+        """Open (creating if needed) the shared summary database.
+
+        Args:
+            path: Database path, normally <projects_dir>/.summaries.db.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SUMMARY_SCHEMA)
+
+    @staticmethod
+    def content_hash(summary):
+        """SHA-256 of a summary's canonical JSON."""
+        canonical = json.dumps(summary, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def put(self, key, entry):
+        """Record a fetched manifest entry as the latest for key.
+
+        Args:
+            key: Query key.
+            entry: Manifest entry with fetched_at, ttl_hours, total_matches,
+                summary and api_cache_key.
+
+        Returns:
+            The summary's content hash (its summary_ref).
+        """
+        summary = entry.get("summary") or {}
+        ref = self.content_hash(summary)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("INSERT OR IGNORE INTO summaries (hash, summary) VALUES (?, ?)",
+                                   (ref, json.dumps(summary)))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO latest "
+                    "(key, hash, fetched_at, ttl_hours, total_matches, api_cache_key) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, ref, entry.get("fetched_at"), entry.get("ttl_hours"),
+                     entry.get("total_matches"), entry.get("api_cache_key")),
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return ref
+
+    def latest(self, key):
+        """The latest fetch of key as a manifest entry (with summary), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT l.hash, l.fetched_at, l.ttl_hours, l.total_matches, l.api_cache_key, "
+                "s.summary FROM latest l JOIN summaries s ON s.hash = l.hash WHERE l.key = ?",
+                (key,)).fetchone()
+        if row is None:
+            return None
+        ref, fetched_at, ttl_hours, total, cache_key, summary = row
+        return {
+            "fetched_at": fetched_at,
+            "ttl_hours": ttl_hours,
+            "source": "openFDA",
+            "total_matches": total,
+            "summary": json.loads(summary),
+            "summary_ref": ref,
+            "api_cache_key": cache_key,
+        }
+
+    def summary(self, ref):
+        """The summary stored under a content hash, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE hash = ?",
+                                     (ref,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def mark_stale(self, keys):
+        """Set fetched_at to the epoch for the latest fetch of each key."""
+        with self._lock:
+            self._conn.executemany("UPDATE latest SET fetched_at = ? WHERE key = ?",
+                                   [(STALE_FETCHED_AT, key) for key in keys])
+
+    def stats(self):
+        """Counts of query keys and distinct stored summaries."""
+        with self._lock:
+            keys = self._conn.execute("SELECT COUNT(*) FROM latest").fetchone()[0]
+            summaries = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        return {"keys": keys, "summaries": summaries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _WriteTransaction:
+    """BEGIN IMMEDIATE ... COMMIT under the store's thread lock."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __enter__(self):
+        self.store._lock.acquire()
+        try:
+            self.store._conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.store._lock.release()
+            raise
+        return self.store
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.store._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.store._lock.release()
+        return False
+
+
+def remove_manifest(project_dir):
+    """Delete a project's manifest database and JSON export.
+
+    Returns:
+        True if anything was removed.
+    """
+    removed = False
+    for name in (MANIFEST_JSON, MANIFEST_DB, MANIFEST_DB + "-wal", MANIFEST_DB + "-shm"):
+        path = Path(project_dir) / name
+        if path.exists():
+            path.unlink()
+            removed = True
+    return removed
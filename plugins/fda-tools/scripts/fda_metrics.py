@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Request instrumentation for openFDA clients.
+
+ClientMetrics records, per openFDA endpoint, how calls were answered
+(memory/disk cache, stale entry, local bulk store, network), every network
+attempt's latency and status, retries and backoff time, 429 responses,
+time spent waiting on the rate limiter, and bytes transferred. Latencies go
+into fixed-bucket histograms so memory stays constant however long the
+process runs; p50/p95/p99 are interpolated from the buckets the same way
+Prometheus' histogram_quantile() does.
+
+Every FDAClient in a process reports into one shared registry
+(process_metrics()), so a command's totals cover all the clients it
+creates. The registry can be dumped at process exit:
+
+    FDA_METRICS_FILE=~/fda-510k-data/metrics.jsonl   append one JSON line per run
+    FDA_METRICS_FILE=/var/lib/node_exporter/fda.prom Prometheus text format
+
+or with the ``api_metrics_file:`` setting. The format follows the file
+extension (``.prom``/``.txt`` -> Prometheus text, anything else -> JSON
+lines) unless FDA_METRICS_FORMAT is set to ``jsonl`` or ``prometheus``.
+
+Usage:
+    from fda_metrics import process_metrics
+
+    snapshot = process_metrics().snapshot()
+    print(snapshot["totals"]["http_requests"], snapshot["endpoints"]["510k"]["latency"]["p95"])
+"""
+
+import atexit
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+# Histogram bucket upper bounds in seconds (the last bucket is +Inf)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+FORMAT_JSONL = "jsonl"
+FORMAT_PROMETHEUS = "prometheus"
+
+# Per-endpoint counters, in report order
+COUNTERS = (
+    "calls",                    # _request() calls, however answered
+    "cache_hits",               # fresh entry from the memory or disk cache
+    "cache_misses",             # no usable entry; went to the network
+    "stale_served",             # expired entry served while refreshing
+    "local_answers",            # answered from the local bulk datasets
+    "single_flight_waits",      # waited on another process fetching the same key
+    "http_requests",            # network attempts, including retries
+    "retries",                  # attempts after the first
+    "rate_limited",             # HTTP 429 responses
+    "errors",                   # calls that ended degraded
+    "bytes_wire",               # response bytes as received (gzip)
+    "bytes_body",               # response bytes after decoding
+)
+TIMERS = ("backoff_seconds", "rate_limit_wait_seconds")
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with interpolated percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(self.bounds) and seconds > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """Estimate the q-th quantile (0 < q < 1) in seconds, or None if empty."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        def rounded(value):
+            return None if value is None else round(value, 4)
+
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": rounded(self.sum / self.count if self.count else None),
+            "p50": rounded(self.percentile(0.50)),
+            "p95": rounded(self.percentile(0.95)),
+            "p99": rounded(self.percentile(0.99)),
+            "max": round(self.max, 4),
+        }
+
+
+class _EndpointMetrics:
+    def __init__(self):
+        for name in COUNTERS:
+            setattr(self, name, 0)
+        for name in TIMERS:
+            setattr(self, name, 0.0)
+        self.status = {}
+        self.latency = LatencyHistogram()
+
+    def as_dict(self):
+        looked_up = self.cache_hits + self.stale_served + self.cache_misses
+        out = {name: getattr(self, name) for name in COUNTERS}
+        out.update({name: round(getattr(self, name), 3) for name in TIMERS})
+        out["cache_hit_ratio"] = (round((self.cache_hits + self.stale_served) / looked_up, 4)
+                                  if looked_up else None)
+        out["status"] = dict(sorted(self.status.items()))
+        out["latency"] = self.latency.summary()
+        return out
+
+
+class ClientMetrics:
+    """Thread-safe per-endpoint request, cache and transport metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.started = time.time()
+
+    def _get(self, endpoint):
+        # Caller holds self._lock
+        ep = self._endpoints.get(endpoint)
+        if ep is None:
+            ep = self._endpoints[endpoint] = _EndpointMetrics()
+        return ep
+
+    def increment(self, endpoint, counter, amount=1):
+        """Add amount to one of COUNTERS or TIMERS for endpoint."""
+        with self._lock:
+            ep = self._get(endpoint or "unknown")
+            setattr(ep, counter, getattr(ep, counter) + amount)
+
+    def record_attempt(self, endpoint, seconds, status=None, wire_bytes=0, body_bytes=0):
+        """Record one network attempt.
+
+        Args:
+            endpoint: openFDA endpoint (e.g. '510k').
+            seconds: Wall time from send to fully-read body.
+            status: HTTP status, or None when the attempt raised.
+            wire_bytes: Bytes received on the socket.
+            body_bytes: Bytes after content decoding.
+        """
+        with self._lock:
+            ep = self._get(endpoint or "unknown")
+            ep.http_requests += 1
+            ep.latency.observe(seconds)
+            label = str(status) if status is not None else "exception"
+            ep.status[label] = ep.status.get(label, 0) + 1
+            if status == 429:
+                ep.rate_limited += 1
+            ep.bytes_wire += wire_bytes
+            ep.bytes_body += body_bytes
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+            self.started = time.time()
+
+    def snapshot(self):
+        """Return {"endpoints": {endpoint: {...}}, "totals": {...}}."""
+        with self._lock:
+            endpoints = {name: ep.as_dict() for name, ep in sorted(self._endpoints.items())}
+            totals = _EndpointMetrics()
+            for ep in self._endpoints.values():
+                for name in COUNTERS + TIMERS:
+                    setattr(totals, name, getattr(totals, name) + getattr(ep, name))
+                for label, n in ep.status.items():
+                    totals.status[label] = totals.status.get(label, 0) + n
+                for i, n in enumerate(ep.latency.counts):
+                    totals.latency.counts[i] += n
+                totals.latency.count += ep.latency.count
+                totals.latency.sum += ep.latency.sum
+                totals.latency.max = max(totals.latency.max, ep.latency.max)
+        return {
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "endpoints": endpoints,
+            "totals": totals.as_dict(),
+        }
+
+    def to_prometheus(self, labels=None):
+        """Render the metrics in the Prometheus text exposition format.
+
+        Args:
+            labels: Extra labels added to every sample, e.g. {"command": "batchfetch"}.
+        """
+        extra = "".join(f',{k}="{_escape(v)}"' for k, v in sorted((labels or {}).items()))
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP fda_openfda_{name} {help_text}")
+            lines.append(f"# TYPE fda_openfda_{name} {kind}")
+            lines.extend(samples)
+
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            for counter in COUNTERS + TIMERS:
+                family(f"{counter}_total", "counter", f"openFDA client {counter.replace('_', ' ')}",
+                       [f'fda_openfda_{counter}_total{{endpoint="{_escape(name)}"{extra}}} '
+                        f"{getattr(ep, counter)}" for name, ep in endpoints])
+            family("responses_total", "counter", "openFDA HTTP responses by status",
+                   [f'fda_openfda_responses_total{{endpoint="{_escape(name)}",'
+                    f'status="{status}"{extra}}} {n}'
+                    for name, ep in endpoints for status, n in sorted(ep.status.items())])
+            samples = []
+            for name, ep in endpoints:
+                hist = ep.latency
+                cumulative = 0
+                for bound, n in zip(list(hist.bounds) + ["+Inf"], hist.counts):
+                    cumulative += n
+                    samples.append(f'fda_openfda_request_seconds_bucket{{endpoint="{_escape(name)}",'
+                                   f'le="{bound}"{extra}}} {cumulative}')
+                samples.append(f'fda_openfda_request_seconds_sum{{endpoint="{_escape(name)}"{extra}}} '
+                               f"{hist.sum:.6f}")
+                samples.append(f'fda_openfda_request_seconds_count{{endpoint="{_escape(name)}"{extra}}} '
+                               f"{hist.count}")
+            family("request_seconds", "histogram", "openFDA network attempt latency", samples)
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_process_metrics = ClientMetrics()
+_dump_lock = threading.Lock()
+_dump_registered = False
+
+
+def process_metrics():
+    """Return the registry shared by every FDAClient in this process."""
+    return _process_metrics
+
+
+def command_name():
+    """Name of the running script, used to attribute quota use to commands."""
+    return os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+
+
+def configured_dump():
+    """Return (path, format) from FDA_METRICS_FILE / api_metrics_file, or (None, None)."""
+    path = os.environ.get("FDA_METRICS_FILE")
+    if not path:
+        settings_path = os.path.expanduser("~/.claude/fda-tools.local.md")
+        if os.path.exists(settings_path):
+            with open(settings_path) as f:
+                m = re.search(r"api_metrics_file:\s*(\S+)", f.read())
+            if m and m.group(1).lower() not in ("null", "none", "false"):
+                path = m.group(1)
+    if not path:
+        return None, None
+    path = os.path.expanduser(path)
+    fmt = (os.environ.get("FDA_METRICS_FORMAT") or "").lower()
+    if fmt not in (FORMAT_JSONL, FORMAT_PROMETHEUS):
+        fmt = FORMAT_PROMETHEUS if path.endswith((".prom", ".txt")) else FORMAT_JSONL
+    return path, fmt
+
+
+def dump_metrics(path, fmt=FORMAT_JSONL, metrics=None):
+    """Write metrics to path.
+
+    JSON lines are appended (one line per run, tagged with the command,
+    host, pid and timestamp). Prometheus text replaces the file atomically
+    so a node_exporter textfile collector never reads a partial file.
+    """
+    metrics = metrics or _process_metrics
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if fmt == FORMAT_PROMETHEUS:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(metrics.to_prometheus({"command": command_name()}))
+        os.replace(tmp, path)
+        return
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "command": command_name(),
+        "argv": sys.argv[1:],
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+    }
+    record.update(metrics.snapshot())
+    with open(path, "a") as f:
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def _dump_at_exit(path, fmt):
+    snapshot = _process_metrics.snapshot()
+    if not snapshot["totals"]["calls"]:
+        return
+    try:
+        dump_metrics(path, fmt)
+    except OSError as e:
+        print(f"WARNING: could not write openFDA metrics to {path}: {e}", file=sys.stderr)
+
+
+def register_exit_dump():
+    """Dump process metrics at exit if FDA_METRICS_FILE or api_metrics_file is set.
+
+    Safe to call repeatedly; the handler is registered once per process.
+
+    Returns:
+        The configured (path, format), or (None, None) when dumping is off.
+    """
+    global _dump_registered
+    path, fmt = configured_dump()
+    if path is None:
+        return None, None
+    with _dump_lock:
+        if not _dump_registered:
+            atexit.register(_dump_at_exit, path, fmt)
+            _dump_registered = True
+    return path, fmt
+
+
+def format_metrics(snapshot):
+    """Render a snapshot() as an aligned text table, one row per endpoint."""
+    header = (f"{'endpoint':16s} {'calls':>6s} {'hit%':>6s} {'http':>6s} {'retry':>5s} "
+              f"{'429':>4s} {'err':>4s} {'p50 ms':>7s} {'p95 ms':>7s} {'p99 ms':>7s} "
+              f"{'MB':>7s} {'backoff s':>9s}")
+    lines = [header, "-" * len(header)]
+    rows = list(snapshot["endpoints"].items()) + [("TOTAL", snapshot["totals"])]
+    for name, ep in rows:
+        lat = ep["latency"]
+
+        def ms(value):
+            return "-" if value is None else f"{value * 1000:.0f}"
+
+        ratio = "-" if ep["cache_hit_ratio"] is None else f"{ep['cache_hit_ratio'] * 100:.0f}"
+        lines.append(
+            f"{name:16s} {ep['calls']:6d} {ratio:>6s} {ep['http_requests']:6d} {ep['retries']:5d} "
+            f"{ep['rate_limited']:4d} {ep['errors']:4d} {ms(lat['p50']):>7s} {ms(lat['p95']):>7s} "
+            f"{ms(lat['p99']):>7s} {ep['bytes_wire'] / (1024 * 1024):7.2f} "
+            f"{ep['backoff_seconds']:9.1f}"
+        )
+    lines.append(f"Rate limiter wait: {snapshot['totals']['rate_limit_wait_seconds']:.1f}s")
+    return "\n".join(lines)
+
+
+def summarize_metrics_log(path):
+    """Aggregate a JSON-lines metrics dump by command.
+
+    Returns:
+        Dict mapping command name to totals across its runs: runs, calls,
+        http_requests, rate_limited, errors, bytes_wire and request_seconds.
+    """
+    by_command = {}
+    with open(os.path.expanduser(path)) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            totals = record.get("totals") or {}
+            agg = by_command.setdefault(record.get("command", "unknown"), {
+                "runs": 0, "calls": 0, "http_requests": 0, "rate_limited": 0,
+                "errors": 0, "bytes_wire": 0, "request_seconds": 0.0,
+            })
+            agg["runs"] += 1
+            for name in ("calls", "http_requests", "rate_limited", "errors", "bytes_wire"):
+                agg[name] += totals.get(name, 0)
+            agg["request_seconds"] += (totals.get("latency") or {}).get("sum", 0.0)
+    return dict(sorted(by_command.items(), key=lambda item: -item[1]["http_requests"]))
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Token-bucket rate limiting for openFDA requests.
+
+openFDA enforces per-minute and per-day request quotas
+(https://open.fda.gov/apis/authentication/):
+
+    without API key   240 requests/minute, 1,000 requests/day (per IP)
+    with API key      240 requests/minute, 120,000 requests/day (per key)
+
+RateLimiter combines a per-minute bucket (which smooths bursts so
+concurrent workers never trip HTTP 429) with a per-day bucket. One limiter
+is shared by every FDAClient and AsyncFDAClient in the process that uses
+the same quota, so parallel callers draw from a single budget.
+
+Usage:
+    from fda_rate_limit import openfda_rate_limiter
+
+    limiter = openfda_rate_limiter(api_key)
+    limiter.acquire()          # blocks until a request may be sent
+"""
+
+import os
+import re
+import threading
+import time
+
+
+# openFDA quotas: (requests per minute, requests per day)
+OPENFDA_QUOTAS = {
+    "with_key": (240, 120000),
+    "without_key": (240, 1000),
+}
+
+# Fraction of the published per-minute quota we actually use, leaving
+# headroom for other tools sharing the same key or IP.
+QUOTA_HEADROOM = 0.9
+
+# Max requests that may be sent back-to-back before the per-minute rate applies
+DEFAULT_BURST = 10
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    Holds up to ``capacity`` tokens and refills at ``rate`` tokens per
+    second. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self, tokens=1.0):
+        """Take tokens if available now. Returns True on success."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens=1.0):
+        """Seconds until ``tokens`` would be available (0 if available now)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            deficit = tokens - self._tokens
+            return max(0.0, deficit / self.rate)
+
+    def acquire(self, tokens=1.0, timeout=None):
+        """Block until tokens are available.
+
+        Args:
+            tokens: Number of tokens to take.
+            timeout: Give up after this many seconds (None waits forever).
+
+        Returns:
+            True if acquired, False if the timeout expired first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+            self.waited_seconds += wait
+
+
+class RateLimiter:
+    """Per-minute and per-day token buckets applied together."""
+
+    def __init__(self, per_minute, per_day=None, burst=DEFAULT_BURST):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.minute = TokenBucket(per_minute / 60.0, min(burst, per_minute))
+        self.day = TokenBucket(per_day / 86400.0, per_day) if per_day else None
+
+    def acquire(self, timeout=None):
+        """Block until both buckets allow a request.
+
+        The daily bucket is checked without waiting: once the daily quota
+        is spent, waiting hours inside a request is never useful, so
+        acquire() returns False and the caller degrades instead.
+        """
+        if self.day is not None and not self.day.try_acquire():
+            return False
+        return self.minute.acquire(timeout=timeout)
+
+    @property
+    def waited_seconds(self):
+        return self.minute.waited_seconds
+
+    def __repr__(self):
+        return f"RateLimiter(per_minute={self.per_minute}, per_day={self.per_day})"
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def _configured_per_minute():
+    """Read an optional openfda_rate_limit override (requests/minute)."""
+    env = os.environ.get("OPENFDA_RATE_LIMIT")
+    if env:
+        try:
+            return int(env)
+        except ValueError:
+            pass
+    settings_path = os.path.expanduser("~/.claude/fda-tools.local.md")
+    if os.path.exists(settings_path):
+        with open(settings_path) as f:
+            m = re.search(r"openfda_rate_limit:\s*(\d+)", f.read())
+        if m:
+            return int(m.group(1))
+    return None
+
+
+def openfda_rate_limiter(api_key=None):
+    """Return the process-wide limiter for the openFDA quota in use.
+
+    Clients with and without an API key get separate limiters because
+    they are metered against different quotas.
+    """
+    kind = "with_key" if api_key else "without_key"
+    with _shared_lock:
+        limiter = _shared.get(kind)
+        if limiter is None:
+            per_minute, per_day = OPENFDA_QUOTAS[kind]
+            per_minute = _configured_per_minute() or int(per_minute * QUOTA_HEADROOM)
+            limiter = RateLimiter(per_minute, per_day)
+            _shared[kind] = limiter
+        return limiter
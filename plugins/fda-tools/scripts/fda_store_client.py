@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Thin client for the data-store daemon (fda_store_daemon.py).
+
+``python3 fda_data_store.py`` imports this module before anything else and
+forwards the call when a daemon is listening, so a forwarded call never
+imports the API client, the manifest store or argparse. Only standard
+library modules with no heavy dependencies are imported here.
+
+Calls this module cannot parse (abbreviated or unknown options, --help)
+or that the daemon does not serve return False and run in-process, where
+argparse reports any usage error.
+
+Usage:
+    from fda_store_client import forward
+    if forward(sys.argv[1:]):
+        sys.exit(0)
+"""
+
+import json
+import os
+import re
+import socket
+import sys
+
+DEFAULT_SOCKET = os.path.expanduser("~/fda-510k-data/data-store.sock")
+
+# Seconds to wait for a connection, and for a reply (queries may retry the API)
+CONNECT_TIMEOUT = 1.0
+REPLY_TIMEOUT = 300.0
+
+# Arguments fda_store_daemon.py passes through to the handlers
+DAEMON_ARGS = ("query", "product_code", "k_number", "k_numbers", "count", "refresh", "workers")
+
+# fda_data_store.py options understood here: option -> (dest, takes a value)
+_OPTIONS = {
+    "--project": ("project", True),
+    "--query": ("query", True),
+    "--product-code": ("product_code", True),
+    "--k-number": ("k_number", True),
+    "--k-numbers": ("k_numbers", True),
+    "--count": ("count", True),
+    "--refresh": ("refresh", False),
+    "--show-manifest": ("show_manifest", False),
+    "--clear": ("clear", False),
+    "--refresh-all": ("refresh_all", False),
+    "--eager": ("eager", False),
+    "--prefetch": ("prefetch", False),
+    "--product-codes": ("product_codes", True),
+    "--batch": ("batch", True),
+    "--workers": ("workers", True),
+    "--no-daemon": ("no_daemon", False),
+    "--socket": ("socket", True),
+}
+
+
+def socket_path(path=None):
+    """Resolve the daemon socket path: argument > env var > setting > default."""
+    if not path:
+        path = os.environ.get("FDA_DATA_STORE_SOCKET", "").strip()
+    if not path:
+        settings_path = os.path.expanduser("~/.claude/fda-tools.local.md")
+        if os.path.exists(settings_path):
+            with open(settings_path) as f:
+                m = re.search(r"data_store_socket:\s*(\S+)", f.read())
+            if m:
+                path = m.group(1)
+    return os.path.expanduser(path or DEFAULT_SOCKET)
+
+
+def request(op, path=None, timeout=REPLY_TIMEOUT, **fields):
+    """Send one request to the daemon.
+
+    Args:
+        op: Operation name (see fda_store_daemon.OPS, plus ping and shutdown).
+        path: Socket path (default: socket_path()).
+        timeout: Seconds to wait for the reply.
+        **fields: Other request fields (project, args).
+
+    Returns:
+        The reply dict, or None if no daemon is listening (including on
+        platforms without Unix sockets). A daemon that accepted the request
+        but did not reply within timeout gives
+        ``{"ok": False, "timeout": True, "error": ...}``.
+    """
+    path = socket_path(path)
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connected = False
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(path)
+        connected = True
+        sock.settimeout(timeout)
+        sock.sendall(json.dumps(dict(fields, op=op)).encode() + b"\n")
+        reply = b""
+        while not reply.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            reply += chunk
+    except socket.timeout:
+        if not connected:
+            return None
+        return {"ok": False, "timeout": True, "error": f"no reply within {timeout:g}s"}
+    except OSError:
+        return None
+    finally:
+        sock.close()
+    try:
+        return json.loads(reply)
+    except json.JSONDecodeError:
+        return None
+
+
+def parse_args(argv):
+    """Parse fda_data_store.py arguments without argparse.
+
+    Returns:
+        Dict of option dests to values (flags are True or False), or None
+        if argv holds anything this parser does not handle.
+    """
+    options = {dest: False if not takes_value else None for dest, takes_value in _OPTIONS.values()}
+    i = 0
+    while i < len(argv):
+        name, sep, value = argv[i].partition("=")
+        if name not in _OPTIONS:
+            return None
+        dest, takes_value = _OPTIONS[name]
+        if not takes_value:
+            if sep:
+                return None
+            options[dest] = True
+        elif sep:
+            options[dest] = value
+        elif i + 1 < len(argv):
+            i += 1
+            options[dest] = argv[i]
+        else:
+            return None
+        i += 1
+    if options["workers"] is not None:
+        try:
+            options["workers"] = int(options["workers"])
+        except ValueError:
+            return None
+    return options
+
+
+def daemon_op(options):
+    """The daemon operation serving these options, or None to run in-process."""
+    if options.get("clear"):
+        return "clear"
+    if options.get("refresh_all"):
+        return "refresh" if options.get("eager") else "refresh-all"
+    if options.get("show_manifest"):
+        return "show-manifest"
+    if options.get("query") and not (options.get("prefetch") or options.get("batch")):
+        return "query"
+    return None
+
+
+def run_in_daemon(options):
+    """Send a parsed call to the daemon and print its output.
+
+    Exits with the handler's exit code when it failed, and with 1 when the
+    daemon does not reply in time: it may still be running the call, so
+    running it here as well could do it twice.
+
+    Returns:
+        True if a daemon answered, False to run in this process.
+    """
+    op = daemon_op(options)
+    if op is None:
+        return False
+    fields = {name: options.get(name) for name in DAEMON_ARGS}
+    reply = request(op, options.get("socket"), timeout=REPLY_TIMEOUT,
+                    project=options.get("project"), args=fields)
+    if reply and reply.get("timeout"):
+        print(f"ERROR:data-store daemon sent {reply['error']}", file=sys.stderr)
+        sys.exit(1)
+    if not reply or not reply.get("ok"):
+        return False
+    sys.stdout.write(reply["stdout"])
+    sys.stderr.write(reply["stderr"])
+    if reply["exit_code"]:
+        sys.exit(reply["exit_code"])
+    return True
+
+
+def forward(argv):
+    """Forward a fda_data_store.py command line to the daemon if possible.
+
+    Returns:
+        True if a daemon answered (its output has been printed).
+    """
+    options = parse_args(argv)
+    if options is None or options["no_daemon"]:
+        return False
+    return run_in_daemon(options)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Long-lived data-store daemon over a Unix domain socket.
+
+Every ``fda_data_store.py`` call otherwise pays Python startup, imports,
+settings parsing and a fresh FDAClient (with an empty in-memory cache) and
+manifest open. The daemon keeps one FDAClient and the open project
+ManifestStores resident and answers fda_data_store.py operations over a
+Unix socket; the CLI sends --query, --show-manifest, --refresh-all and
+--clear here when a daemon is listening, and runs them in-process when not.
+
+Protocol: one JSON object per line each way.
+
+    -> {"op": "query", "project": "NAME", "args": {"query": "recalls", "product_code": "OVE"}}
+    <- {"ok": true, "exit_code": 0, "stdout": "CACHE_STATUS:HIT\\n...", "stderr": ""}
+
+Ops: query, show-manifest, refresh-all (mark stale), refresh (eager
+re-fetch), clear, ping, shutdown. Failures
+reply ``{"ok": false, "error": "..."}``.
+
+The socket path is FDA_DATA_STORE_SOCKET, else ``data_store_socket:`` in
+~/.claude/fda-tools.local.md, else ~/fda-510k-data/data-store.sock. The
+client side (socket_path, request) lives in fda_store_client.py.
+
+Usage:
+    python3 fda_store_daemon.py [--socket PATH]     # serve in the foreground
+    python3 fda_store_daemon.py --status
+    python3 fda_store_daemon.py --stop
+"""
+
+import argparse
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+# Import sibling modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fda_data_store
+from fda_store_client import CONNECT_TIMEOUT, DEFAULT_SOCKET, request, socket_path
+
+# Max bytes in one request line
+MAX_REQUEST_BYTES = 1 << 20
+
+# fda_data_store.py handler for each op
+OPS = {
+    "query": "handle_query",
+    "show-manifest": "handle_show_manifest",
+    "refresh-all": "handle_refresh_all",
+    "refresh": "handle_refresh_eager",
+    "clear": "handle_clear",
+}
+
+
+class _ThreadLocalStream:
+    """sys.stdout/sys.stderr stand-in that each handler thread can capture."""
+
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def capture(self):
+        self._local.buffer = io.StringIO()
+        return self._local.buffer
+
+    def release(self):
+        self._local.buffer = None
+
+    def _target(self):
+        buffer = getattr(self._local, "buffer", None)
+        return self._default if buffer is None else buffer
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._default, name)
+
+
+def _capturing_streams():
+    """Install (once) and return thread-capturable sys.stdout and sys.stderr."""
+    with _streams_lock:
+        if not isinstance(sys.stdout, _ThreadLocalStream):
+            sys.stdout = _ThreadLocalStream(sys.stdout)
+        if not isinstance(sys.stderr, _ThreadLocalStream):
+            sys.stderr = _ThreadLocalStream(sys.stderr)
+        return sys.stdout, sys.stderr
+
+
+_streams_lock = threading.Lock()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # Connections beyond the listen backlog are refused at once on Unix
+    # sockets, so leave room for bursts of concurrent CLI calls
+    request_queue_size = 128
+
+
+class StoreDaemon:
+    """Serves fda_data_store.py operations with resident client and manifests."""
+
+    def __init__(self, path=None, client=None):
+        """Initialize the daemon (call serve_forever() to start it).
+
+        Args:
+            path: Socket path (default: socket_path()).
+            client: FDAClient to keep resident (default: a new one).
+        """
+        self.path = socket_path(path)
+        self.client = client
+        self.started = time.time()
+        self.requests = 0
+        self._server = None
+        self._ready = threading.Event()
+
+    def handle(self, message):
+        """Run one request and return the reply dict."""
+        self.requests += 1
+        op = message.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(), "uptime": round(time.time() - self.started, 1),
+                    "requests": self.requests, "socket": self.path}
+        if op == "shutdown":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True}
+        if op not in OPS:
+            return {"ok": False, "error": f"unknown op {op!r}"}
+        if not message.get("project"):
+            return {"ok": False, "error": "project is required"}
+
+        fields = message.get("args") or {}
+        args = argparse.Namespace(project=message["project"],
+                                  **{name: fields.get(name) for name in fda_data_store.DAEMON_ARGS})
+        args.refresh = bool(args.refresh)
+        if args.workers is None:
+            args.workers = fda_data_store.WARM_WORKERS
+        if op == "query":
+            required = fda_data_store.REQUIRED_ARGS.get(args.query)
+            if required is None:
+                return {"ok": False, "error": f"unknown query type {args.query!r}"}
+            if not getattr(args, required):
+                return {"ok": False, "error": f"{required} is required for query {args.query}"}
+
+        # Handlers print their results; capture this thread's output
+        stdout, stderr = _capturing_streams()
+        out, err = stdout.capture(), stderr.capture()
+        try:
+            getattr(fda_data_store, OPS[op])(args)
+            exit_code = 0
+        except Exception as e:
+            err.write(f"ERROR:{e}\n")
+            exit_code = 1
+        finally:
+            stdout.release()
+            stderr.release()
+        return {"ok": True, "exit_code": exit_code, "stdout": out.getvalue(),
+                "stderr": err.getvalue()}
+
+    def _make_handler(self):
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline(MAX_REQUEST_BYTES)
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:
+                    reply = {"ok": False, "error": f"bad request: {e}"}
+                else:
+                    reply = daemon.handle(message)
+                self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+        return Handler
+
+    def serve_forever(self):
+        """Listen on the socket until shutdown() or a shutdown request.
+
+        Raises:
+            RuntimeError: If another daemon already answers on the socket.
+        """
+        if request("ping", self.path, timeout=CONNECT_TIMEOUT):
+            raise RuntimeError(f"a data-store daemon is already listening on {self.path}")
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Left behind by a daemon that died
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._server = _Server(self.path, self._make_handler())
+        os.chmod(self.path, 0o600)
+        fda_data_store.enable_resident_state(self.client)
+        self._ready.set()
+        try:
+            self._server.serve_forever()
+        finally:
+            fda_data_store.disable_resident_state()
+            with _streams_lock:
+                if isinstance(sys.stdout, _ThreadLocalStream):
+                    sys.stdout = sys.stdout._default
+                if isinstance(sys.stderr, _ThreadLocalStream):
+                    sys.stderr = sys.stderr._default
+            self._server.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def wait_ready(self, timeout=5.0):
+        """Block until the socket is accepting connections."""
+        return self._ready.wait(timeout)
+
+    def shutdown(self):
+        """Stop serve_forever()."""
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FDA data-store daemon (Unix socket)")
+    parser.add_argument("--socket", help=f"Socket path (default: {DEFAULT_SOCKET})")
+    parser.add_argument("--status", action="store_true", help="Report whether a daemon is running")
+    parser.add_argument("--stop", action="store_true", help="Stop the running daemon")
+    args = parser.parse_args()
+
+    if args.status or args.stop:
+        reply = request("shutdown" if args.stop else "ping", args.socket,
+                        timeout=CONNECT_TIMEOUT * 5)
+        if reply is None:
+            print(f"DAEMON:not running ({socket_path(args.socket)})")
+            sys.exit(1)
+        if reply.get("timeout"):
+            print(f"DAEMON:not responding ({socket_path(args.socket)})")
+            sys.exit(1)
+        print("DAEMON:stopping" if args.stop else
+              f"DAEMON:running pid={reply['pid']} uptime={reply['uptime']}s "
+              f"requests={reply['requests']} socket={reply['socket']}")
+        return
+
+    if not hasattr(socket, "AF_UNIX"):
+        print("ERROR:Unix domain sockets are not available on this platform", file=sys.stderr)
+        sys.exit(1)
+    daemon = StoreDaemon(args.socket)
+    if request("ping", daemon.path, timeout=CONNECT_TIMEOUT):
+        print(f"ERROR:a data-store daemon is already listening on {daemon.path}", file=sys.stderr)
+        sys.exit(1)
+    print(f"DAEMON:listening on {daemon.path} (pid {os.getpid()})", flush=True)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,7 @@ sys.path.insert(0, str(SCRIPT_DIR))
 
 try:
     from fda_api_client import FDAClient
+    from fda_dataloader import KNumberLoader
 except ImportError:
     print("ERROR: Could not import FDAClient. Make sure fda_api_client.py is in the same directory.", file=sys.stderr)
     sys.exit(1)
@@ -153,16 +154,25 @@ def fetch_predicate_data(k_numbers, output_format='text'):
     client = FDAClient()
     results = {}
 
+    # Normalize K-number format
+    k_nums = []
     for k_num in k_numbers:
-        # Normalize K-number format
         k_num = k_num.upper().strip()
         if not k_num.startswith('K'):
             k_num = 'K' + k_num
+        k_nums.append(k_num)
 
-        print(f"Fetching {k_num}...", file=sys.stderr)
+    # Coalesce uncached lookups into batched OR queries; each record is
+    # written back to the single K-number cache entry.
+    print(f"Fetching {len(k_nums)} K-number(s)...", file=sys.stderr)
+    try:
+        responses = KNumberLoader(client).load_many(k_nums)
+    except Exception:
+        responses = {}
 
+    for k_num in k_nums:
         try:
-            api_response = client.get_510k(k_num)
+            api_response = responses.get(k_num) or client.get_510k(k_num)
 
             # openFDA returns {results: [...], meta: {...}}
             if not api_response or 'results' not in api_response:
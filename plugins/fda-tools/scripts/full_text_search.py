@@ -18,40 +18,60 @@ Usage:
     )
 """
 
+import atexit
 import os
-import json
+import shutil
+import sys
 import re
+import tempfile
 from pathlib import Path
 from typing import List, Dict, Set, Optional
 from collections import defaultdict, Counter
 
+# Import sibling modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fda_bulk_store import iter_json_object_items
+from structured_cache import StructuredDocument, iter_documents, write_document
 
-def load_structured_cache() -> Dict:
-    """Load the structured text cache index."""
-    structured_dir = Path.home() / 'fda-510k-data' / 'extraction' / 'structured_text_cache'
+
+def load_structured_cache(structured_dir: Optional[Path] = None) -> Dict[str, StructuredDocument]:
+    """
+    Load the structured text cache index.
+
+    Documents read their text lazily (see structured_cache), so loading
+    a compact cache reads only section offsets and statistics. Without a
+    structured cache, the legacy pdf_data.json is streamed into a compact
+    cache in a temporary directory (removed at exit), so its texts are
+    not held in memory either.
+
+    Args:
+        structured_dir: Structured cache directory
+            (default: ~/fda-510k-data/extraction/structured_text_cache)
+
+    Returns:
+        Dict mapping K-number -> StructuredDocument
+    """
+    if structured_dir is None:
+        structured_dir = Path.home() / 'fda-510k-data' / 'extraction' / 'structured_text_cache'
 
     if not structured_dir.exists():
         # Try legacy cache
         legacy = Path.home() / 'fda-510k-data' / 'extraction' / 'pdf_data.json'
         if legacy.exists():
-            with open(legacy) as f:
-                data = json.load(f)
-            # Convert to structured format
-            structured = {}
-            for filename, content in data.items():
-                k_number = filename.replace('.pdf', '').upper()
-                text = content.get('text', '') if isinstance(content, dict) else str(content)
-                structured[k_number] = {'full_text': text, 'sections': {}}
-            return structured
+            # Convert to the compact structured format one entry at a time
+            structured_dir = Path(tempfile.mkdtemp(prefix='fda-legacy-cache-'))
+            atexit.register(shutil.rmtree, structured_dir, True)
+            with open(legacy, 'rb') as f:
+                for filename, content in iter_json_object_items(f):
+                    k_number = filename.replace('.pdf', '').upper()
+                    text = content.get('text', '') if isinstance(content, dict) else str(content)
+                    write_document(structured_dir,
+                                   StructuredDocument.from_text(k_number, text).data, 'compact')
+        else:
+            return {}
 
     # Load from structured cache
-    structured = {}
-    for file_path in structured_dir.glob('*.json'):
-        with open(file_path) as f:
-            data = json.load(f)
-        structured[data['k_number']] = data
-
-    return structured
+    return {doc.k_number: doc for doc in iter_documents(structured_dir)}
 
 
 def search_all_sections(
@@ -113,19 +133,22 @@ def search_all_sections(
         doc = structured_cache[k_number]
 
         # Search in sections
-        doc_sections = doc.get('sections', {})
+        doc_sections = doc.sections
 
         # Section-aware search
         sections_to_search = sections if sections else list(doc_sections.keys()) + ['full_text']
 
+        # Read the document text once (not kept, so memory holds one document)
+        full_text = doc.read_text()
+
         for section_name in sections_to_search:
             if section_name == 'full_text':
-                text = doc.get('full_text', '')
+                text = full_text
                 section_context = 'general'
             else:
                 if section_name not in doc_sections:
                     continue
-                text = doc_sections[section_name].get('text', '')
+                text = doc.section_text(section_name, full_text)
                 section_context = section_name
 
             # Search for each term
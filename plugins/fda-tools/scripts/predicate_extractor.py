@@ -38,7 +38,7 @@ KNOWN_PMA_NUMBERS = set()
 
 # Shared HTTP utilities
 try:
-    from fda_http import create_session, FDA_HEADERS
+    from fda_http import create_session, get_session, FDA_HEADERS
 except ImportError:
     # Fallback if fda_http not on path
     FDA_HEADERS = {
@@ -53,6 +53,7 @@ except ImportError:
         session = requests.Session()
         session.headers.update(FDA_HEADERS)
         return session
+    get_session = create_session
 try:
     import orjson
     HAS_ORJSON = True
@@ -71,6 +72,9 @@ except ImportError:
 def enrich_knumbers(knumbers, batch_size=100):
     """Fetch openFDA enrichment data for K-numbers.
 
+    The K-numbers go to FDAClient.batch_510k(), which splits them into
+    URL-safe queries of at most batch_size and runs those concurrently.
+
     Returns a dict keyed by K-number with basic metadata.
     """
     try:
@@ -81,19 +85,24 @@ def enrich_knumbers(knumbers, batch_size=100):
     client = FDAClient()
     enrichment = {}
     kn_list = sorted(set(k for k in knumbers if re.match(r"^K\d{6}$", k)))
-    for i in range(0, len(kn_list), batch_size):
-        chunk = kn_list[i:i + batch_size]
-        result = client.batch_510k(chunk)
-        for r in result.get("results", []):
-            k = r.get("k_number")
-            if not k:
-                continue
-            enrichment[k] = {
-                "device_name": r.get("device_name"),
-                "decision_date": r.get("decision_date"),
-                "applicant": r.get("applicant"),
-                "product_code": r.get("product_code"),
-            }
+    if not kn_list:
+        return enrichment
+    result = client.batch_510k(kn_list, max_ids=batch_size) or {}
+    for r in result.get("results", []):
+        k = r.get("k_number")
+        if not k:
+            continue
+        enrichment[k] = {
+            "device_name": r.get("device_name"),
+            "decision_date": r.get("decision_date"),
+            "applicant": r.get("applicant"),
+            "product_code": r.get("product_code"),
+        }
+    if result.get("degraded"):
+        print(f"Warning: openFDA enrichment failed: {result.get('error')}", file=sys.stderr)
+    for error in result.get("errors", []):
+        print(f"Warning: openFDA enrichment failed for {len(error['k_numbers'])} K-numbers: "
+              f"{error['error']}", file=sys.stderr)
     return enrichment
 
 
@@ -108,7 +117,7 @@ def download_and_parse_csv(urls, pma_url, data_dir=None):
         os.chdir(data_dir)
 
     try:
-        session = create_session()
+        session = get_session()
 
         required_files = [url.split('/')[-1].replace('.zip', '.txt') for url in urls] + ['pma.txt']
         missing_files = []
@@ -71,7 +71,8 @@ def download_pdf_text(k_number):
         return None
 
     try:
-        import requests
+        from fda_http import get_session
+        session = get_session()  # pooled keep-alive, reused across K-numbers
         use_requests = True
     except ImportError:
         import urllib.request
@@ -87,10 +88,8 @@ def download_pdf_text(k_number):
         try:
             print(f"  Trying {url}...")
             if use_requests:
-                session = requests.Session()
-                session.headers.update(PDF_DOWNLOAD_HEADERS)
-                session.cookies.update(PDF_COOKIES)
-                resp = session.get(url, timeout=PDF_DOWNLOAD_TIMEOUT, allow_redirects=True)
+                resp = session.get(url, headers=PDF_DOWNLOAD_HEADERS, cookies=PDF_COOKIES,
+                                   timeout=PDF_DOWNLOAD_TIMEOUT, allow_redirects=True)
                 if resp.status_code != 200:
                     continue
                 content_type = resp.headers.get("Content-Type", "")
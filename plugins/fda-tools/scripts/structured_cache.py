@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Reader and writer for structured text cache files.
+
+build_structured_cache.py writes one ``{K}.json`` per device to
+~/fda-510k-data/extraction/structured_text_cache/. Two layouts exist:
+
+- ``full`` (the original layout): ``full_text`` plus a copy of every
+  section's text, written with ``indent=2``.
+- ``compact`` (``format_version`` 2): sections keep only their
+  ``start_pos``/``end_pos`` offsets, and the text lives once in
+  ``texts/{K}.txt`` (``texts/{K}.txt.gz`` for ``compact-gzip``). The JSON
+  is written without indentation and holds no text, so listing the cache
+  or reading its statistics never loads the documents.
+
+StructuredDocument reads either layout and returns text lazily: a section
+is ``full_text[start_pos:end_pos].strip()``, exactly what the full layout
+stores.
+
+Usage:
+    from structured_cache import iter_documents
+
+    for doc in iter_documents(structured_dir):
+        print(doc.k_number, doc.get('section_count'), doc.section_text('predicate_se')[:80])
+"""
+
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+# format_version of compact files (files without one use the full layout)
+FORMAT_VERSION = 2
+
+OUTPUT_FORMATS = ('compact', 'compact-gzip', 'full')
+
+# Subdirectory of the structured cache holding compact-format text blobs
+TEXT_DIR = 'texts'
+
+# Non-device JSON files kept in the structured cache directory
+RESERVED_FILES = ('manifest.json',)
+
+
+def section_slice(text: str, section: Dict) -> str:
+    """Text of a section given the document text and the section's offsets."""
+    return text[section['start_pos']:section['end_pos']].strip()
+
+
+class StructuredDocument:
+    """One structured cache document, in either layout, with lazy text."""
+
+    def __init__(self, data: Dict, text_path: Optional[Path] = None):
+        """
+        Args:
+            data: Parsed ``{K}.json`` contents
+            text_path: Text blob of a compact document
+        """
+        self.data = data
+        self.text_path = text_path
+        self._text = None
+
+    @classmethod
+    def from_text(cls, k_number: str, text: str) -> 'StructuredDocument':
+        """A document with text and no detected sections."""
+        return cls({'k_number': k_number, 'full_text': text, 'full_text_length': len(text),
+                    'sections': {}, 'section_count': 0})
+
+    @property
+    def k_number(self) -> str:
+        return self.data['k_number']
+
+    @property
+    def compact(self) -> bool:
+        return self.data.get('format_version', 1) >= FORMAT_VERSION
+
+    @property
+    def sections(self) -> Dict[str, Dict]:
+        """Section name -> section info (offsets, header, tier; text only in full layout)."""
+        return self.data.get('sections', {})
+
+    def get(self, key, default=None):
+        """Look up a top-level field (``full_text`` is only present in the full layout)."""
+        return self.data.get(key, default)
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def read_text(self) -> str:
+        """Read the document text without keeping it on the document."""
+        if self._text is not None:
+            return self._text
+        if not self.compact:
+            return self.data.get('full_text', '')
+        opener = gzip.open if self.text_path.suffix == '.gz' else open
+        with opener(self.text_path, 'rt', encoding='utf-8', errors='surrogatepass',
+                    newline='') as f:
+            return f.read()
+
+    @property
+    def full_text(self) -> str:
+        """Document text, read on first access and then kept."""
+        if self._text is None:
+            self._text = self.read_text()
+        return self._text
+
+    def section_text(self, name: str, text: Optional[str] = None) -> str:
+        """
+        Text of one section ('' if it was not detected).
+
+        Args:
+            name: Section name
+            text: Document text already read with read_text(), to avoid
+                reading a compact document's blob again
+        """
+        section = self.sections.get(name)
+        if section is None:
+            return ''
+        if not self.compact:
+            return section.get('text', '')
+        return section_slice(self.full_text if text is None else text, section)
+
+    def to_dict(self) -> Dict:
+        """The document in the full layout (text included)."""
+        text = self.read_text()
+        data = {k: v for k, v in self.data.items() if k not in ('format_version', 'text_file')}
+        data['full_text'] = text
+        data['sections'] = {name: dict(info, text=self.section_text(name, text))
+                            for name, info in self.sections.items()}
+        return data
+
+
+def _text_files(output_dir: Path, k_number: str):
+    return [output_dir / TEXT_DIR / f"{k_number}.txt", output_dir / TEXT_DIR / f"{k_number}.txt.gz"]
+
+
+def document_paths(output_dir: Path, k_number: str, output_format: str = 'full') -> List[Path]:
+    """Files making up a document written in output_format (``{K}.json`` first)."""
+    json_path = output_dir / f"{k_number}.json"
+    if output_format == 'full':
+        return [json_path]
+    plain_path, gz_path = _text_files(output_dir, k_number)
+    return [json_path, gz_path if output_format == 'compact-gzip' else plain_path]
+
+
+def _replace(path: Path, write, mode: str = 'w', opener=open):
+    """Write path through a temp file + rename."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    kwargs = {'encoding': 'utf-8', 'errors': 'surrogatepass', 'newline': ''}
+    with opener(tmp, mode, **kwargs) as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def write_document(output_dir: Path, structured: Dict, output_format: str = 'full') -> Path:
+    """
+    Write a structured document (given in the full layout).
+
+    Files are replaced atomically, and a compact document's text blob is
+    written before its JSON, so an interrupted write never leaves a
+    partial document.
+
+    Args:
+        output_dir: Structured cache directory
+        structured: Document with ``full_text`` and section ``text``
+        output_format: 'full', 'compact' or 'compact-gzip'
+
+    Returns:
+        Path of the written ``{K}.json``
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    k_number = structured['k_number']
+    json_path = output_dir / f"{k_number}.json"
+    plain_path, gz_path = _text_files(output_dir, k_number)
+
+    if output_format == 'full':
+        _replace(json_path, lambda f: json.dump(structured, f, indent=2))
+        stale = [plain_path, gz_path]
+    else:
+        text_path = gz_path if output_format == 'compact-gzip' else plain_path
+        text_path.parent.mkdir(parents=True, exist_ok=True)
+        text = structured['full_text']
+        if text_path == gz_path:
+            _replace(text_path, lambda f: f.write(text), 'wt', gzip.open)
+        else:
+            _replace(text_path, lambda f: f.write(text))
+        record = {k: v for k, v in structured.items() if k != 'full_text'}
+        record['format_version'] = FORMAT_VERSION
+        record['text_file'] = f"{TEXT_DIR}/{text_path.name}"
+        record['sections'] = {name: {k: v for k, v in info.items() if k != 'text'}
+                              for name, info in structured['sections'].items()}
+        _replace(json_path, lambda f: json.dump(record, f, separators=(',', ':')))
+        stale = [plain_path if text_path == gz_path else gz_path]
+
+    for path in stale:
+        if path.exists():
+            path.unlink()
+    return json_path
+
+
+def read_document(path: Path) -> StructuredDocument:
+    """Read a ``{K}.json`` structured cache file in either layout."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    text_path = path.parent / data['text_file'] if 'text_file' in data else None
+    return StructuredDocument(data, text_path)
+
+
+def iter_documents(structured_dir: Path) -> Iterator[StructuredDocument]:
+    """Yield every document in a structured cache directory (sorted by file name)."""
+    for path in sorted(structured_dir.glob('*.json')):
+        if path.name not in RESERVED_FILES:
+            yield read_document(path)
@@ -0,0 +1,45 @@
+"""Shared pytest fixtures for the fda-tools test suite."""
+
+import os
+import sys
+import threading
+
+import pytest
+
+# Add scripts directory to path for import
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from fda_api_client import FDAClient
+
+
+@pytest.fixture
+def fake_client(tmp_path):
+    """Factory for an FDAClient whose network fetch is replaced.
+
+    ``fake_client(respond, **kwargs)`` returns a client (cache under
+    tmp_path) whose _fetch answers with ``respond(endpoint, params)``.
+    Like the real _fetch, an answer that is not degraded is cached under
+    its key and per record, so cache hits, refreshes and stale entries
+    behave as they do against openFDA. ``client.fetches`` counts fetches
+    and ``client.calls`` lists their (endpoint, params).
+    """
+
+    def make(respond, **kwargs):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), **kwargs)
+        client.fetches = 0
+        client.calls = []
+        lock = threading.Lock()
+
+        def fake_fetch(endpoint, params, key):
+            with lock:
+                client.fetches += 1
+                client.calls.append((endpoint, dict(params)))
+            data = respond(endpoint, params)
+            if data is not None and not data.get("degraded"):
+                client._set_cached(key, data, endpoint)
+                client._cache_records(endpoint, params, data)
+            return data
+
+        client._fetch = fake_fetch
+        return client
+
+    return make
@@ -0,0 +1,171 @@
+"""Tests for the openFDA token-bucket limiter and AsyncFDAClient.
+
+Network access is replaced by patching FDAClient._fetch, so these tests
+exercise concurrency, caching and rate limiting logic only.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add scripts directory to path for import
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from fda_api_client import FDAClient
+from fda_async_client import AsyncFDAClient
+from fda_rate_limit import (
+    OPENFDA_QUOTAS,
+    RateLimiter,
+    TokenBucket,
+    openfda_rate_limiter,
+)
+
+
+class CountingLimiter:
+    """Limiter stub that records acquire() calls."""
+
+    def __init__(self, allow=True):
+        self.calls = 0
+        self.allow = allow
+
+    def acquire(self, timeout=None):
+        self.calls += 1
+        return self.allow
+
+
+class TestTokenBucket:
+    """Test token bucket refill and blocking behavior."""
+
+    def test_burst_then_empty(self):
+        bucket = TokenBucket(rate=1, capacity=3)
+        assert all(bucket.try_acquire() for _ in range(3))
+        assert bucket.try_acquire() is False
+
+    def test_refills_over_time(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+        assert bucket.try_acquire()
+        time.sleep(0.03)
+        assert bucket.try_acquire()
+
+    def test_acquire_blocks_until_token(self):
+        bucket = TokenBucket(rate=20, capacity=1)
+        bucket.acquire()
+        start = time.monotonic()
+        bucket.acquire()
+        assert time.monotonic() - start >= 0.03
+
+    def test_acquire_timeout(self):
+        bucket = TokenBucket(rate=0.1, capacity=1)
+        bucket.acquire()
+        assert bucket.acquire(timeout=0.01) is False
+
+    def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0, capacity=1)
+
+
+class TestRateLimiter:
+    """Test combined per-minute / per-day limiter and quota defaults."""
+
+    def test_daily_quota_exhaustion_returns_false(self):
+        limiter = RateLimiter(per_minute=6000, per_day=2)
+        assert limiter.acquire() is True
+        assert limiter.acquire() is True
+        assert limiter.acquire() is False
+
+    def test_shared_limiter_per_quota(self):
+        assert openfda_rate_limiter("key-a") is openfda_rate_limiter("key-b")
+        assert openfda_rate_limiter(None) is not openfda_rate_limiter("key-a")
+
+    def test_quota_table_distinguishes_api_key(self):
+        assert OPENFDA_QUOTAS["with_key"][1] > OPENFDA_QUOTAS["without_key"][1]
+
+    def test_client_uses_shared_limiter_by_default(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), api_key="k")
+        assert client.rate_limiter is openfda_rate_limiter("k")
+
+
+class TestClientRateLimiting:
+    """FDAClient should only consume tokens for network attempts."""
+
+    def test_quota_exhausted_degrades(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"),
+                           rate_limiter=CountingLimiter(allow=False))
+        result = client.get_510k("K241335")
+        assert result["degraded"] is True
+        assert "quota" in result["error"]
+
+    def test_cache_hit_skips_limiter(self, tmp_path):
+        limiter = CountingLimiter()
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), rate_limiter=limiter)
+        key = client._cache_key("510k", {"search": 'k_number:"K1"', "limit": "1"})
+        client._set_cached(key, {"results": [{"k_number": "K1"}]})
+        assert client.get_510k("K1")["results"][0]["k_number"] == "K1"
+        assert limiter.calls == 0
+
+
+class TestAsyncFDAClient:
+    """Test AsyncFDAClient concurrency and method parity."""
+
+    @pytest.fixture
+    def client(self, fake_client):
+        state = {"active": 0, "peak": 0, "calls": 0}
+        lock = threading.Lock()
+
+        def respond(endpoint, params):
+            with lock:
+                state["active"] += 1
+                state["calls"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(0.05)
+            with lock:
+                state["active"] -= 1
+            return {"results": [{"endpoint": endpoint, "search": params.get("search")}],
+                    "meta": {"results": {"total": 1}}}
+
+        sync = fake_client(respond, rate_limiter=CountingLimiter())
+        sync.state = state
+        return sync
+
+    def test_gather_runs_concurrently(self, client):
+        async def run():
+            async with AsyncFDAClient(client, max_concurrency=4) as ac:
+                return await asyncio.gather(*(ac.get_510k(f"K{i:06d}") for i in range(8)))
+
+        start = time.monotonic()
+        results = asyncio.run(run())
+        elapsed = time.monotonic() - start
+        assert len(results) == 8
+        assert client.state["peak"] == 4
+        assert elapsed < 0.05 * 8
+
+    def test_map_preserves_order(self, client):
+        async def run():
+            async with AsyncFDAClient(client, max_concurrency=3) as ac:
+                return await ac.map("get_recalls", ["OVE", "DQY", "QAS"])
+
+        results = asyncio.run(run())
+        searches = [r["results"][0]["search"] for r in results]
+        assert searches == ['product_code:"OVE"', 'product_code:"DQY"', 'product_code:"QAS"']
+
+    def test_cached_results_not_refetched(self, client):
+        async def run():
+            async with AsyncFDAClient(client) as ac:
+                await ac.get_classification("OVE")
+                return await ac.get_classification("OVE")
+
+        asyncio.run(run())
+        assert client.state["calls"] == 1
+
+    def test_mirrors_sync_convenience_methods(self):
+        for name in ("get_510k", "get_classification", "get_clearances", "batch_510k",
+                     "get_events", "get_recalls", "get_enforcement", "get_pma", "get_pma_supplements",
+                     "get_pma_by_product_code", "get_udi", "search_510k", "validate_device"):
+            assert asyncio.iscoroutinefunction(getattr(AsyncFDAClient, name)), name
+
+    def test_invalid_concurrency(self, tmp_path):
+        with pytest.raises(ValueError):
+            AsyncFDAClient(cache_dir=str(tmp_path / "cache"), max_concurrency=0)
@@ -0,0 +1,273 @@
+"""Tests for bulk openFDA dataset ingestion and local/offline FDAClient mode.
+
+Fixture partitions are small zipped JSON files written to tmp_path in the
+same layout as the openFDA download.json partitions.
+"""
+
+import io
+import json
+import os
+import sys
+import zipfile
+
+import pytest
+
+# Add scripts directory to path for import
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+import fda_bulk_store
+from fda_api_client import FDAClient
+from fda_bulk_store import BulkStore, iter_json_object_items, iter_json_records, parse_search
+
+CLEARANCES = [
+    {"k_number": "K241335", "product_code": "DQY", "applicant": "Acme Medical Inc",
+     "device_name": "Percutaneous Catheter", "decision_date": "2024-03-15"},
+    {"k_number": "K200123", "product_code": "DQY", "applicant": "Beta Devices",
+     "device_name": "Guide Catheter", "decision_date": "2020-08-01"},
+    {"k_number": "K190001", "product_code": "OVE", "applicant": "Acme Medical Inc",
+     "device_name": "Intervertebral Fusion Device", "decision_date": "2019-01-10"},
+]
+CLASSIFICATIONS = [
+    {"product_code": "DQY", "device_name": "Catheter, Percutaneous", "device_class": "2",
+     "regulation_number": "870.1250"},
+]
+RECALLS = [
+    {"product_code": "DQY", "k_numbers": ["K241335"], "recall_status": "Open",
+     "event_date_initiated": "2024-06-01"},
+    {"product_code": "DQY", "k_numbers": ["K200123"], "recall_status": "Terminated",
+     "event_date_initiated": "2021-02-01"},
+]
+EVENTS = [
+    {"event_type": "Malfunction", "device": [{"device_report_product_code": "DQY"}]},
+    {"event_type": "Malfunction", "device": [{"device_report_product_code": "DQY"}]},
+    {"event_type": "Injury", "device": [{"device_report_product_code": "DQY"}]},
+    {"event_type": "Death", "device": [{"device_report_product_code": "OVE"}]},
+]
+
+
+def write_partition(path, records):
+    doc = {"meta": {"results": {"skip": 0, "limit": len(records), "total": len(records)}},
+           "results": records}
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(path.stem, json.dumps(doc, indent=1))
+    return path
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BulkStore(tmp_path / "bulk" / "openfda.db")
+    for dataset, records in (("510k", CLEARANCES), ("classification", CLASSIFICATIONS),
+                             ("recall", RECALLS), ("event", EVENTS)):
+        store.ingest_zip(dataset, write_partition(tmp_path / f"device-{dataset}-0001.json.zip",
+                                                  records))
+    yield store
+    store.close()
+
+
+class TestStreamingParser:
+    """Test the incremental results-array reader."""
+
+    def test_reads_records_across_small_chunks(self, monkeypatch):
+        monkeypatch.setattr(fda_bulk_store, "ijson", None)
+        doc = json.dumps({"meta": {"results": {"total": 3}}, "results": CLEARANCES})
+        records = list(iter_json_records(io.BytesIO(doc.encode()), chunk_size=7))
+        assert records == CLEARANCES
+
+    def test_empty_results(self, monkeypatch):
+        monkeypatch.setattr(fda_bulk_store, "ijson", None)
+        doc = b'{"meta": {}, "results": [ ]}'
+        assert list(iter_json_records(io.BytesIO(doc))) == []
+
+    def test_truncated_file_raises(self, monkeypatch):
+        monkeypatch.setattr(fda_bulk_store, "ijson", None)
+        doc = json.dumps({"results": CLEARANCES})[:-20]
+        with pytest.raises(ValueError):
+            list(iter_json_records(io.BytesIO(doc.encode()), chunk_size=16))
+
+    @pytest.mark.parametrize("chunk_size", [1, 5, 64])
+    def test_object_items_across_small_chunks(self, monkeypatch, chunk_size):
+        monkeypatch.setattr(fda_bulk_store, "ijson", None)
+        obj = {"k241335.pdf": {"text": "Indications \"for\" use\n" * 5, "pages": 2},
+               "K990001.pdf": "plain text", "n": -1.5e3, "flag": True, "none": None, "é": []}
+        for indent in (None, 2):
+            doc = json.dumps(obj, indent=indent, ensure_ascii=False).encode()
+            assert list(iter_json_object_items(io.BytesIO(doc), chunk_size)) == list(obj.items())
+
+    def test_object_items_errors(self, monkeypatch):
+        monkeypatch.setattr(fda_bulk_store, "ijson", None)
+        assert list(iter_json_object_items(io.BytesIO(b" {} "))) == []
+        for doc in (b"[1, 2]", b'{"a": 1, "b": ', b'{"a" 1}'):
+            with pytest.raises(ValueError):
+                list(iter_json_object_items(io.BytesIO(doc), chunk_size=4))
+
+    def test_large_values_are_not_rescanned_per_chunk(self, monkeypatch):
+        monkeypatch.setattr(fda_bulk_store, "ijson", None)
+        decodes = []
+
+        class CountingDecoder(json.JSONDecoder):
+            def raw_decode(self, s, idx=0):
+                decodes.append(idx)
+                return super().raw_decode(s, idx)
+
+        monkeypatch.setattr(fda_bulk_store.json, "JSONDecoder", CountingDecoder)
+        text = "x" * 200000
+        doc = json.dumps({"a.pdf": {"text": text}, "b.pdf": "short"}).encode()
+        items = list(iter_json_object_items(io.BytesIO(doc), chunk_size=64))
+        assert items == [("a.pdf", {"text": text}), ("b.pdf", "short")]
+        # 3125 chunks; a retry per chunk would decode thousands of times
+        assert len(decodes) < 50
+
+        decodes.clear()
+        doc = json.dumps({"results": [text, 1, text]}).encode()
+        assert list(iter_json_records(io.BytesIO(doc), chunk_size=64)) == [text, 1, text]
+        assert len(decodes) < 50
+
+
+class TestSearchParser:
+    """Test the supported openFDA search subset."""
+
+    def test_and_or_clauses(self):
+        clauses = parse_search('product_code:"DQY"+AND+applicant:"Acme"+OR+k_number:"K1"')
+        assert [[t[0] for t in c] for c in clauses] == [["product_code", "applicant"], ["k_number"]]
+
+    def test_range(self):
+        (clause,) = parse_search("decision_date:[20200101+TO+20241231]")
+        assert clause[0] == ("decision_date", "range", ("20200101", "20241231"))
+
+    def test_parentheses_unsupported(self):
+        assert parse_search('(product_code:"DQY" OR product_code:"OVE")') is None
+
+
+class TestBulkStoreQueries:
+    """Test openFDA-shaped answers from the local store."""
+
+    def test_status(self, store):
+        assert store.status()["510k"]["records"] == 3
+
+    def test_exact_lookup(self, store):
+        result = store.query("510k", {"search": 'k_number:"K241335"', "limit": "1"})
+        assert result["results"][0]["applicant"] == "Acme Medical Inc"
+        assert result["meta"]["results"]["total"] == 1
+
+    def test_phrase_and_range_with_sort(self, store):
+        result = store.query("510k", {
+            "search": 'applicant:"acme"+AND+decision_date:[20180101+TO+20241231]',
+            "limit": "10", "sort": "decision_date:desc"})
+        assert [r["k_number"] for r in result["results"]] == ["K241335", "K190001"]
+
+    def test_skip_and_limit(self, store):
+        result = store.query("510k", {"search": 'product_code:"DQY"', "limit": "1", "skip": "1",
+                                      "sort": "decision_date:desc"})
+        assert result["results"][0]["k_number"] == "K200123"
+        assert result["meta"]["results"]["total"] == 2
+
+    def test_list_field(self, store):
+        result = store.query("recall", {"search": 'k_numbers:"K200123"', "limit": "10"})
+        assert result["results"][0]["recall_status"] == "Terminated"
+
+    def test_count_nested_field(self, store):
+        result = store.query("event", {
+            "search": 'device.device_report_product_code:"DQY"', "count": "event_type.exact"})
+        assert result["results"] == [{"term": "Malfunction", "count": 2},
+                                     {"term": "Injury", "count": 1}]
+
+    def test_unindexed_field_unsupported(self, store):
+        assert store.query("510k", {"search": 'statement_or_summary:"x"'}) is None
+
+    def test_missing_dataset_unsupported(self, store):
+        assert store.query("pma", {"search": 'pma_number:"P1"'}) is None
+
+    def test_force_reingest_replaces(self, store, tmp_path):
+        store.delete_dataset("510k")
+        store.ingest_zip("510k", write_partition(tmp_path / "again.json.zip", CLEARANCES[:1]))
+        assert store.status()["510k"]["records"] == 1
+
+    def test_reingesting_a_partition_replaces_it(self, store, tmp_path):
+        store.ingest_zip("510k", tmp_path / "device-510k-0001.json.zip")
+        assert store.status()["510k"]["records"] == 3
+        result = store.query("510k", {"search": 'k_number:"K241335"'})
+        assert result["meta"]["results"]["total"] == 1
+
+    def test_interrupted_ingest_is_replaced(self, store, monkeypatch):
+        monkeypatch.setattr(fda_bulk_store, "INSERT_BATCH", 1)
+
+        def interrupted():
+            yield from CLEARANCES[:2]
+            raise KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            store.ingest_records("510k", interrupted(), "device-510k-0002.json.zip")
+        assert not store.is_ingested("510k", "device-510k-0002.json.zip")
+        store.ingest_records("510k", iter(CLEARANCES[:2]), "device-510k-0002.json.zip")
+        assert store.status()["510k"]["records"] == 5
+
+    def test_republished_partition_is_reingested(self, store, tmp_path, monkeypatch):
+        source = write_partition(tmp_path / "source.json.zip", CLEARANCES[:1])
+        monkeypatch.setattr(fda_bulk_store, "download_file", lambda url, dest: source)
+        url = "https://download.open.fda.gov/device/510k/device-510k-0001.json.zip"
+        log = []
+
+        assert fda_bulk_store.ingest_dataset(store, "510k", download_dir=tmp_path, keep_zips=True,
+                                             partitions=[(url, "20240101|1|1")]) == 1
+        assert fda_bulk_store.ingest_dataset(store, "510k", download_dir=tmp_path, keep_zips=True,
+                                             partitions=[(url, "20240101|1|1")],
+                                             progress=log.append) == 0
+        assert "already ingested" in log[0]
+        assert fda_bulk_store.ingest_dataset(store, "510k", download_dir=tmp_path, keep_zips=True,
+                                             partitions=[(url, "20240201|1|1")]) == 1
+        assert store.status()["510k"]["records"] == 1
+
+
+class TestClientDataModes:
+    """FDAClient local/offline modes answer convenience methods from the store."""
+
+    @pytest.fixture
+    def client(self, store, tmp_path, monkeypatch):
+        import fda_api_client
+
+        def no_network(*args, **kwargs):
+            raise AssertionError("network used")
+
+        monkeypatch.setattr(fda_api_client, "http_get", no_network)
+        return FDAClient(cache_dir=str(tmp_path / "cache"), data_mode="offline",
+                         local_store=store)
+
+    def test_convenience_methods(self, client):
+        assert client.get_510k("K241335")["results"][0]["product_code"] == "DQY"
+        assert client.get_classification("DQY")["results"][0]["device_class"] == "2"
+        assert len(client.get_recalls("DQY")["results"]) == 2
+        result = client.search_510k(applicant="Acme", year_start=2019, year_end=2024)
+        assert {r["k_number"] for r in result["results"]} == {"K241335", "K190001"}
+        counts = client.get_events("DQY", count="event_type.exact")
+        assert counts["results"][0] == {"term": "Malfunction", "count": 2}
+
+    def test_not_found_is_empty(self, client):
+        assert client.get_510k("K999999")["results"] == []
+
+    def test_offline_unsupported_degrades(self, client):
+        result = client.get_pma("P100001")
+        assert result["degraded"] is True
+        assert "Offline" in result["error"]
+
+    def test_local_mode_falls_back_to_network(self, store, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), data_mode="local",
+                           local_store=store)
+        client._fetch = lambda endpoint, params, key: {"results": ["network"]}
+        assert client.get_pma("P100001") == {"results": ["network"]}
+        assert client.get_510k("K241335")["results"][0]["k_number"] == "K241335"
+
+    def test_local_mode_empty_result_falls_back_to_network(self, store, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), data_mode="local",
+                           local_store=store)
+        client._fetch = lambda endpoint, params, key: {"results": [{"k_number": "K251234"}]}
+        assert client.get_510k("K251234")["results"] == [{"k_number": "K251234"}]
+        assert client.last_source == "network"
+
+    def test_local_mode_empty_count_stays_local(self, store, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), data_mode="local",
+                           local_store=store)
+        client._fetch = lambda endpoint, params, key: {"results": ["network"]}
+        assert client.get_events("ZZZ", count="event_type.exact")["results"] == []
+
+    def test_invalid_mode(self, tmp_path):
+        with pytest.raises(ValueError):
+            FDAClient(cache_dir=str(tmp_path / "cache"), data_mode="sometimes")
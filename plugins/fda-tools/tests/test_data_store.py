@@ -8,6 +8,7 @@ These tests do NOT require API access — they test data store logic only.
 import json
 import os
 import sys
+import threading
 from datetime import datetime, timezone, timedelta
 from unittest.mock import patch, MagicMock
 
@@ -43,6 +44,7 @@ from fda_data_store import (
     TTL_TIERS,
     get_projects_dir,
 )
+from fda_manifest_store import ManifestStore, SummaryStore
 
 
 # ============================================================
@@ -122,6 +124,70 @@ class TestManifestCRUD:
         assert "classification:QAS" in loaded["queries"]
 
 
+class TestManifestStore:
+    """Test the transactional manifest store behind load/save_manifest."""
+
+    def _entry(self, fetched_at=None):
+        return {"fetched_at": fetched_at or datetime.now(timezone.utc).isoformat(),
+                "ttl_hours": 24, "summary": {"total_recalls": 1}}
+
+    def test_concurrent_upserts_lose_nothing(self, tmp_path):
+        project_dir = tmp_path / "concurrent"
+
+        def writer(n):
+            store = ManifestStore(project_dir)
+            for i in range(20):
+                store.upsert(f"recalls:W{n}C{i}", self._entry(), product_code=f"W{n}")
+            store.export_json()
+            store.close()
+
+        ManifestStore(project_dir).close()
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        saved = json.loads((project_dir / "data_manifest.json").read_text())
+        assert len(saved["queries"]) == 120
+        assert sorted(saved["product_codes"]) == [f"W{n}" for n in range(6)]
+
+    def test_saving_old_snapshot_keeps_newer_entries(self, tmp_path):
+        project_dir = str(tmp_path / "snapshot")
+        snapshot = load_manifest(project_dir)
+        ManifestStore(project_dir).upsert("recalls:OVE", self._entry())
+        save_manifest(project_dir, snapshot)
+        assert "recalls:OVE" in load_manifest(project_dir)["queries"]
+
+    def test_external_json_edit_merged_newest_wins(self, tmp_path):
+        project_dir = tmp_path / "edited"
+        store = ManifestStore(project_dir)
+        store.upsert("recalls:OVE", self._entry())
+        store.export_json()
+        store.close()
+        data = json.loads((project_dir / "data_manifest.json").read_text())
+        data["queries"]["recalls:OVE"] = self._entry("2020-01-01T00:00:00+00:00")
+        data["queries"]["events:OVE"] = self._entry()
+        (project_dir / "data_manifest.json").write_text(json.dumps(data))
+        queries = load_manifest(str(project_dir))["queries"]
+        assert queries["recalls:OVE"]["fetched_at"] != "2020-01-01T00:00:00+00:00"
+        assert "events:OVE" in queries
+
+    def test_mark_all_stale(self, tmp_path):
+        store = ManifestStore(tmp_path / "stale")
+        store.upsert("recalls:OVE", self._entry())
+        assert store.mark_all_stale() == 1
+        assert is_expired(store.get("recalls:OVE"))
+
+    def test_clear_removes_database(self, tmp_path):
+        args = MagicMock()
+        args.project = "db_clear"
+        ManifestStore(tmp_path / "db_clear").upsert("recalls:OVE", self._entry())
+        with patch("fda_data_store.get_projects_dir", return_value=str(tmp_path)):
+            handle_clear(args)
+        assert not (tmp_path / "db_clear" / "data_manifest.db").exists()
+        assert load_manifest(str(tmp_path / "db_clear"))["queries"] == {}
+
+
 # ============================================================
 # TTL Expiration
 # ============================================================
@@ -1198,6 +1264,72 @@ class TestHandleQuery:
         assert "DEVICE:K241335" in output
 
 
+class TestPartialBatch:
+    """A batch_510k answer with failed chunks is never recorded."""
+
+    RECORD = {"k_number": "K241335", "applicant": "A", "device_name": "D1", "product_code": "OVE",
+              "decision_date": "20240315", "decision_code": "SESE"}
+
+    @pytest.fixture
+    def client(self):
+        client = MagicMock()
+        client.batch_510k.return_value = {
+            "meta": {"results": {"total": 1}},
+            "results": [self.RECORD],
+            "errors": [{"k_numbers": ["K200123"], "error": "HTTP 500: Server Error"}],
+            "partial": True,
+        }
+        client._cache_key.return_value = "batch123"
+        return client
+
+    def test_partial_without_entry_not_recorded(self, tmp_path, client):
+        from fda_data_store import fetch_query, open_store
+        store = open_store(str(tmp_path / "proj"))
+        status, summary, _, error = fetch_query(client, store, "510k-batch",
+                                                k_numbers=["K241335", "K200123"])
+        assert (status, error) == ("MISS", None)
+        assert summary["total_matches"] == 1
+        key = make_query_key("510k-batch", k_numbers=["K241335", "K200123"])
+        assert store.get(key) is None
+        assert store.summaries.latest(key) is None
+
+    def test_partial_serves_previous_entry_as_stale(self, tmp_path, client):
+        from fda_data_store import fetch_query, open_store
+        store = open_store(str(tmp_path / "proj"))
+        key = make_query_key("510k-batch", k_numbers=["K241335", "K200123"])
+        store.upsert(key, {"fetched_at": "2020-01-01T00:00:00+00:00", "ttl_hours": 168,
+                           "summary": {"total_matches": 2}})
+        status, summary, fetched_at, error = fetch_query(client, store, "510k-batch",
+                                                         k_numbers=["K241335", "K200123"])
+        assert (status, summary, error) == ("STALE", {"total_matches": 2}, None)
+        assert store.get(key)["fetched_at"] == fetched_at == "2020-01-01T00:00:00+00:00"
+
+
+class TestStaleWhileRevalidate:
+    """An expired API cache entry served while refreshing is never recorded."""
+
+    def test_stale_answer_keeps_original_fetch_time(self, tmp_path, fake_client):
+        import threading
+        import time as time_module
+        from fda_data_store import fetch_query, open_store
+
+        refreshed = threading.Event()
+        client = fake_client(lambda endpoint, params: refreshed.set(),
+                             stale_while_revalidate=True)
+        key = client._cache_key("recall", {"search": 'product_code:"OVE"', "limit": "100"})
+        fetched = time_module.time() - 2 * 86400
+        client._store.set(key, {"meta": {"results": {"total": 3}}, "results": []},
+                          endpoint="recall", cached_at=fetched)
+        store = open_store(str(tmp_path / "proj"))
+
+        status, summary, fetched_at, error = fetch_query(client, store, "recalls",
+                                                         product_code="OVE")
+        assert (status, summary["total_recalls"], error) == ("STALE", 3, None)
+        assert datetime.fromisoformat(fetched_at).timestamp() == pytest.approx(fetched)
+        assert store.get("recalls:OVE") is None
+        assert refreshed.wait(5)
+
+
 # ============================================================
 # Version Assertions
 # ============================================================
@@ -1250,3 +1382,204 @@ class TestCommandCount:
             with open(skill_md) as f:
                 content = f.read()
             assert "/fda:cache" in content
+
+
+class TestPrefetch:
+    """Test --prefetch warming of the API cache and project manifest."""
+
+    @pytest.fixture
+    def client(self, fake_client):
+        return fake_client(lambda endpoint, params: {
+            "meta": {"results": {"total": 1}},
+            "results": [{"product_code": "OVE", "device_name": "Fusion Device"}]})
+
+    def test_prefetch_from_query_json(self, capsys, tmp_path, client):
+        from fda_data_store import handle_prefetch, handle_query, PREFETCH_QUERIES
+        project_dir = tmp_path / "proj"
+        project_dir.mkdir()
+        (project_dir / "query.json").write_text(json.dumps(
+            {"product_code": "OVE", "filters": {"product_codes": ["OVE"]}}))
+        args = MagicMock(project="proj", product_codes=None, workers=2, refresh=False)
+        with patch("fda_data_store.get_projects_dir", return_value=str(tmp_path)):
+            with patch("fda_data_store.FDAClient", return_value=client):
+                handle_prefetch(args)
+                warm_fetches = client.fetches
+                query_args = MagicMock(project="proj", query="classification", product_code="OVE",
+                                       k_number=None, k_numbers=None, count=None, refresh=False)
+                handle_query(query_args)
+        output = capsys.readouterr().out
+        assert "PRODUCT_CODES:OVE" in output
+        assert f"MANIFEST_ENTRIES:{len(PREFETCH_QUERIES)}" in output
+        assert "Warm coverage:" in output
+        assert "CACHE_STATUS:HIT" in output.split("Warm coverage:")[1]
+        assert client.fetches == warm_fetches
+        manifest = json.loads((project_dir / "data_manifest.json").read_text())
+        assert "events:OVE:count:event_type.exact" in manifest["queries"]
+
+    def test_prefetch_without_codes(self, capsys, tmp_path, client):
+        from fda_data_store import handle_prefetch
+        args = MagicMock(project="empty", product_codes=None, workers=2, refresh=False)
+        with patch("fda_data_store.get_projects_dir", return_value=str(tmp_path)):
+            with patch("fda_data_store.FDAClient", return_value=client):
+                handle_prefetch(args)
+        assert "ERROR:no product codes" in capsys.readouterr().out
+
+
+class TestBatch:
+    """Test --batch JSONL query mode."""
+
+    @pytest.fixture
+    def client(self, fake_client):
+        return fake_client(lambda endpoint, params: {
+            "meta": {"results": {"total": 1}},
+            "results": [{"product_code": "OVE", "device_name": "Fusion Device",
+                         "device_class": "2"}]})
+
+    def _run(self, tmp_path, client, lines, capsys):
+        from fda_data_store import handle_batch
+        batch = tmp_path / "queries.jsonl"
+        batch.write_text("\n".join(lines) + "\n")
+        args = MagicMock(project="proj", batch=str(batch), workers=3)
+        with patch("fda_data_store.get_projects_dir", return_value=str(tmp_path)):
+            with patch("fda_data_store.FDAClient", return_value=client):
+                handle_batch(args)
+        captured = capsys.readouterr()
+        return [json.loads(line) for line in captured.out.splitlines()], captured.err
+
+    def test_results_in_input_order_with_status(self, capsys, tmp_path, client):
+        lines = [
+            json.dumps({"id": "a", "query": "classification", "product_code": "OVE"}),
+            json.dumps({"query": "events", "product_code": "OVE", "count": "event_type.exact"}),
+            json.dumps({"query": "510k-batch", "k_numbers": "k241335,K200123"}),
+        ]
+        results, err = self._run(tmp_path, client, lines, capsys)
+        assert [r["query"] for r in results] == ["classification", "events", "510k-batch"]
+        assert results[0]["id"] == "a"
+        assert results[0]["summary"]["device_class"] == "2"
+        assert results[2]["key"] == "510k-batch:K200123,K241335"
+        assert {r["cache_status"] for r in results} == {"MISS"}
+        assert "3 miss" in err
+        manifest = json.loads((tmp_path / "proj" / "data_manifest.json").read_text())
+        assert len(manifest["queries"]) == 3
+
+        results, err = self._run(tmp_path, client, lines, capsys)
+        assert {r["cache_status"] for r in results} == {"HIT"}
+        assert client.fetches == 3
+
+    def test_invalid_lines_reported(self, capsys, tmp_path, client):
+        lines = ["not json", json.dumps({"query": "510k"}), json.dumps({"query": "nope"})]
+        results, err = self._run(tmp_path, client, lines, capsys)
+        assert [r["line"] for r in results] == [1, 2, 3]
+        assert "k_number is required" in results[1]["error"]
+        assert all("error" in r for r in results)
+        assert "3 error" in err
+        assert client.fetches == 0
+
+
+class TestRefreshEager:
+    """Test --refresh-all --eager concurrent re-fetching."""
+
+    @pytest.fixture
+    def client(self, fake_client):
+        def respond(endpoint, params):
+            if endpoint == "enforcement":
+                return {"error": "HTTP 500", "degraded": True}
+            if endpoint == "classification":
+                return {"meta": {"results": {"total": 1}}, "results": [{"device_class": "2"}]}
+            records = [{"recall_status": "Ongoing", "device_class": "2"}] * (client.total - 2)
+            return {"meta": {"results": {"total": client.total}}, "results": records}
+
+        client = fake_client(respond)
+        client.total = 3
+        return client
+
+    def test_parse_query_key_roundtrip(self):
+        from fda_data_store import parse_query_key
+        for kwargs in ({"query_type": "events", "product_code": "OVE",
+                        "count_field": "event_type.exact"},
+                       {"query_type": "510k-batch", "k_numbers": ["K200123", "K241335"]},
+                       {"query_type": "510k", "k_number": "K241335"}):
+            key = make_query_key(**kwargs)
+            parsed = parse_query_key(key)
+            assert {k: v for k, v in parsed.items() if v} == kwargs
+        assert parse_query_key("510k_batch:K1") is None
+
+    def test_refetches_all_and_reports_changes(self, capsys, tmp_path, client):
+        from fda_data_store import fetch_query, handle_refresh_eager
+        store = ManifestStore(tmp_path / "proj")
+        for query_type in ("recalls", "classification"):
+            fetch_query(client, store, query_type, product_code="OVE")
+        store.upsert("enforcement:OVE", {"fetched_at": "2026-01-01T00:00:00+00:00",
+                                         "total_matches": 7, "summary": {"total_actions": 7}})
+        client.total = 4
+        args = MagicMock(project="proj", workers=2)
+        with patch("fda_data_store.get_projects_dir", return_value=str(tmp_path)):
+            with patch("fda_data_store.FDAClient", return_value=client):
+                handle_refresh_eager(args)
+        output = capsys.readouterr().out
+        assert "CHANGED:recalls:OVE total 3→4, returned 1→2, active_recalls 1→2" in output
+        assert "UNCHANGED:classification:OVE" in output
+        assert "FAILED:enforcement:OVE" in output
+        assert "(1 changed, 1 unchanged, 1 failed, 0 skipped)" in output
+        assert client.fetches == 5
+        manifest = json.loads((tmp_path / "proj" / "data_manifest.json").read_text())
+        assert manifest["queries"]["recalls:OVE"]["total_matches"] == 4
+        assert manifest["queries"]["enforcement:OVE"]["total_matches"] == 7
+
+
+class TestSharedSummaries:
+    """Test the cross-project summary store."""
+
+    @pytest.fixture
+    def client(self, fake_client):
+        client = fake_client(lambda endpoint, params: {
+            "meta": {"results": {"total": 1}},
+            "results": [{"device_name": "Fusion Device", "device_class": client.device_class}]})
+        client.device_class = "2"
+        return client
+
+    def _query(self, tmp_path, client, project, capsys):
+        from fda_data_store import handle_query
+        args = MagicMock(project=project, query="classification", product_code="OVE",
+                         k_number=None, k_numbers=None, count=None, refresh=False)
+        with patch("fda_data_store.get_projects_dir", return_value=str(tmp_path)):
+            with patch("fda_data_store.FDAClient", return_value=client):
+                handle_query(args)
+        return capsys.readouterr().out
+
+    def test_other_projects_reuse_the_fetch(self, capsys, tmp_path, client):
+        assert "CACHE_STATUS:MISS" in self._query(tmp_path, client, "a", capsys)
+        output = self._query(tmp_path, client, "b", capsys)
+        assert "CACHE_STATUS:HIT" in output and "DEVICE_CLASS:2" in output
+        assert client.fetches == 1
+        entry = load_manifest(str(tmp_path / "b"))["queries"]["classification:OVE"]
+        assert entry["summary"]["device_class"] == "2" and entry["summary_ref"]
+        summaries = SummaryStore(tmp_path / ".summaries.db")
+        assert summaries.stats() == {"keys": 1, "summaries": 1}
+
+    def test_refresh_in_one_project_visible_to_all(self, capsys, tmp_path, client):
+        from fda_data_store import handle_refresh_eager
+        self._query(tmp_path, client, "a", capsys)
+        self._query(tmp_path, client, "b", capsys)
+        client.device_class = "3"
+        with patch("fda_data_store.get_projects_dir", return_value=str(tmp_path)):
+            with patch("fda_data_store.FDAClient", return_value=client):
+                handle_refresh_eager(MagicMock(project="a", workers=1))
+        output = self._query(tmp_path, client, "b", capsys)
+        assert "CACHE_STATUS:HIT" in output and "DEVICE_CLASS:3" in output
+        assert client.fetches == 2
+
+    def test_lost_summary_is_a_miss(self, capsys, tmp_path, client):
+        self._query(tmp_path, client, "a", capsys)
+        for path in tmp_path.glob(".summaries.db*"):
+            path.unlink()
+        output = self._query(tmp_path, client, "a", capsys)
+        assert "CACHE_STATUS:MISS" in output and "DEVICE_CLASS:2" in output
+        assert client.fetches == 1  # Rebuilt from the API cache
+
+    def test_refresh_all_forces_a_miss(self, capsys, tmp_path, client):
+        self._query(tmp_path, client, "a", capsys)
+        with patch("fda_data_store.get_projects_dir", return_value=str(tmp_path)):
+            handle_refresh_all(MagicMock(project="a"))
+        assert "CACHE_STATUS:MISS" in self._query(tmp_path, client, "a", capsys)
+        assert client.fetches == 1  # Marking stale leaves the API cache alone
@@ -0,0 +1,132 @@
+"""Tests for K-number request coalescing (fda_dataloader.py).
+
+FDAClient._fetch is replaced with a fake that answers OR queries from a
+fixed record set, so batching and cache write-back are tested offline.
+"""
+
+import asyncio
+import os
+import re
+import sys
+import threading
+
+import pytest
+
+# Add scripts directory to path for import
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from fda_api_client import FDAClient
+from fda_async_client import AsyncFDAClient
+from fda_dataloader import KNumberLoader, normalize_k_number
+
+RECORDS = {
+    "K241335": {"k_number": "K241335", "device_name": "Catheter"},
+    "K200123": {"k_number": "K200123", "device_name": "Stent"},
+    "K190001": {"k_number": "K190001", "device_name": "Guidewire"},
+}
+
+
+class AllowLimiter:
+    def acquire(self, timeout=None):
+        return True
+
+
+@pytest.fixture
+def client(fake_client):
+    lock = threading.Lock()
+
+    def respond(endpoint, params):
+        with lock:
+            client.searches.append(params["search"])
+        wanted = re.findall(r'k_number:"(K\d+)"', params["search"])
+        results = [RECORDS[k] for k in wanted if k in RECORDS]
+        return {"meta": {"results": {"total": len(results)}}, "results": results}
+
+    client = fake_client(respond, rate_limiter=AllowLimiter())
+    client.searches = []
+    return client
+
+
+class TestKNumberLoader:
+    """Test batching, fan-out and cache write-back."""
+
+    def test_load_many_sends_one_query(self, client):
+        results = KNumberLoader(client).load_many(["K241335", "k200123", "K999999"])
+        assert len(client.searches) == 1
+        assert "OR" in client.searches[0]
+        assert results["K241335"]["results"][0]["device_name"] == "Catheter"
+        assert results["K200123"]["results"][0]["device_name"] == "Stent"
+        assert results["K999999"]["results"] == []
+        assert results["K999999"]["meta"]["results"]["total"] == 0
+
+    def test_results_written_to_single_key_cache(self, client):
+        KNumberLoader(client).load_many(["K241335", "K999999"])
+        assert client.get_510k("K241335")["results"][0]["k_number"] == "K241335"
+        assert client.get_510k("K999999")["results"] == []
+        assert len(client.searches) == 1
+
+    def test_concurrent_loads_coalesce(self, client):
+        loader = KNumberLoader(client, window=0.2)
+        results = {}
+
+        def worker(k):
+            results[k] = loader.load(k)
+
+        threads = [threading.Thread(target=worker, args=(k,)) for k in RECORDS]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert loader.batches_sent == 1
+        assert len(client.searches) == 1
+        assert {k: r["results"][0]["k_number"] for k, r in results.items()} == {k: k for k in RECORDS}
+
+    def test_batch_size_splits_queries(self, client):
+        loader = KNumberLoader(client, batch_size=2)
+        loader.load_many(list(RECORDS))
+        assert loader.batches_sent == 2
+
+    def test_cached_keys_not_requested(self, client):
+        client.get_510k("K241335")
+        loader = KNumberLoader(client)
+        loader.load_many(["K241335"])
+        assert loader.batches_sent == 0
+
+    def test_degraded_batch_shared_and_not_cached(self, client, monkeypatch):
+        monkeypatch.setattr(client, "_fetch",
+                            lambda e, p, k: {"error": "HTTP 500", "degraded": True})
+        results = KNumberLoader(client).load_many(["K241335", "K200123"])
+        assert all(r["degraded"] for r in results.values())
+        key = client._cache_key("510k", client._510k_params("K241335"))
+        assert client._get_cached(key) is None
+
+    def test_partial_batch_failure_is_per_key(self, client, monkeypatch):
+        def chunked_fetch(endpoint, params, key):
+            if "K200123" in params["search"]:
+                return {"error": "HTTP 500", "degraded": True}
+            data = {"meta": {"results": {"total": 1}}, "results": [RECORDS["K241335"]]}
+            client._set_cached(key, data, endpoint)
+            return data
+
+        monkeypatch.setattr(client, "_fetch", chunked_fetch)
+        monkeypatch.setattr(client, "batch_510k",
+                            lambda ks, **kw: FDAClient.batch_510k(client, ks, max_ids=1))
+        results = KNumberLoader(client).load_many(["K241335", "K200123"])
+        assert results["K241335"]["results"][0]["device_name"] == "Catheter"
+        assert results["K200123"]["degraded"] is True
+
+    def test_normalize_k_number(self):
+        assert normalize_k_number(" k241335 ") == "K241335"
+        assert normalize_k_number("241335") == "K241335"
+
+
+class TestAsyncCoalescing:
+    """AsyncFDAClient(coalesce=True) batches gathered get_510k() calls."""
+
+    def test_gather_uses_one_query(self, client):
+        async def run():
+            async with AsyncFDAClient(client, coalesce=True) as ac:
+                return await asyncio.gather(*(ac.get_510k(k) for k in RECORDS))
+
+        results = asyncio.run(run())
+        assert [r["results"][0]["k_number"] for r in results] == list(RECORDS)
+        assert len(client.searches) == 1
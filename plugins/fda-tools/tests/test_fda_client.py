@@ -4,6 +4,7 @@ Validates device number routing, search method signatures, and offline behavior.
 These tests do NOT require API access — they test client logic only.
 """
 
+import json
 import os
 import sys
 import pytest
@@ -162,3 +163,753 @@ class TestCacheManagement:
         count = client.clear_cache()
         assert count == 2
         assert client.cache_stats()["total_files"] == 0
+
+
+class TestCacheBackends:
+    """Test the SQLite and per-file cache backends and migration."""
+
+    def test_sqlite_is_default_backend(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"))
+        assert client.cache_stats()["backend"] == "sqlite"
+        assert (tmp_path / "cache" / "api_cache.db").exists()
+
+    def test_files_backend_writes_json_per_key(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), cache_backend="files")
+        client._set_cached("abc", {"results": []})
+        assert (tmp_path / "cache" / "abc.json").exists()
+        assert client._get_cached("abc") == {"results": []}
+
+    def test_backend_from_env(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("FDA_API_CACHE_BACKEND", "files")
+        client = FDAClient(cache_dir=str(tmp_path / "cache"))
+        assert client.cache_stats()["backend"] == "files"
+
+    def test_unknown_backend_raises(self, tmp_path):
+        with pytest.raises(ValueError):
+            FDAClient(cache_dir=str(tmp_path / "cache"), cache_backend="redis")
+
+    def test_unknown_backend_from_env_falls_back(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.setenv("FDA_API_CACHE_BACKEND", "redis")
+        monkeypatch.setenv("HOME", str(tmp_path))  # No settings file
+        client = FDAClient(cache_dir=str(tmp_path / "cache"))
+        assert client.cache_stats()["backend"] == "sqlite"
+        assert "ignoring unknown FDA_API_CACHE_BACKEND='redis'" in capsys.readouterr().err
+
+    def test_expired_entry_not_returned(self, tmp_path):
+        import fda_api_client
+        client = FDAClient(cache_dir=str(tmp_path / "cache"))
+        old = fda_api_client.time.time() - fda_api_client.CACHE_TTL - 10
+        client._store.set("old", {"results": [1]}, endpoint="510k", cached_at=old)
+        client._set_cached("new", {"results": [2]}, "510k")
+        stats = client.cache_stats()
+        assert stats["valid"] == 1
+        assert stats["expired"] == 1
+        assert stats["by_endpoint"] == {"510k": 2}
+        assert client._get_cached("old") is None
+
+    def test_clear_expired_only_removes_old_entries(self, tmp_path):
+        import fda_api_client
+        client = FDAClient(cache_dir=str(tmp_path / "cache"))
+        old = fda_api_client.time.time() - fda_api_client.CACHE_TTL - 10
+        client._store.set("old", {"results": []}, cached_at=old)
+        client._set_cached("new", {"results": []})
+        assert client.clear_cache("expired") == 1
+        assert client._get_cached("new") is not None
+
+    def test_legacy_files_migrated_on_first_open(self, tmp_path):
+        cache_dir = tmp_path / "cache"
+        legacy = FDAClient(cache_dir=str(cache_dir), cache_backend="files")
+        legacy._set_cached("k1", {"results": [{"k_number": "K1"}]})
+        legacy._set_cached("k2", {"results": [{"k_number": "K2"}]})
+        (cache_dir / "broken.json").write_text("{not json")
+
+        client = FDAClient(cache_dir=str(cache_dir))
+        assert client.cache_stats()["total_entries"] == 2
+        assert client._get_cached("k1")["results"][0]["k_number"] == "K1"
+        assert not (cache_dir / "k1.json").exists()
+        assert (cache_dir / "broken.json").exists()
+
+    def test_migrate_cache_is_idempotent(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"))
+        client._set_cached("k1", {"results": []})
+        assert client.migrate_cache() == (0, 0)
+        assert client.cache_stats()["total_entries"] == 1
+
+    def test_two_clients_share_sqlite_cache(self, tmp_path):
+        a = FDAClient(cache_dir=str(tmp_path / "cache"))
+        b = FDAClient(cache_dir=str(tmp_path / "cache"))
+        a._set_cached("shared", {"results": ["x"]}, "classification")
+        assert b._get_cached("shared") == {"results": ["x"]}
+
+
+class TestCacheCompaction:
+    """Test compressed payloads, the size cap and compaction."""
+
+    BIG = {"results": [{"k_number": f"K{n:06d}", "statement": "substantially equivalent " * 20}
+                       for n in range(20)]}
+
+    def _store(self, tmp_path, **kwargs):
+        from fda_api_cache import SQLiteCacheStore
+        return SQLiteCacheStore(tmp_path / "cache", **kwargs)
+
+    def test_large_payloads_compressed(self, tmp_path):
+        store = self._store(tmp_path, codec="zlib")
+        store.set("big", self.BIG, "510k")
+        store.set("small", {"results": []}, "510k")
+        assert store.get("big")[1] == self.BIG
+        assert store.get("small")[1] == {"results": []}
+        stats = store.stats(3600)
+        assert stats["codec"] == "zlib"
+        assert stats["total_size_bytes"] < stats["raw_size_bytes"] / 5
+
+    def test_codec_switch_keeps_old_rows_readable(self, tmp_path):
+        self._store(tmp_path, codec="zlib").set("big", self.BIG)
+        store = self._store(tmp_path, codec="none")
+        assert store.get("big")[1] == self.BIG
+        assert store.recompress() == 1
+        assert store.stats(3600)["total_size_bytes"] == store.stats(3600)["raw_size_bytes"]
+
+    def test_legacy_schema_upgraded(self, tmp_path):
+        import sqlite3
+        cache_dir = tmp_path / "cache"
+        cache_dir.mkdir()
+        conn = sqlite3.connect(str(cache_dir / "api_cache.db"))
+        conn.executescript(
+            "CREATE TABLE responses (cache_key TEXT PRIMARY KEY, endpoint TEXT, "
+            "cached_at REAL NOT NULL, size INTEGER NOT NULL DEFAULT 0, data TEXT NOT NULL);"
+        )
+        conn.execute("INSERT INTO responses VALUES ('k', '510k', 5, 2, '[]')")
+        conn.commit()
+        conn.close()
+        store = self._store(tmp_path)
+        assert store.get("k") == (5, [])
+        store.set("new", self.BIG)
+        assert store.get("new")[1] == self.BIG
+
+    def test_lru_eviction_under_cap(self, tmp_path):
+        import fda_api_cache
+        store = self._store(tmp_path, codec="none", max_bytes=0)
+        size = len(json.dumps(self.BIG))
+        for n in range(10):
+            store.set(f"k{n}", self.BIG)
+        store.get("k0")
+        store.close()
+        store = self._store(tmp_path, codec="none", max_bytes=size * 5)
+        evicted = store.enforce_size_cap()
+        assert evicted == 10 - int(5 * fda_api_cache.EVICT_LOW_WATERMARK)
+        assert store.get("k0") is not None
+        assert store.get("k1") is None
+        assert store.stats(3600)["total_size_bytes"] <= size * 5
+
+    def test_lfu_keeps_frequently_read_entries(self, tmp_path):
+        store = self._store(tmp_path, codec="none", max_bytes=0)
+        for n in range(4):
+            store.set(f"k{n}", self.BIG)
+        for _ in range(3):
+            store.get("k3")
+        store.close()
+        size = len(json.dumps(self.BIG))
+        store = self._store(tmp_path, codec="none", max_bytes=size * 2, eviction="lfu")
+        store.enforce_size_cap()
+        assert store.get("k3") is not None
+
+    def test_writes_enforce_cap(self, tmp_path):
+        size = len(json.dumps(self.BIG))
+        store = self._store(tmp_path, codec="none", max_bytes=size * 3)
+        for n in range(10):
+            store.set(f"k{n}", self.BIG)
+        assert store.stats(3600)["total_size_bytes"] <= size * 3
+        assert store.get("k9") is not None
+
+    def test_set_many_checks_cap_once(self, tmp_path, monkeypatch):
+        size = len(json.dumps(self.BIG))
+        store = self._store(tmp_path, codec="none", max_bytes=size * 3)
+        checks = []
+        enforce = store.enforce_size_cap
+        monkeypatch.setattr(store, "enforce_size_cap", lambda: checks.append(enforce()))
+        store.set_many([(f"k{n}", self.BIG) for n in range(10)], "510k")
+        assert len(checks) == 1
+        assert store.stats(3600)["total_size_bytes"] <= size * 3
+        assert store.get("k9")[1] == self.BIG
+
+    def test_compact_shrinks_file(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), cache_compression="none",
+                           cache_max_mb=0)
+        for n in range(200):
+            client._set_cached(f"k{n}", self.BIG, "510k")
+        client._store.close()
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), cache_compression="zlib",
+                           cache_max_mb=0)
+        result = client.compact_cache()
+        assert result["rewritten"] == 200
+        assert result["vacuumed"] is True
+        assert result["bytes_after"] < result["bytes_before"] / 3
+        assert client._get_cached("k7") == self.BIG
+
+    def test_background_compaction_runs_when_due(self, tmp_path):
+        store = self._store(tmp_path)
+        assert store.maybe_compact_async() is None  # new cache: clock starts now
+        with store._lock:
+            store._set_meta("last_compacted", 0)
+        thread = store.maybe_compact_async()
+        assert thread is not None
+        thread.join(10)
+        assert store.maybe_compact_async() is None
+
+    def test_limits_from_env(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("FDA_API_CACHE_MAX_MB", "2")
+        monkeypatch.setenv("FDA_API_CACHE_EVICTION", "lfu")
+        monkeypatch.setenv("FDA_API_CACHE_COMPRESSION", "zlib")
+        stats = FDAClient(cache_dir=str(tmp_path / "cache")).cache_stats()
+        assert (stats["max_size_mb"], stats["eviction"], stats["compression"]) == (2, "lfu", "zlib")
+
+    def test_files_backend_cap(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), cache_backend="files",
+                           cache_max_mb=0)
+        for n in range(5):
+            client._set_cached(f"k{n}", self.BIG)
+        size = (tmp_path / "cache" / "k0.json").stat().st_size
+        client._store.max_bytes = size * 2
+        assert client.compact_cache()["evicted"] == 4
+
+
+class TestMemoryLRUTier:
+    """Test the in-process LRU tier in front of the disk cache."""
+
+    def test_repeat_lookup_served_from_memory(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"))
+        client._set_cached("k", {"results": [1]})
+        client._store.get = lambda key: pytest.fail("disk read on memory hit")
+        assert client._get_cached("k") == {"results": [1]}
+        assert client.cache_stats()["memory"]["hits"] == 1
+
+    def test_disk_hit_promoted_to_memory(self, tmp_path):
+        writer = FDAClient(cache_dir=str(tmp_path / "cache"))
+        writer._set_cached("k", {"results": [1]})
+        reader = FDAClient(cache_dir=str(tmp_path / "cache"))
+        assert reader._get_cached("k") is not None
+        assert reader._get_cached("k") is not None
+        mem = reader.cache_stats()["memory"]
+        assert mem["misses"] == 1
+        assert mem["hits"] == 1
+        assert mem["entries"] == 1
+
+    def test_evicts_by_entry_count(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), memory_cache_entries=2)
+        for key in ("a", "b", "c"):
+            client._set_cached(key, {"results": [key]})
+        mem = client.cache_stats()["memory"]
+        assert mem["entries"] == 2
+        assert mem["evictions"] == 1
+        # Evicted entry still comes back from disk
+        assert client._get_cached("a") == {"results": ["a"]}
+
+    def test_evicts_by_bytes(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), memory_cache_bytes=100)
+        client._set_cached("a", {"results": ["x" * 40]})
+        client._set_cached("b", {"results": ["y" * 40]})
+        mem = client.cache_stats()["memory"]
+        assert mem["entries"] == 1
+        assert mem["bytes"] <= 100
+
+    def test_lru_order_respected(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), memory_cache_entries=2)
+        client._set_cached("a", {"v": 1})
+        client._set_cached("b", {"v": 2})
+        client._get_cached("a")  # a becomes most recent
+        client._set_cached("c", {"v": 3})  # evicts b
+        assert "b" not in client._memory._entries
+        assert "a" in client._memory._entries
+
+    def test_disabled_memory_tier(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), memory_cache_entries=0)
+        client._set_cached("a", {"v": 1})
+        assert client._get_cached("a") == {"v": 1}
+        assert client.cache_stats()["memory"]["entries"] == 0
+
+    def test_clear_cache_empties_memory(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"))
+        client._set_cached("a", {"v": 1})
+        client.clear_cache()
+        assert client._get_cached("a") is None
+        assert client.cache_stats()["memory"]["entries"] == 0
+
+
+class TestRecordCache:
+    """Test per-record caching from multi-record responses."""
+
+    RECORDS = {
+        "K241335": {"k_number": "K241335", "device_name": "Catheter"},
+        "K200123": {"k_number": "K200123", "device_name": "Stent"},
+    }
+
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        import fda_api_client
+        from fda_http import HTTPResult
+
+        client = FDAClient(cache_dir=str(tmp_path / "cache"),
+                           rate_limiter=type("L", (), {"acquire": lambda self: True})())
+        client.urls = []
+
+        def fake_http_get(url, headers=None, timeout=15):
+            client.urls.append(url)
+            if "/pma.json" in url:
+                results = [{"pma_number": "P100001", "supplement_number": ""},
+                           {"pma_number": "P100001", "supplement_number": "S001"}]
+            elif "/udi.json" in url:
+                results = [{"identifiers": [{"id": "00812345678901", "type": "Primary"}]}]
+            else:
+                results = [r for k, r in self.RECORDS.items() if k in url]
+                if "product_code" in url:
+                    results = list(self.RECORDS.values())
+            body = json.dumps({"meta": {"results": {"total": len(results)}}, "results": results})
+            return HTTPResult(200, "OK", {}, body.encode(), len(body))
+
+        monkeypatch.setattr(fda_api_client, "http_get", fake_http_get)
+        return client
+
+    def test_clearances_fill_single_lookups(self, client):
+        client.get_clearances("OVE")
+        assert client.get_510k("K200123")["results"][0]["device_name"] == "Stent"
+        assert len(client.urls) == 1
+
+    def test_batch_served_from_records_in_request_order(self, client):
+        client.batch_510k(["K241335", "K200123"])
+        result = client.batch_510k(["K200123", "K241335"])
+        assert [r["k_number"] for r in result["results"]] == ["K200123", "K241335"]
+        assert len(client.urls) == 1
+
+    def test_batch_fetches_only_missing(self, client):
+        client.get_510k("K241335")
+        client.batch_510k(["K241335", "K200123"])
+        assert "K241335" not in client.urls[-1]
+        assert "K200123" in client.urls[-1]
+
+    def test_batch_caches_misses(self, client):
+        client.batch_510k(["K241335", "K999999"])
+        assert client.get_510k("K999999")["results"] == []
+        assert len(client.urls) == 1
+
+    def test_pma_original_approval_cached(self, client):
+        client.get_pma_by_product_code("OVE")
+        assert client.get_pma("P100001")["results"][0]["supplement_number"] == ""
+        assert len(client.urls) == 1
+
+    def test_udi_di_cached(self, client):
+        client.get_udi(product_code="OVE")
+        assert client.get_udi(di="00812345678901")["results"]
+        assert len(client.urls) == 1
+
+    def test_count_queries_not_decomposed(self, client):
+        written = client._cache_records("510k", {"search": "x", "count": "applicant"},
+                                        {"results": [{"term": "A", "count": 1}]})
+        assert written == 0
+
+    def test_records_written_to_disk_tier_only(self, client):
+        client.get_clearances("OVE")
+        record_key = client._cache_key("510k", client._510k_params("K200123"))
+        assert client._memory.get(record_key) is None
+        assert client._store.get(record_key) is not None
+
+    def test_bypass_cache_refetches_and_rewrites(self, client):
+        client.get_510k("K241335")
+        self.RECORDS["K241335"]["device_name"] = "Catheter v2"
+        try:
+            with client.bypass_cache():
+                assert client.get_510k("K241335")["results"][0]["device_name"] == "Catheter v2"
+        finally:
+            self.RECORDS["K241335"]["device_name"] = "Catheter"
+        assert client.get_510k("K241335")["results"][0]["device_name"] == "Catheter v2"
+        assert len(client.urls) == 2
+
+    def test_batch_bypass_cache_refetches_cached_records(self, client):
+        client.batch_510k(["K241335", "K200123"])
+        with client.bypass_cache():
+            client.batch_510k(["K241335", "K200123"], max_ids=1)
+        assert len(client.urls) == 3
+        assert not client.bypassing_cache
+
+
+class TestPagination:
+    """Test iter_* generators page with skip/search_after and prefetch."""
+
+    TOTAL = 25
+
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        import fda_api_client
+        from fda_http import HTTPResult
+        from urllib.parse import parse_qs, urlsplit
+
+        client = FDAClient(cache_dir=str(tmp_path / "cache"),
+                           rate_limiter=type("L", (), {"acquire": lambda self: True})())
+        client.queries = []
+
+        def fake_http_get(url, headers=None, timeout=15):
+            query = {k: v[0] for k, v in parse_qs(urlsplit(url).query).items()}
+            client.queries.append(query)
+            limit = int(query["limit"])
+            start = int(query.get("skip", 0))
+            if "search_after" in query:
+                start = int(query["search_after"])
+            results = [{"k_number": f"K{i:06d}"} for i in range(start, min(start + limit, self.TOTAL))]
+            body = json.dumps({"meta": {"results": {"total": self.TOTAL}}, "results": results})
+            headers = {}
+            if client.link_paging and start + limit < self.TOTAL:
+                headers["Link"] = f'<https://api.fda.gov/device/510k.json?search_after={start + limit}>; rel="next"'
+            return HTTPResult(200, "OK", headers, body.encode(), len(body))
+
+        client.link_paging = False
+        monkeypatch.setattr(fda_api_client, "http_get", fake_http_get)
+        return client
+
+    def test_iterates_all_pages(self, client):
+        records = list(client.iter_clearances("DQY", page_size=10))
+        assert [r["k_number"] for r in records] == [f"K{i:06d}" for i in range(self.TOTAL)]
+        assert [q.get("skip") for q in client.queries] == [None, "10", "20"]
+        assert client.last_total == self.TOTAL
+
+    def test_max_records_stops_early(self, client):
+        records = list(client.iter_clearances("DQY", page_size=10, max_records=12))
+        assert len(records) == 12
+        assert len(client.queries) == 2
+
+    def test_without_prefetch_is_lazy(self, client):
+        it = client.iter_results("510k", {"search": "x"}, page_size=10, prefetch=False)
+        next(it)
+        assert len(client.queries) == 1
+
+    def test_search_after_from_link_header(self, client):
+        client.link_paging = True
+        records = list(client.iter_events("DQY", page_size=10))
+        assert len(records) == self.TOTAL
+        assert [q.get("search_after") for q in client.queries] == [None, "10", "20"]
+
+    def test_pages_are_cached(self, client):
+        list(client.iter_clearances("DQY", page_size=10))
+        list(client.iter_clearances("DQY", page_size=10))
+        assert len(client.queries) == 3
+
+    def test_count_queries_rejected(self, client):
+        with pytest.raises(ValueError):
+            list(client.iter_results("event", {"search": "x", "count": "event_type.exact"}))
+
+    def test_degraded_page_stops_iteration(self, client, monkeypatch):
+        monkeypatch.setattr(client, "_request", lambda e, p: {"error": "HTTP 500", "degraded": True})
+        assert list(client.iter_510k(product_code="DQY")) == []
+        assert client.last_page_error["degraded"] is True
+
+    def test_peer_comparison_streams_capped_cohort(self, client, monkeypatch):
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+        import fda_enrichment
+
+        monkeypatch.setattr(fda_enrichment, "MAX_PEER_COHORT", 12)
+        enricher = fda_enrichment.FDAEnrichment(client=client)
+        monkeypatch.setattr(enricher, "get_maude_events_by_product_code",
+                            lambda k: {"maude_productcode_5y": int(k[1:]) + 1})
+        result = enricher.analyze_maude_peer_comparison("DQY", 5)
+        assert result["peer_cohort_size"] == 12
+        assert "[first 12 of 25 peers analyzed]" in result["peer_comparison_note"]
+
+
+class TestTTLPolicy:
+    """Test per-endpoint TTLs, negative TTL and stale-while-revalidate."""
+
+    def _age(self, client, key, seconds, data, endpoint):
+        import fda_api_client
+        client._memory.delete(key)
+        client._store.set(key, data, endpoint=endpoint,
+                          cached_at=fda_api_client.time.time() - seconds)
+
+    def test_safety_endpoints_expire_after_a_day(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"))
+        data = {"results": [{"recall_status": "Open"}]}
+        self._age(client, "r", 25 * 3600, data, "recall")
+        self._age(client, "c", 25 * 3600, data, "classification")
+        assert client._get_cached("r", "recall") is None
+        assert client._get_cached("c", "classification") == data
+
+    def test_negative_results_use_short_ttl(self, tmp_path):
+        import fda_api_client
+        client = FDAClient(cache_dir=str(tmp_path / "cache"))
+        self._age(client, "empty", fda_api_client.NEGATIVE_TTL + 60,
+                  {"results": [], "meta": {"results": {"total": 0}}}, "510k")
+        assert client._get_cached("empty", "510k") is None
+
+    def test_endpoint_ttl_override(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"), endpoint_ttls={"510k": 60})
+        self._age(client, "k", 120, {"results": [1]}, "510k")
+        assert client._get_cached("k", "510k") is None
+
+    def test_stale_served_and_refreshed_in_background(self, fake_client):
+        import threading
+        import time
+        refreshed = threading.Event()
+
+        def respond(endpoint, params):
+            refreshed.set()
+            return {"results": ["new"]}
+
+        client = fake_client(respond, stale_while_revalidate=True)
+        params = {"search": 'product_code:"OVE"', "limit": "10"}
+        key = client._cache_key("recall", params)
+        self._age(client, key, 2 * 86400, {"results": ["old"]}, "recall")
+        assert client.get_recalls("OVE") == {"results": ["old"]}
+        assert all(t.daemon for t in threading.enumerate() if t.name == "openfda-refresh")
+        assert refreshed.wait(5)
+        for _ in range(50):  # The cache write follows respond()
+            if not client._refreshing:
+                break
+            time.sleep(0.1)
+        assert client.get_recalls("OVE") == {"results": ["new"]}
+        assert client.cache_stats()["session_stale"] == 1
+
+    def test_expired_without_swr_refetches(self, fake_client):
+        client = fake_client(lambda endpoint, params: {"results": ["new"]},
+                             stale_while_revalidate=False)
+        params = {"search": 'product_code:"OVE"', "limit": "10"}
+        key = client._cache_key("recall", params)
+        self._age(client, key, 2 * 86400, {"results": ["old"]}, "recall")
+        assert client.get_recalls("OVE") == {"results": ["new"]}
+
+    def test_stats_use_endpoint_ttls(self, tmp_path):
+        client = FDAClient(cache_dir=str(tmp_path / "cache"))
+        self._age(client, "r", 25 * 3600, {"results": [1]}, "recall")
+        self._age(client, "c", 25 * 3600, {"results": [1]}, "classification")
+        stats = client.cache_stats()
+        assert (stats["valid"], stats["expired"]) == (1, 1)
+        assert client.clear_cache("expired") == 1
+
+
+class TestSingleFlight:
+    """Test cross-process deduplication of identical cache misses."""
+
+    PARAMS = {"search": 'product_code:"DQY"', "limit": "1"}
+
+    @staticmethod
+    def _client(fake_client, **kwargs):
+        return fake_client(lambda endpoint, params: {"results": ["fetched"]}, **kwargs)
+
+    def test_waiter_reads_holder_result(self, tmp_path, fake_client):
+        import threading
+        from fda_api_cache import FetchLeases
+
+        client = self._client(fake_client)
+        other = FDAClient(cache_dir=str(tmp_path / "cache"))
+        key = client._cache_key("classification", self.PARAMS)
+        leases = FetchLeases(tmp_path / "cache")
+        assert leases.acquire(key)
+
+        def holder_finishes():
+            other._set_cached(key, {"results": ["from other process"]}, "classification")
+            leases.release(key)
+
+        threading.Timer(0.2, holder_finishes).start()
+        result = client._request("classification", dict(self.PARAMS))
+        assert result == {"results": ["from other process"]}
+        assert client.fetches == 0
+
+    def test_failed_holder_lets_waiter_fetch(self, tmp_path, fake_client):
+        import threading
+        from fda_api_cache import FetchLeases
+
+        client = self._client(fake_client)
+        key = client._cache_key("classification", self.PARAMS)
+        leases = FetchLeases(tmp_path / "cache")
+        assert leases.acquire(key)
+        threading.Timer(0.1, leases.release, args=(key,)).start()
+        assert client._request("classification", dict(self.PARAMS)) == {"results": ["fetched"]}
+        assert client.fetches == 1
+
+    def test_expired_lease_is_broken(self, tmp_path, fake_client):
+        from fda_api_cache import FetchLeases
+
+        client = self._client(fake_client, lease_timeout=5)
+        key = client._cache_key("classification", self.PARAMS)
+        assert FetchLeases(tmp_path / "cache").acquire(key)
+        lock = tmp_path / "cache" / ".leases" / f"{key}.lock"
+        os.utime(lock, (0, 0))
+        assert client._request("classification", dict(self.PARAMS)) == {"results": ["fetched"]}
+        assert not lock.exists()
+
+    def test_dead_holder_lease_is_broken(self, tmp_path, fake_client):
+        import socket
+        import subprocess
+
+        client = self._client(fake_client)
+        key = client._cache_key("classification", self.PARAMS)
+        proc = subprocess.Popen([sys.executable, "-c", "pass"])
+        proc.wait()
+        lock = tmp_path / "cache" / ".leases" / f"{key}.lock"
+        lock.write_text(f"{socket.gethostname()} {proc.pid} 0")
+        assert client._request("classification", dict(self.PARAMS)) == {"results": ["fetched"]}
+
+    def test_parallel_processes_fetch_once(self, tmp_path):
+        import subprocess
+
+        scripts = os.path.join(os.path.dirname(__file__), "..", "scripts")
+        log = tmp_path / "fetches.log"
+        worker = f"""
+import sys, time
+sys.path.insert(0, {scripts!r})
+from fda_api_client import FDAClient
+
+client = FDAClient(cache_dir={str(tmp_path / "cache")!r})
+
+def fetch(endpoint, params, key):
+    with open({str(log)!r}, "a") as f:
+        f.write("fetch\\n")
+    time.sleep(0.5)
+    data = {{"results": ["shared"]}}
+    client._set_cached(key, data, endpoint)
+    return data
+
+client._fetch = fetch
+print(client._request("recall", {{"search": 'product_code:"DQY"', "limit": "10"}})["results"][0])
+"""
+        FDAClient(cache_dir=str(tmp_path / "cache"))  # create the cache before racing
+        procs = [subprocess.Popen([sys.executable, "-c", worker], stdout=subprocess.PIPE, text=True)
+                 for _ in range(4)]
+        outputs = [p.communicate(timeout=60)[0].strip() for p in procs]
+        assert outputs == ["shared"] * 4
+        assert log.read_text().count("fetch") == 1
+
+    def test_disabled(self, tmp_path, fake_client):
+        client = self._client(fake_client, single_flight=False)
+        assert client._request("classification", dict(self.PARAMS)) == {"results": ["fetched"]}
+        assert not (tmp_path / "cache" / ".leases").exists()
+
+
+class TestBatchPlanner:
+    """Test chunked, concurrent batch_510k lookups."""
+
+    def test_chunks_respect_id_and_length_limits(self):
+        import urllib.parse
+        from fda_api_client import plan_or_chunks
+
+        ids = [f"K{n:06d}" for n in range(250)]
+        chunks = plan_or_chunks("k_number", ids, max_ids=100)
+        assert [len(v) for v, _ in chunks] == [100, 100, 50]
+        assert [v for c, _ in chunks for v in c] == ids
+
+        chunks = plan_or_chunks("k_number", ids, max_ids=1000, max_length=500)
+        assert all(len(urllib.parse.quote_plus(s.replace("+", " "))) <= 500 for _, s in chunks)
+        assert sum(len(v) for v, _ in chunks) == 250
+
+    def test_chunk_size_capped_at_openfda_page(self):
+        from fda_api_client import plan_or_chunks
+
+        chunks = plan_or_chunks("k_number", [f"K{n:06d}" for n in range(1500)],
+                                max_ids=5000, max_length=10 ** 6)
+        assert max(len(v) for v, _ in chunks) == 1000
+
+    @pytest.fixture
+    def client(self, fake_client):
+        import re
+        import threading
+        import time
+
+        lock = threading.Lock()
+
+        def respond(endpoint, params):
+            with lock:
+                client.queries.append(params["search"])
+                client.active += 1
+                client.peak = max(client.peak, client.active)
+            time.sleep(0.05)
+            with lock:
+                client.active -= 1
+            wanted = re.findall(r'k_number:"(K\d+)"', params["search"])
+            if "K000013" in wanted:
+                return {"error": "HTTP 500: Server Error", "degraded": True}
+            results = [{"k_number": k} for k in wanted if k != "K000007"]
+            return {"meta": {"results": {"total": len(results)}}, "results": results}
+
+        client = fake_client(respond)
+        client.queries = []
+        client.active = client.peak = 0
+        return client
+
+    def test_parallel_chunks_merge_in_order(self, client):
+        ids = [f"K{n:06d}" for n in range(40, 0, -1)] + ["K000040"]
+        result = client.batch_510k(ids, max_ids=10)
+        assert len(client.queries) == 4
+        assert client.peak > 1
+        assert [r["k_number"] for r in result["results"]] == [
+            k for k in dict.fromkeys(ids) if k not in ("K000007", "K000013")
+            and not ("K000011" <= k <= "K000020")]
+        assert result["partial"] is True
+        (error,) = result["errors"]
+        assert "K000013" in error["k_numbers"] and "HTTP 500" in error["error"]
+
+    def test_failed_chunk_not_cached_as_missing(self, client):
+        client.batch_510k([f"K{n:06d}" for n in range(1, 21)], max_ids=10)
+        assert client.get_510k("K000007")["results"] == []
+        client.queries.clear()
+        client.batch_510k(["K000012", "K000005"], max_ids=10)
+        assert len(client.queries) == 1 and "K000005" not in client.queries[0]
+
+    def test_all_chunks_failing_degrades(self, client):
+        result = client.batch_510k(["K000013"])
+        assert result["degraded"] is True
+
+
+class TestWarm:
+    """Test portfolio cache warm-up."""
+
+    @pytest.fixture
+    def client(self, fake_client):
+        def respond(endpoint, params):
+            if endpoint == "pma" and "XXX" in params["search"]:
+                return {"error": "HTTP 500: Server Error", "degraded": True}
+            return {"meta": {"results": {"total": 1}}, "results": [{"product_code": "OVE"}]}
+
+        return fake_client(respond)
+
+    def test_second_pass_is_all_cache_hits(self, client):
+        import fda_api_client
+        first = client.warm(["ove", "OVE"])
+        assert list(first) == ["OVE"]
+        assert set(first["OVE"].values()) == {"fetched"}
+        assert client.fetches == len(fda_api_client.WARM_QUERIES)
+        second = client.warm(["OVE"])
+        assert set(second["OVE"].values()) == {"cached"}
+        assert client.fetches == len(fda_api_client.WARM_QUERIES)
+
+    def test_interactive_queries_hit_after_warm(self, client):
+        client.warm(["OVE"])
+        before = client.fetches
+        client.get_classification("OVE")
+        client.get_recalls("OVE", limit=100)
+        client.get_events("OVE", count="event_type.exact")
+        client.get_enforcement("OVE")
+        assert client.fetches == before
+
+    def test_errors_reported(self, client):
+        from fda_api_client import format_warm_report
+        report = client.warm(["XXX"])
+        assert report["XXX"]["pma"].startswith("error: HTTP 500")
+        text = format_warm_report(report)
+        assert "2 errors" in text and "Warm coverage: 16/18" in text
+
+    def test_stale_answers_counted_separately(self, fake_client):
+        import fda_api_client
+        from fda_api_client import format_warm_report
+        client = fake_client(lambda endpoint, params: {"results": [{"recall_status": "Open"}]},
+                             stale_while_revalidate=True)
+        queries = [("recalls", lambda c, code: c.get_recalls(code))]
+        client.warm(["OVE"], queries=queries)
+        key = client._cache_key("recall", {"search": 'product_code:"OVE"', "limit": "10"})
+        client._memory.delete(key)
+        client._store.set(key, {"results": [{"recall_status": "Open"}]}, endpoint="recall",
+                          cached_at=fda_api_client.time.time() - 2 * 86400)
+        report = client.warm(["OVE"], queries=queries)
+        assert report["OVE"]["recalls"] == "stale"
+        assert "0 fetched, 0 already cached, 1 stale, 0 errors" in format_warm_report(report)
+
+    def test_collect_product_codes(self):
+        from fda_api_client import collect_product_codes
+        query = {"product_code": "OVE", "filters": {"product_codes": ["OVE", "kwq"]}}
+        review = {"predicates": {"K1": {"product_code": "MAX"}, "K2": {"product_code": "n/a"}}}
+        assert collect_product_codes([query, review]) == ["OVE", "KWQ", "MAX"]
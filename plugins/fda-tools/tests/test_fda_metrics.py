@@ -0,0 +1,127 @@
+"""Tests for openFDA client instrumentation (fda_metrics.py).
+
+FDAClient runs against a fake http_get so request counts, status codes,
+retries and bytes are deterministic; sleeps are patched out.
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+# Add scripts directory to path for import
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+import fda_api_client
+import fda_metrics
+from fda_api_client import FDAClient
+from fda_http import HTTPResult
+from fda_metrics import ClientMetrics, LatencyHistogram, dump_metrics, summarize_metrics_log
+
+BODY = json.dumps({"meta": {"results": {"total": 1}}, "results": [{"k_number": "K241335"}]}).encode()
+
+
+class AllowLimiter:
+    def acquire(self, timeout=None):
+        return True
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    responses = []
+
+    def fake_http_get(url, headers=None, timeout=15):
+        status = responses.pop(0) if responses else 200
+        return HTTPResult(status, "OK" if status == 200 else "Error", {}, BODY, len(BODY) // 2)
+
+    monkeypatch.setattr(fda_api_client, "http_get", fake_http_get)
+    monkeypatch.setattr(fda_api_client.time, "sleep", lambda s: None)
+    client = FDAClient(cache_dir=str(tmp_path / "cache"), rate_limiter=AllowLimiter(),
+                       metrics=ClientMetrics())
+    client.responses = responses
+    return client
+
+
+class TestLatencyHistogram:
+    """Test bucketed percentile estimates."""
+
+    def test_percentiles_fall_in_the_right_bucket(self):
+        hist = LatencyHistogram()
+        for _ in range(90):
+            hist.observe(0.02)
+        for _ in range(10):
+            hist.observe(3.0)
+        assert 0.01 < hist.percentile(0.5) <= 0.025
+        assert 2.5 < hist.percentile(0.95) <= 3.0
+        assert hist.summary()["max"] == 3.0
+
+    def test_empty(self):
+        assert LatencyHistogram().summary()["p99"] is None
+
+
+class TestClientMetrics:
+    """FDAClient reports per-endpoint counters."""
+
+    def test_cache_hits_and_network_requests(self, client):
+        client.get_510k("K241335")
+        client.get_510k("K241335")
+        client.get_classification("DQY")
+        snap = client.metrics.snapshot()
+        k = snap["endpoints"]["510k"]
+        assert (k["calls"], k["cache_hits"], k["cache_misses"], k["http_requests"]) == (2, 1, 1, 1)
+        assert k["cache_hit_ratio"] == 0.5
+        assert k["status"] == {"200": 1}
+        assert k["bytes_body"] == len(BODY) and k["bytes_wire"] == len(BODY) // 2
+        assert snap["totals"]["http_requests"] == 2
+        assert client.cache_stats()["metrics"]["totals"]["calls"] == 3
+
+    def test_retries_and_429(self, client):
+        client.responses.extend([429, 503])
+        assert client.get_recalls("DQY")["results"]
+        recall = client.metrics.snapshot()["endpoints"]["recall"]
+        assert recall["http_requests"] == 3
+        assert recall["retries"] == 2
+        assert recall["rate_limited"] == 1
+        assert recall["status"] == {"200": 1, "429": 1, "503": 1}
+        assert recall["backoff_seconds"] == 4.0  # 429 doubles the 1s base, then 2s
+
+    def test_client_error_counted(self, client):
+        client.responses.append(400)
+        assert client.get_pma("P100001")["degraded"]
+        assert client.metrics.snapshot()["endpoints"]["pma"]["errors"] == 1
+
+    def test_prometheus_text(self, client):
+        client.get_510k("K241335")
+        text = client.metrics.to_prometheus({"command": "test"})
+        assert '# TYPE fda_openfda_request_seconds histogram' in text
+        assert 'fda_openfda_http_requests_total{endpoint="510k",command="test"} 1' in text
+        assert 'fda_openfda_request_seconds_bucket{endpoint="510k",le="+Inf",command="test"} 1' in text
+
+
+class TestMetricsDump:
+    """Test exit dumps and the per-command log summary."""
+
+    def test_jsonl_appends_and_summarizes(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr(fda_metrics, "command_name", lambda: "batchfetch")
+        client.get_510k("K241335")
+        path = str(tmp_path / "metrics.jsonl")
+        dump_metrics(path, metrics=client.metrics)
+        dump_metrics(path, metrics=client.metrics)
+        summary = summarize_metrics_log(path)
+        assert summary["batchfetch"]["runs"] == 2
+        assert summary["batchfetch"]["http_requests"] == 2
+
+    def test_prometheus_file_replaced(self, client, tmp_path):
+        client.get_510k("K241335")
+        path = str(tmp_path / "fda.prom")
+        dump_metrics(path, fda_metrics.FORMAT_PROMETHEUS, client.metrics)
+        dump_metrics(path, fda_metrics.FORMAT_PROMETHEUS, client.metrics)
+        with open(path) as f:
+            assert f.read().count("# TYPE fda_openfda_request_seconds histogram") == 1
+
+    def test_format_from_extension(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("FDA_METRICS_FILE", str(tmp_path / "fda.prom"))
+        monkeypatch.delenv("FDA_METRICS_FORMAT", raising=False)
+        assert fda_metrics.configured_dump()[1] == fda_metrics.FORMAT_PROMETHEUS
+        monkeypatch.setenv("FDA_METRICS_FORMAT", "jsonl")
+        assert fda_metrics.configured_dump()[1] == fda_metrics.FORMAT_JSONL
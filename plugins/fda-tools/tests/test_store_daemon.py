@@ -0,0 +1,169 @@
+"""Tests for the data-store daemon (fda_store_daemon.py).
+
+The daemon serves on a socket under tmp_path with a FDAClient whose _fetch
+is replaced, so no network is used and fetch counts are exact.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+# Add scripts directory to path for import
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+import fda_data_store
+from fda_store_client import parse_args
+from fda_store_daemon import StoreDaemon, request
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "scripts", "fda_data_store.py")
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"),
+                                reason="Unix domain sockets not available")
+
+
+@pytest.fixture
+def client(fake_client):
+    return fake_client(lambda endpoint, params: {
+        "meta": {"results": {"total": 1}},
+        "results": [{"device_name": params.get("search", ""), "device_class": "2"}]})
+
+
+@pytest.fixture
+def daemon(tmp_path, client, monkeypatch):
+    monkeypatch.setattr(fda_data_store, "get_projects_dir", lambda: str(tmp_path / "projects"))
+    daemon = StoreDaemon(str(tmp_path / "store.sock"), client=client)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    assert daemon.wait_ready()
+    yield daemon
+    daemon.shutdown()
+    thread.join(5)
+
+
+def query(daemon, code, **extra):
+    return request("query", daemon.path, project="proj",
+                   args=dict({"query": "classification", "product_code": code}, **extra))
+
+
+class TestDaemon:
+    """Test requests served by a running daemon."""
+
+    def test_ping(self, daemon):
+        reply = request("ping", daemon.path)
+        assert reply["ok"] and reply["pid"] == os.getpid()
+
+    def test_query_miss_then_hit_with_resident_state(self, daemon, client):
+        first = query(daemon, "OVE")
+        second = query(daemon, "OVE")
+        assert "CACHE_STATUS:MISS" in first["stdout"]
+        assert "CACHE_STATUS:HIT" in second["stdout"]
+        assert client.fetches == 1
+        manifest = request("show-manifest", daemon.path, project="proj")["stdout"]
+        assert "CACHED:classification:OVE" in manifest
+
+    def test_concurrent_requests_get_their_own_output(self, daemon):
+        codes = [f"C{n:02d}" for n in range(8)]
+        replies = {}
+
+        def run(code):
+            replies[code] = query(daemon, code)["stdout"]
+
+        threads = [threading.Thread(target=run, args=(code,)) for code in codes]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for code in codes:
+            assert replies[code].count("DEVICE_NAME:") == 1
+            assert code in replies[code]
+
+    def test_refresh_all_and_clear(self, daemon, tmp_path):
+        query(daemon, "OVE")
+        assert "REFRESHED:1" in request("refresh-all", daemon.path, project="proj")["stdout"]
+        assert "CLEARED" in request("clear", daemon.path, project="proj")["stdout"]
+        assert not (tmp_path / "projects" / "proj" / "data_manifest.db").exists()
+        assert "CACHE_STATUS:MISS" in query(daemon, "OVE")["stdout"]
+
+    def test_invalid_requests(self, daemon):
+        assert not request("query", daemon.path, project="proj", args={"query": "510k"})["ok"]
+        assert not request("drop-tables", daemon.path, project="proj")["ok"]
+
+
+class TestThinClient:
+    """fda_data_store.py uses the daemon when present and runs in-process otherwise."""
+
+    def test_cli_routes_through_daemon(self, daemon, client, capsys, monkeypatch):
+        def no_local_client():
+            raise AssertionError("ran in-process")
+
+        monkeypatch.setattr(fda_data_store, "FDAClient", no_local_client)
+        monkeypatch.setattr(sys, "argv", ["fda_data_store.py", "--project", "proj", "--query",
+                                          "classification", "--product-code", "OVE",
+                                          "--socket", daemon.path])
+        fda_data_store.main()
+        assert "CACHE_STATUS:MISS" in capsys.readouterr().out
+        assert client.fetches == 1
+
+    def test_no_daemon_falls_back(self, tmp_path, client, capsys, monkeypatch):
+        socket_path = str(tmp_path / "missing.sock")
+        assert request("ping", socket_path) is None
+        monkeypatch.setattr(fda_data_store, "get_projects_dir", lambda: str(tmp_path))
+        monkeypatch.setattr(fda_data_store, "FDAClient", lambda: client)
+        monkeypatch.setattr(sys, "argv", ["fda_data_store.py", "--project", "proj", "--query",
+                                          "classification", "--product-code", "OVE",
+                                          "--socket", socket_path])
+        fda_data_store.main()
+        assert "CACHE_STATUS:MISS" in capsys.readouterr().out
+
+    def test_script_forwards_before_heavy_imports(self, daemon, client):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", SCRIPT, "--project", "proj", "--query",
+             "classification", "--product-code", "OVE", f"--socket={daemon.path}"],
+            capture_output=True, text=True, timeout=60,
+        )
+        assert proc.returncode == 0
+        assert "CACHE_STATUS:MISS" in proc.stdout
+        imported = {line.rsplit("|", 1)[-1].strip() for line in proc.stderr.splitlines()}
+        assert "fda_store_client" in imported
+        assert not imported & {"fda_api_client", "fda_manifest_store", "argparse", "http.client"}
+        assert client.fetches == 1
+
+    def test_reply_timeout_is_an_error(self, tmp_path, capsys, monkeypatch):
+        import fda_store_client
+        path = str(tmp_path / "hung.sock")
+        hung = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        hung.bind(path)
+        hung.listen(1)  # Accepts connections, never replies
+        try:
+            assert request("ping", path, timeout=0.1)["timeout"]
+            monkeypatch.setattr(fda_store_client, "REPLY_TIMEOUT", 0.1)
+            with pytest.raises(SystemExit) as exc:
+                fda_store_client.run_in_daemon(parse_args(
+                    ["--project", "proj", "--show-manifest", "--socket", path]))
+        finally:
+            hung.close()
+        assert exc.value.code == 1
+        assert "ERROR:data-store daemon sent no reply" in capsys.readouterr().err
+
+    def test_main_does_not_retry_after_forward(self, daemon, client, tmp_path, capsys,
+                                               monkeypatch):
+        monkeypatch.setattr(fda_data_store, "_daemon_tried", True)
+        monkeypatch.setattr(fda_data_store, "get_projects_dir", lambda: str(tmp_path))
+        monkeypatch.setattr(fda_data_store, "FDAClient", lambda: client)
+        monkeypatch.setattr(sys, "argv", ["fda_data_store.py", "--project", "local", "--query",
+                                          "classification", "--product-code", "OVE",
+                                          "--socket", daemon.path])
+        fda_data_store.main()
+        assert "CACHE_STATUS:MISS" in capsys.readouterr().out
+        assert daemon.requests == 0
+        assert os.path.exists(tmp_path / "local" / "data_manifest.json")
+
+    def test_unparsed_arguments_run_in_process(self):
+        assert parse_args(["--project", "p", "--product", "OVE"]) is None  # abbreviation
+        assert parse_args(["--project", "p", "--workers", "many"]) is None
+        assert parse_args(["--help"]) is None
+        options = parse_args(["--project=p", "--refresh-all", "--eager", "--workers", "4"])
+        assert (options["project"], options["refresh_all"], options["workers"]) == ("p", True, 4)
@@ -0,0 +1,426 @@
+"""Tests for build_structured_cache.py section detection and cache builds.
+
+The prefilter must reproduce the per-pattern finditer() scan exactly, so
+each test compares it with scan_sections_naive() on the sample 510(k) text.
+Build and format tests use a small per-device cache under tmp_path.
+"""
+
+import json
+import os
+import random
+import sys
+
+import pytest
+
+try:  # Python 3.11+
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+# Add scripts directory to path for import
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+import build_structured_cache
+from build_structured_cache import (
+    SECTION_KEYWORDS,
+    SECTION_PATTERNS,
+    BuildState,
+    benchmark_section_detection,
+    build_structured_cache as build,
+    device_stats,
+    generate_coverage_manifest,
+    load_device_stats,
+    detect_sections,
+    find_section_matches,
+    find_tier2_matches,
+    matching_sections,
+    scan_sections_naive,
+    scan_tier2_naive,
+    synthetic_ocr_texts,
+    tier2_line_sections,
+)
+from full_text_search import load_structured_cache, search_all_sections
+from structured_cache import StructuredDocument, iter_documents, read_document
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "sample_510k_text.txt")
+
+
+@pytest.fixture(scope="module")
+def sample_text():
+    with open(FIXTURE) as f:
+        return f.read()
+
+
+def ocr_noise(text, seed, rate=30):
+    """Replace every rate-th character (on average) with an OCR-style error."""
+    rnd = random.Random(seed)
+    chars = list(text)
+    for _ in range(len(chars) // rate):
+        chars[rnd.randrange(len(chars))] = rnd.choice("10$7385| İıſK")
+    return "".join(chars)
+
+
+def naive_matching_sections(text):
+    return tuple(name for name, p in SECTION_PATTERNS.items() if p.search(text))
+
+
+def literal_prefixes(items):
+    """Literal strings one of which starts every match of parsed pattern items.
+
+    Returns (prefixes, complete); collection stops at the first item that is
+    not a literal, a literal character class, a group or an alternation.
+    """
+    prefixes = {''}
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            subs, complete = {chr(av)}, True
+        elif op is sre_parse.IN and all(o is sre_parse.LITERAL for o, _ in av):
+            subs, complete = {chr(c) for _, c in av}, True
+        elif op is sre_parse.SUBPATTERN:
+            subs, complete = literal_prefixes(av[-1])
+        elif op is sre_parse.BRANCH:
+            parts = [literal_prefixes(branch) for branch in av[1]]
+            subs = set().union(*(p for p, _ in parts))
+            complete = all(c for _, c in parts)
+        else:
+            return prefixes, False
+        prefixes = {p + sub for p in prefixes for sub in subs}
+        if not complete:
+            return prefixes, False
+    return prefixes, True
+
+
+class TestPrefilter:
+    """Test the keyword prefilter against the per-pattern scan."""
+
+    def test_every_pattern_has_keywords(self):
+        assert set(SECTION_KEYWORDS) == set(SECTION_PATTERNS)
+        for keywords in SECTION_KEYWORDS.values():
+            assert keywords and all(k and k == k.lower() and not any(c.isspace() for c in k)
+                                    for k in keywords)
+
+    @pytest.mark.parametrize("name", list(SECTION_PATTERNS))
+    def test_keywords_cover_every_alternative(self, name):
+        prefixes, _ = literal_prefixes(sre_parse.parse(SECTION_PATTERNS[name].pattern))
+        uncovered = {p for p in prefixes
+                     if not p.lower().startswith(tuple(SECTION_KEYWORDS[name]))}
+        assert not uncovered, f"{name}: add keywords for {sorted(uncovered)}"
+
+    def test_identical_matches_on_sample(self, sample_text):
+        assert find_section_matches(sample_text) == scan_sections_naive(sample_text)
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_identical_matches_with_ocr_noise(self, sample_text, seed):
+        text = ocr_noise(sample_text, seed)
+        assert find_section_matches(text) == scan_sections_naive(text)
+
+    def test_case_insensitive_special_characters(self):
+        text = "İndications for use and Bioſafety KEY; STERILIZATION by eto"
+        assert find_section_matches(text) == scan_sections_naive(text)
+        assert find_section_matches(text)
+
+    def test_matching_sections(self, sample_text):
+        for line in sample_text.splitlines()[:200]:
+            assert matching_sections(line) == naive_matching_sections(line)
+
+
+class TestDetectSections:
+    """detect_sections output is unchanged by the prefilter."""
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_same_sections_and_metadata(self, sample_text, seed, monkeypatch):
+        text = ocr_noise(sample_text, seed, rate=60)
+        fast = detect_sections(text)
+        monkeypatch.setattr(build_structured_cache, "find_section_matches", scan_sections_naive)
+        monkeypatch.setattr(build_structured_cache, "matching_sections", naive_matching_sections)
+        monkeypatch.setattr(build_structured_cache, "find_tier2_matches", scan_tier2_naive)
+        assert fast == detect_sections(text)
+
+    def test_benchmark_reports_identical(self, sample_text):
+        result = benchmark_section_detection([sample_text, ocr_noise(sample_text, 9)])
+        assert result["documents"] == 2
+        assert result["identical"] is True
+        assert result["tier2_seconds"] is not None
+
+
+class TestTier2:
+    """Test the streaming Tier 2 scan against the line-by-line reference."""
+
+    def test_synthetic_text_is_low_quality(self):
+        text = synthetic_ocr_texts(1, lines=200)[0]
+        assert build_structured_cache.estimate_ocr_quality(text)[0] == "LOW"
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_identical_on_synthetic_ocr(self, seed):
+        for text in synthetic_ocr_texts(3, lines=300, seed=seed):
+            assert find_tier2_matches(text) == scan_tier2_naive(text)
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_identical_on_noisy_sample(self, sample_text, seed):
+        text = ocr_noise(sample_text, seed, rate=10)
+        assert find_tier2_matches(text) == scan_tier2_naive(text)
+
+    @pytest.mark.parametrize("line", [
+        "1ndications for Use", "8iocompa7ibility", "Ste rilization", "$TERILIZATION",
+        "5ubstantial Equ1valence", "Bi0compatibility", "e-beam 5terilization",
+    ])
+    def test_ocr_headers_pass_prefilter(self, line):
+        corrected, corrections = build_structured_cache.apply_ocr_corrections(line)
+        assert tier2_line_sections(line)[0] == (matching_sections(corrected) if corrections else ())
+        assert tier2_line_sections(line)[0]
+
+    def test_offsets_are_line_starts(self):
+        text = "intro line\n\n  1ndications for Use  \nbody\n8iocompatibility"
+        matches, corrections = find_tier2_matches(text)
+        assert [(pos, line) for pos, line, *_ in matches] == [
+            (12, "1ndications for Use"), (41, "8iocompatibility")]
+        assert text[12:].lstrip().startswith("1ndications")
+        assert len(corrections) == len(matches)
+
+
+def make_device_cache(root, texts):
+    """Write a per-device cache (index.json + devices/*.json) under root."""
+    (root / "cache" / "devices").mkdir(parents=True)
+    index = {}
+    for k_number, text in texts.items():
+        rel = f"cache/devices/{k_number}.json"
+        (root / rel).write_text(json.dumps({"text": text, "metadata": {"k": k_number}}))
+        index[k_number] = {"file_path": rel}
+    index_path = root / "cache" / "index.json"
+    index_path.write_text(json.dumps(index))
+    return index_path
+
+
+@pytest.fixture
+def device_cache(tmp_path, sample_text):
+    texts = {f"K24{n:04d}": ocr_noise(sample_text, n, rate=200) for n in range(4)}
+    return make_device_cache(tmp_path, texts)
+
+
+def read_outputs(output_dir):
+    outputs = {}
+    for path in sorted(output_dir.glob("K*.json")):
+        data = json.loads(path.read_text())
+        data.pop("structured_at")
+        outputs[path.name] = data
+    return outputs
+
+
+class TestBuild:
+    """Test parallel and incremental builds."""
+
+    def test_incremental_skips_unchanged(self, device_cache, tmp_path, capsys):
+        out = tmp_path / "structured"
+        assert build(device_cache, out, incremental=True) == {"built": 4}
+        assert build(device_cache, out, incremental=True) == {"unchanged": 4}
+
+        changed = tmp_path / "cache" / "devices" / "K240001.json"
+        changed.write_text(json.dumps({"text": "510(k) Summary\nnew text"}))
+        (out / "K240002.json").unlink()
+        assert build(device_cache, out, incremental=True) == {"built": 2, "unchanged": 2}
+        assert "new text" in read_document(out / "K240001.json").full_text
+
+    @pytest.mark.parametrize("output_format,blob", [("compact", "K240001.txt"),
+                                                     ("compact-gzip", "K240001.txt.gz")])
+    def test_incremental_rebuilds_missing_text_blob(self, device_cache, tmp_path, output_format,
+                                                    blob):
+        out = tmp_path / "structured"
+        build(device_cache, out, incremental=True, output_format=output_format)
+        (out / "texts" / blob).unlink()
+        assert build(device_cache, out, incremental=True,
+                     output_format=output_format) == {"built": 1, "unchanged": 3}
+        assert load_structured_cache(out)["K240001"].full_text
+
+    def test_detector_version_change_rebuilds(self, device_cache, tmp_path, monkeypatch):
+        out = tmp_path / "structured"
+        build(device_cache, out, incremental=True)
+        monkeypatch.setattr(build_structured_cache, "DETECTOR_VERSION", 99)
+        assert build(device_cache, out, incremental=True) == {"built": 4}
+
+    def test_without_incremental_rebuilds_everything(self, device_cache, tmp_path):
+        out = tmp_path / "structured"
+        build(device_cache, out)
+        assert build(device_cache, out) == {"built": 4}
+
+    def test_workers_produce_identical_output(self, device_cache, tmp_path):
+        build(device_cache, tmp_path / "serial")
+        assert build(device_cache, tmp_path / "pool", workers=2) == {"built": 4}
+        assert read_outputs(tmp_path / "serial") == read_outputs(tmp_path / "pool")
+
+    def test_interrupted_build_resumes(self, device_cache, tmp_path, monkeypatch):
+        out = tmp_path / "structured"
+        real_build_device = build_structured_cache.build_device
+        calls = []
+
+        def interrupt_third(task, *args):
+            calls.append(task["k_number"])
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            return real_build_device(task, *args)
+
+        monkeypatch.setattr(build_structured_cache, "build_device", interrupt_third)
+        with pytest.raises(KeyboardInterrupt):
+            build(device_cache, out, incremental=True)
+        monkeypatch.setattr(build_structured_cache, "build_device", real_build_device)
+
+        state = BuildState(out)
+        assert state.previous_hash("K240000") and state.previous_hash("K240001")
+        assert state.previous_hash("K240002") is None
+        state.close()
+        assert build(device_cache, out, incremental=True) == {"built": 2, "unchanged": 2}
+
+    def test_missing_and_empty_devices(self, tmp_path):
+        index_path = make_device_cache(tmp_path, {"K240000": "", "K240001": "Indications for Use"})
+        (tmp_path / "cache" / "devices" / "K240001.json").unlink()
+        assert build(index_path, tmp_path / "out") == {"empty": 1, "missing": 1}
+
+
+def full_documents(output_dir):
+    docs = {}
+    for doc in iter_documents(output_dir):
+        data = doc.to_dict()
+        data.pop("structured_at")
+        docs[doc.k_number] = data
+    return docs
+
+
+class TestCompactFormat:
+    """Test the compact (offset-only) structured file layout."""
+
+    @pytest.mark.parametrize("output_format", ["compact", "compact-gzip"])
+    def test_same_documents_as_full_layout(self, device_cache, tmp_path, output_format):
+        build(device_cache, tmp_path / "full", output_format="full")
+        build(device_cache, tmp_path / "compact", output_format=output_format)
+        assert full_documents(tmp_path / "compact") == full_documents(tmp_path / "full")
+
+        full_size = sum(p.stat().st_size for p in (tmp_path / "full").glob("K*.json"))
+        compact_size = sum(p.stat().st_size for p in (tmp_path / "compact").rglob("K*"))
+        assert compact_size < full_size * 0.7
+
+    def test_compact_json_holds_no_text(self, device_cache, tmp_path):
+        out = tmp_path / "structured"
+        build(device_cache, out, output_format="compact")
+        data = json.loads((out / "K240000.json").read_text())
+        assert "full_text" not in data and data["format_version"] == 2
+        assert data["sections"] and all("text" not in s for s in data["sections"].values())
+        assert (out / "texts" / "K240000.txt").exists()
+
+    def test_text_is_read_lazily(self, device_cache, tmp_path):
+        out = tmp_path / "structured"
+        build(device_cache, out, output_format="compact")
+        doc = read_document(out / "K240000.json")
+        assert doc._text is None
+        name = next(iter(doc.sections))
+        assert doc.section_text(name).startswith(doc.sections[name]["header_matched"].strip()[:3])
+        assert doc._text is not None
+        assert doc.section_text("no_such_section") == ""
+
+    def test_reads_full_layout(self, device_cache, tmp_path):
+        out = tmp_path / "structured"
+        build(device_cache, out, output_format="full")
+        doc = read_document(out / "K240000.json")
+        assert not doc.compact
+        name = next(iter(doc.sections))
+        assert doc.section_text(name) == doc["sections"][name]["text"]
+
+    def test_full_layout_is_default(self, device_cache, tmp_path):
+        out = tmp_path / "structured"
+        build(device_cache, out)
+        assert not read_document(out / "K240000.json").compact
+        assert not (out / "texts").exists()
+
+    def test_switching_format_removes_old_text(self, device_cache, tmp_path):
+        out = tmp_path / "structured"
+        build(device_cache, out, output_format="compact-gzip")
+        assert build(device_cache, out, incremental=True,
+                     output_format="compact") == {"built": 4}
+        assert not list((out / "texts").glob("*.gz"))
+        build(device_cache, out, output_format="full")
+        assert not list((out / "texts").iterdir())
+
+    def test_search_over_compact_cache(self, device_cache, tmp_path, monkeypatch):
+        out = tmp_path / "fda-510k-data" / "extraction" / "structured_text_cache"
+        build(device_cache, out, output_format="full")
+        monkeypatch.setenv("HOME", str(tmp_path))
+        expected = search_all_sections(["device"])
+        build(device_cache, out, output_format="compact")
+        assert expected and search_all_sections(["device"]) == expected
+        assert all(isinstance(d, StructuredDocument) for d in load_structured_cache(out).values())
+
+
+class TestCoverageManifest:
+    """Test manifest generation from the build state's per-device stats."""
+
+    def manifest(self, out):
+        generate_coverage_manifest(out)
+        manifest = json.loads((out / "manifest.json").read_text())
+        manifest.pop("generated_at")
+        return manifest
+
+    def test_built_devices_need_no_reads(self, device_cache, tmp_path):
+        out = tmp_path / "structured"
+        build(device_cache, out, output_format="full")
+        stats, reread = load_device_stats(out)
+        assert reread == 0
+        expected = [device_stats(json.loads(p.read_text())) for p in sorted(out.glob("K*.json"))]
+        assert sorted(stats, key=json.dumps) == sorted(expected, key=json.dumps)
+
+    def test_same_manifest_with_and_without_stats(self, device_cache, tmp_path):
+        out = tmp_path / "structured"
+        build(device_cache, out)
+        from_stats = self.manifest(out)
+        (out / ".build_state.db").unlink()
+        assert self.manifest(out) == from_stats
+        assert load_device_stats(out)[1] == 0
+        assert from_stats["total_devices"] == 4
+
+    def test_changed_and_deleted_files(self, device_cache, tmp_path):
+        out = tmp_path / "structured"
+        build(device_cache, out)
+        data = json.loads((out / "K240000.json").read_text())
+        data["section_count"] = 99
+        (out / "K240000.json").write_text(json.dumps(data))
+        (out / "K240001.json").unlink()
+
+        stats, reread = load_device_stats(out)
+        assert reread == 1
+        assert len(stats) == 3 and 99 in [s["section_count"] for s in stats]
+        state = BuildState(out)
+        assert "K240001" not in state.all_stats()
+        state.close()
+
+
+class TestLegacySource:
+    """Test streaming builds from a legacy pdf_data.json."""
+
+    def test_streamed_legacy_build(self, sample_text, tmp_path, monkeypatch):
+        legacy = tmp_path / "pdf_data.json"
+        pdf_data = {"k240000.pdf": {"text": sample_text}, "K240001.pdf": ocr_noise(sample_text, 1),
+                    "K240002.pdf": {"text": ""}}
+        legacy.write_text(json.dumps(pdf_data))
+
+        def no_json_load(*args, **kwargs):
+            raise AssertionError("legacy file loaded whole")
+
+        monkeypatch.setattr(build_structured_cache.json, "load", no_json_load)
+        counts = build(legacy, tmp_path / "serial", source_type="legacy")
+        assert counts == {"built": 2, "empty": 1}
+        monkeypatch.undo()
+
+        build(legacy, tmp_path / "pool", source_type="legacy", workers=2)
+        assert full_documents(tmp_path / "pool") == full_documents(tmp_path / "serial")
+        doc = read_document(tmp_path / "serial" / "K240000.json")
+        assert doc.full_text == sample_text and doc["source"] == "legacy-pdf_data.json"
+
+    def test_search_fallback_reads_legacy_text_lazily(self, sample_text, tmp_path, monkeypatch):
+        extraction = tmp_path / "fda-510k-data" / "extraction"
+        extraction.mkdir(parents=True)
+        (extraction / "pdf_data.json").write_text(
+            json.dumps({"k240000.pdf": {"text": sample_text}, "K240001.pdf": "Zirconia cage"}))
+        monkeypatch.setenv("HOME", str(tmp_path))
+
+        docs = load_structured_cache()
+        assert sorted(docs) == ["K240000", "K240001"]
+        assert all(doc.compact and "full_text" not in doc.data for doc in docs.values())
+        assert docs["K240000"].read_text() == sample_text
+        assert docs["K240001"].full_text == "Zirconia cage"
+        assert {r["k_number"] for r in search_all_sections(["Zirconia"])} == {"K240001"}
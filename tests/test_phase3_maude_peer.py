@@ -25,12 +25,27 @@ sys.path.insert(0, str(lib_path))
 from fda_enrichment import FDAEnrichment
 
 
+class ApiQueryClient:
+    """FDAClient stand-in that serves iter_results() from the enricher's (patched) api_query"""
+
+    def __init__(self, enricher):
+        self.enricher = enricher
+        self.last_total = None
+
+    def iter_results(self, endpoint, params, max_records=None):
+        data = self.enricher.api_query(endpoint, dict(params)) or {}
+        results = data.get('results') or []
+        self.last_total = data.get('meta', {}).get('results', {}).get('total', len(results))
+        yield from results[:max_records]
+
+
 class TestPhase3MAUDEPeerComparison(unittest.TestCase):
     """Test suite for Phase 3 MAUDE Peer Comparison feature"""
 
     def setUp(self):
         """Initialize enricher for each test"""
         self.enricher = FDAEnrichment(api_key=None, api_version="3.0.0")
+        self.enricher.client = ApiQueryClient(self.enricher)
 
     def test_sufficient_cohort_normal_case(self):
         """Test 1: Normal case with sufficient peer cohort (≥10 devices)"""
@@ -255,6 +270,7 @@ class TestPhase3Integration(unittest.TestCase):
     def setUp(self):
         """Initialize enricher for each test"""
         self.enricher = FDAEnrichment(api_key=None, api_version="3.0.0")
+        self.enricher.client = ApiQueryClient(self.enricher)
 
     def test_phase3_columns_in_enriched_output(self):
         """Test 8: Verify all 7 Phase 3 columns are present in enriched output"""